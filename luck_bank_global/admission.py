@@ -0,0 +1,130 @@
+# admission.py
+import logging
+import threading
+import time
+from collections import Counter
+from config import (MAX_CONCURRENT_HANDLERS, PEER_RATE_LIMIT_PER_SEC, PEER_RATE_BURST, PEER_INVALID_STRIKES,
+                    PEER_STRIKE_WINDOW_SECONDS, PEER_BAN_SECONDS, PEER_TABLE_MAX)
+
+# Rejection reasons (keys of AdmissionController.rejections)
+REJECT_BANNED = "banned"
+REJECT_RATE_LIMITED = "rate_limited"
+REJECT_AT_CAPACITY = "at_capacity"
+REJECT_INVALID_MESSAGE = "invalid_message" # Counted after the fact; feeds the ban list
+
+
+class _PeerState:
+    """Token bucket plus invalid-message strikes for one source IP."""
+    __slots__ = ("tokens", "updated", "strikes", "banned_until")
+
+    def __init__(self, now):
+        self.tokens = float(PEER_RATE_BURST)
+        self.updated = now
+        self.strikes = [] # Timestamps of recent invalid messages
+        self.banned_until = 0.0
+
+
+class AdmissionController:
+    """
+    Decides, per accepted connection and before any parsing, whether it gets a handler thread.
+    Applies (in order) the temporary ban list, a per-IP token bucket and a global handler cap.
+    `clock` returns monotonic seconds (replaceable in tests).
+    """
+
+    def __init__(self, max_handlers=MAX_CONCURRENT_HANDLERS, rate=PEER_RATE_LIMIT_PER_SEC, burst=PEER_RATE_BURST,
+                 clock=time.monotonic):
+        self.max_handlers = max_handlers
+        self.rate = rate
+        self.burst = burst
+        self.active_handlers = 0
+        self.admitted = 0
+        self.rejections = Counter()
+        self._peers = {} # ip -> _PeerState
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def admit(self, ip):
+        """
+        Returns None if the connection is admitted (caller MUST call release() when done),
+        otherwise the rejection reason.
+        """
+        now = self._clock()
+        with self._lock:
+            peer = self._peer(ip, now)
+            if peer.banned_until > now:
+                return self._reject(REJECT_BANNED)
+
+            peer.tokens = min(self.burst, peer.tokens + (now - peer.updated) * self.rate)
+            peer.updated = now
+            if peer.tokens < 1.0:
+                return self._reject(REJECT_RATE_LIMITED)
+
+            if self.active_handlers >= self.max_handlers:
+                return self._reject(REJECT_AT_CAPACITY)
+
+            peer.tokens -= 1.0
+            self.active_handlers += 1
+            self.admitted += 1
+            return None
+
+    def release(self):
+        """Frees a handler slot taken by a successful admit()."""
+        with self._lock:
+            self.active_handlers -= 1
+
+    def record_invalid(self, ip):
+        """Records an invalid message from `ip`; bans the peer once it reaches PEER_INVALID_STRIKES."""
+        now = self._clock()
+        with self._lock:
+            self.rejections[REJECT_INVALID_MESSAGE] += 1
+            peer = self._peer(ip, now)
+            cutoff = now - PEER_STRIKE_WINDOW_SECONDS
+            peer.strikes = [t for t in peer.strikes if t > cutoff]
+            peer.strikes.append(now)
+            if len(peer.strikes) >= PEER_INVALID_STRIKES:
+                peer.banned_until = now + PEER_BAN_SECONDS
+                peer.strikes = []
+                logging.warning(f"Banning peer {ip} for {PEER_BAN_SECONDS}s after repeated invalid messages")
+
+    def snapshot(self):
+        """Returns a dict of admission counters (safe to show in the GUI or logs)."""
+        with self._lock:
+            now = self._clock()
+            return {
+                "admitted": self.admitted,
+                "active_handlers": self.active_handlers,
+                "banned_peers": sum(1 for p in self._peers.values() if p.banned_until > now),
+                "rejections": dict(self.rejections),
+            }
+
+    def _peer(self, ip, now):
+        """
+        Returns the state for `ip`, creating it. A full table is pruned first; if every entry is still in
+        use (e.g. invalid messages sprayed from many source IPs), the oldest unbanned entry makes room.
+        Lock held.
+        """
+        peer = self._peers.get(ip)
+        if peer is None:
+            if len(self._peers) >= PEER_TABLE_MAX:
+                self._prune(now)
+            if len(self._peers) >= PEER_TABLE_MAX:
+                for old_ip, old_peer in self._peers.items(): # Insertion order: oldest first
+                    if old_peer.banned_until <= now:
+                        del self._peers[old_ip]
+                        break
+            peer = self._peers[ip] = _PeerState(now)
+        return peer
+
+    def _reject(self, reason):
+        self.rejections[reason] += 1
+        return reason
+
+    def _prune(self, now):
+        """Drops peers whose bucket has refilled and who are neither banned nor carrying strikes. Lock held."""
+        idle_after = self.burst / self.rate if self.rate > 0 else 0
+        strike_cutoff = now - PEER_STRIKE_WINDOW_SECONDS
+        stale = [ip for ip, p in self._peers.items()
+                 if now - p.updated >= idle_after and p.banned_until <= now
+                 and (not p.strikes or p.strikes[-1] <= strike_cutoff)]
+        for ip in stale:
+            del self._peers[ip]
@@ -0,0 +1,122 @@
+# benchmarks/__init__.py
+"""
+Benchmark and load-generation suite (no GUI, temp databases, loopback only).
+
+Run from luck_bank_global/:
+    python -m benchmarks.run                 # micro-benchmarks + a default load run, JSON into benchmarks/results/
+    python -m benchmarks.load --nodes 8      # load test only
+    python -m benchmarks.micro               # hot-path micro-benchmarks only
+    python -m benchmarks.discovery --nodes 200   # gossip peer discovery convergence on loopback
+    python -m benchmarks.shards --shards 1,2,4,8 # ledger write throughput vs SQLite shard count
+    python -m benchmarks.receive --workers 0,1,2,4 # receive throughput vs listener worker processes
+    python -m benchmarks.codec               # JSON vs binary wire codec: encode/decode time and bytes
+    python -m benchmarks.startup             # cold start without Tk: imports, ledger open, local IP
+    python -m benchmarks.export --rows 100000,400000   # transaction export/import rows/s and peak heap
+    python -m benchmarks.signing             # signature verification throughput (needs cryptography)
+    python -m benchmarks.run --baseline old.json   # also print the change against an earlier result file
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+# The application modules use flat imports (`from config import ...`); make them importable from here
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list (0.0 < fraction <= 1.0)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies):
+    """Returns count/mean/p50/p90/p99/max (seconds) for a list of latencies."""
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": values[-1],
+    }
+
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc), falling back to the peak RSS."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux reports KiB, macOS bytes
+
+
+class ResourceSampler:
+    """Measures wall time, CPU time (user+sys) and RSS between start() and stop()."""
+
+    def start(self):
+        self._wall = time.perf_counter()
+        self._cpu = self._cpu_seconds()
+        return self
+
+    def stop(self):
+        wall = time.perf_counter() - self._wall
+        cpu = self._cpu_seconds() - self._cpu
+        return {
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "cpu_cores_used": cpu / wall if wall > 0 else 0.0,
+            "rss_bytes": current_rss_bytes(),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+    @staticmethod
+    def _cpu_seconds():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+
+def environment_info():
+    """Context stored with every result so runs from different machines/commits aren't mixed up."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_DIR, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(results, path=None, name="bench"):
+    """Writes a result dict as JSON (default: benchmarks/results/<name>-<timestamp>.json). Returns the path."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
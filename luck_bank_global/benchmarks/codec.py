@@ -0,0 +1,103 @@
+# benchmarks/codec.py
+"""
+Wire codec cost: encode/decode time and bytes on the wire for representative P2P messages (an unsigned
+transfer, a signed transfer, a 50-entry signed batch and a gossip 'peers' reply), each with its
+response, in the JSON codec and the binary codec.
+
+Signed messages use random hex of the right sizes, so this runs without the 'cryptography' package.
+The binary codec is much faster with the optional 'msgpack' package installed; the summary says which ran.
+
+Usage (from luck_bank_global/):  python -m benchmarks.codec --iterations 20000
+"""
+import argparse
+import logging
+import secrets
+import time
+
+from benchmarks import environment_info, write_results
+from codec import CODECS, MSGPACK_AVAILABLE
+from utils import generate_address
+
+
+def _signed_transfer():
+    return {"action": "transfer", "amount": "12.5", "sender_address": generate_address(), "sender_port": 61001,
+            "recipient_address": generate_address(), "public_key": secrets.token_hex(32),
+            "nonce": secrets.token_hex(8), "timestamp": int(time.time()), "signature": secrets.token_hex(64)}
+
+
+def sample_messages():
+    """(name, request, response) triples; the JSON response carries the 'codecs' list an upgraded node sends."""
+    ack = {"status": "success", "message": "Transfer acknowledged", "recipient_address": generate_address()}
+    batch = [_signed_transfer() for _ in range(50)]
+    peers = [{"address": generate_address(), "ip": f"10.0.{i // 250}.{i % 250 + 1}", "port": 61001, "age": 12.5 * i}
+             for i in range(16)]
+    return [
+        ("transfer", {"action": "transfer", "amount": "12.5", "sender_address": generate_address()}, ack),
+        ("signed_transfer", _signed_transfer(), ack),
+        ("signed_batch_50", {"action": "transfer_batch", "transfers": batch},
+         {"status": "success", "message": "50/50 transfers acknowledged", "results": [ack] * 50}),
+        ("peers_16", {"action": "peers", "address": generate_address(), "port": 61001, "limit": 16},
+         {"status": "success", "action": "peers", "peers": peers}),
+    ]
+
+
+def _per_call_seconds(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def bench_codec(codec, request, response, iterations):
+    if codec.name == "json":
+        response = dict(response, codecs=sorted(CODECS))
+    encoded = [codec.encode(request), codec.encode(response)]
+    if [codec.decode(data) for data in encoded] != [request, response]:
+        raise AssertionError(f"{codec.name} codec does not round-trip")
+    encode = _per_call_seconds(lambda: (codec.encode(request), codec.encode(response)), iterations)
+    decode = _per_call_seconds(lambda: (codec.decode(encoded[0]), codec.decode(encoded[1])), iterations)
+    return {"encode_us": encode * 1e6, "decode_us": decode * 1e6, "request_bytes": len(encoded[0]),
+            "response_bytes": len(encoded[1]), "bytes_per_exchange": len(encoded[0]) + len(encoded[1])}
+
+
+def run_codec(iterations=20000):
+    result = {"benchmark": "codec", "environment": environment_info(),
+              "params": {"iterations": iterations, "msgpack": MSGPACK_AVAILABLE}}
+    for name, request, response in sample_messages():
+        # Batches are ~50x the work per call; keep every case at a similar total time
+        count = max(1, iterations // 50) if "batch" in name else iterations
+        result[name] = {codec_name: bench_codec(codec, request, response, count)
+                        for codec_name, codec in CODECS.items()}
+    return result
+
+
+def format_summary(result):
+    params = result["params"]
+    lines = [f"codec ({params['iterations']} iterations, request + response per call, "
+             f"binary via {'msgpack' if params['msgpack'] else 'pure Python'})"]
+    for name, entry in result.items():
+        if not isinstance(entry, dict) or "json" not in entry:
+            continue
+        for codec_name, stats in entry.items():
+            ratio = stats["bytes_per_exchange"] / entry["json"]["bytes_per_exchange"]
+            lines.append(f"  {name:16s} {codec_name:7s} encode {stats['encode_us']:8.1f} us  "
+                         f"decode {stats['decode_us']:8.1f} us  {stats['bytes_per_exchange']:6d} bytes (x{ratio:4.2f})")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/codec-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_codec(args.iterations)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'codec')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
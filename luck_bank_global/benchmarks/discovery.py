@@ -0,0 +1,112 @@
+# benchmarks/discovery.py
+"""
+Gossip discovery on loopback: N headless nodes, each seeded with a single random earlier node, gossip
+until every node knows every other one (or its known-peer bound) or the time limit is hit.
+
+Usage (from luck_bank_global/):  python -m benchmarks.discovery --nodes 200 --interval 0.5
+"""
+import argparse
+import logging
+import random
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks import ResourceSampler, environment_info, summarize_latencies, write_results
+from benchmarks.node import HeadlessNode
+from config import GOSSIP_FANOUT, GOSSIP_SAMPLE_SIZE, GOSSIP_MAX_PEERS
+
+
+def run_discovery(nodes=100, interval=0.5, fanout=GOSSIP_FANOUT, sample_size=GOSSIP_SAMPLE_SIZE,
+                  max_peers=GOSSIP_MAX_PEERS, time_limit=60.0, base_port=63000, seed=None):
+    """Runs one discovery simulation and returns the result dict."""
+    if nodes < 2:
+        raise ValueError("At least two nodes are needed")
+    rng = random.Random(seed)
+    target = min(nodes - 1, max_peers) # Peers each node should end up knowing
+    options = {"interval": interval, "fanout": fanout, "sample_size": sample_size, "max_peers": max_peers,
+               "timeout": 2.0}
+    cluster = []
+    convergence = {} # node index -> seconds until it knew `target` peers
+    with tempfile.TemporaryDirectory(prefix="lgb_gossip_") as db_dir:
+        try:
+            for i in range(nodes): # Each node only knows one earlier node, so the seed graph is a random tree
+                seeds = [f"127.0.0.1:{base_port + rng.randrange(i)}"] if i else []
+                cluster.append(HeadlessNode(base_port + i, db_dir, gossip_options=dict(options, seeds=seeds)))
+            sampler = ResourceSampler().start()
+            started = time.perf_counter()
+            for node in cluster:
+                node.start()
+            while len(convergence) < nodes and time.perf_counter() - started < time_limit:
+                time.sleep(0.05)
+                elapsed = time.perf_counter() - started
+                for i, node in enumerate(cluster):
+                    if i not in convergence and len(node.gossip.get_known_peers()) >= target:
+                        convergence[i] = elapsed
+            usage = sampler.stop()
+        finally:
+            for node in cluster: # Quiesce gossip everywhere first so no round targets a closed listener
+                node.gossip.stop()
+            for node in cluster:
+                node.stop()
+
+    known = sorted(len(node.gossip.get_known_peers()) for node in cluster)
+    totals = sum((node.gossip.stats for node in cluster), Counter())
+    return {
+        "benchmark": "discovery",
+        "environment": environment_info(),
+        "params": {"nodes": nodes, "interval": interval, "fanout": fanout, "sample_size": sample_size,
+                   "max_peers": max_peers, "time_limit": time_limit},
+        "converged_nodes": len(convergence),
+        "converged": len(convergence) == nodes,
+        "convergence_seconds": summarize_latencies(list(convergence.values())),
+        "known_peers": {"min": known[0], "median": known[len(known) // 2], "max": known[-1], "target": target},
+        "rounds": totals["rounds"],
+        "requests": totals["requests"],
+        "failures": totals["failures"],
+        "requests_per_node_per_sec": totals["requests"] / nodes / usage["wall_seconds"],
+        "resources": usage,
+    }
+
+
+def format_summary(result):
+    params = result["params"]
+    conv = result["convergence_seconds"]
+    known = result["known_peers"]
+    lines = [
+        f"discovery: {params['nodes']} nodes, fanout {params['fanout']}, sample {params['sample_size']}, "
+        f"interval {params['interval']}s",
+        f"  converged    {result['converged_nodes']}/{params['nodes']} nodes"
+        + (f" (p50 {conv['p50']:.2f}s, max {conv['max']:.2f}s)" if conv["count"] else ""),
+        f"  known peers  min {known['min']}  median {known['median']}  max {known['max']}  (target {known['target']})",
+        f"  traffic      {result['requests']} requests, {result['failures']} failures, "
+        f"{result['requests_per_node_per_sec']:.2f} req/node/s over {result['rounds']} rounds",
+    ]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=0.5, help="Mean seconds between gossip rounds")
+    parser.add_argument("--fanout", type=int, default=GOSSIP_FANOUT)
+    parser.add_argument("--sample-size", type=int, default=GOSSIP_SAMPLE_SIZE)
+    parser.add_argument("--max-peers", type=int, default=GOSSIP_MAX_PEERS)
+    parser.add_argument("--time-limit", type=float, default=60.0)
+    parser.add_argument("--base-port", type=int, default=63000)
+    parser.add_argument("--seed", type=int, default=None, help="RNG seed for the seed graph")
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/discovery-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_discovery(nodes=args.nodes, interval=args.interval, fanout=args.fanout,
+                           sample_size=args.sample_size, max_peers=args.max_peers, time_limit=args.time_limit,
+                           base_port=args.base_port, seed=args.seed)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'discovery')}")
+    return 0 if result["converged"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
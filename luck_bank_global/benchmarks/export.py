@@ -0,0 +1,124 @@
+# benchmarks/export.py
+"""
+Transaction export/import pipeline: rows per second for exporting a ledger to CSV, JSONL and Parquet and
+for bulk-importing each file into an empty ledger, at several ledger sizes.
+
+A second pass repeats each export and import under tracemalloc and reports the peak Python heap. It
+should stay about the same as --rows grows (streaming, bounded by EXPORT_CHUNK_ROWS / IMPORT_BATCH_ROWS).
+Parquet is skipped when the optional 'pyarrow' package is not installed.
+
+Usage (from luck_bank_global/):  python -m benchmarks.export --rows 100000,400000
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import environment_info, write_results
+from database import DatabaseManager, TRANSACTION_TYPES
+from ledger_io import FORMATS, PYARROW_AVAILABLE, export_transactions, import_transactions
+
+
+def fill_ledger(db_file, rows, wallets=4):
+    """Creates a ledger with `rows` transactions spread over a year and `wallets` wallets."""
+    db = _ledger(db_file, wallets)
+    conn = sqlite3.connect(db_file)
+    with conn:
+        conn.executemany(
+            "INSERT INTO transactions (wallet_id, timestamp, type, amount, remote_address, local_balance_after, "
+            "details) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((i % wallets + 1, f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d}:{i % 59:02d}",
+              TRANSACTION_TYPES[i % 3], 1.0 + i % 500, None if i % 3 == 0 else "LGBX_" + "A" * 36,
+              float(i), None if i % 3 else f"10.0.0.{i % 250}:61001") for i in range(rows)))
+    conn.close()
+    return db
+
+
+def _ledger(db_file, wallets):
+    """An empty ledger hosting wallet ids 1..`wallets` (imports skip rows for wallets it doesn't host)."""
+    db = DatabaseManager(db_file)
+    db.get_wallet_data(1) # Creates the primary wallet
+    db.create_wallets(wallets - 1)
+    return db
+
+
+def _measure(fn, trace):
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+        return result, time.perf_counter() - started, tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+
+
+def bench_size(work_dir, source, rows, formats, trace):
+    results = {}
+    for fmt in formats:
+        path = os.path.join(work_dir, f"export_{rows}.{fmt}")
+        target = _ledger(os.path.join(work_dir, f"import_{rows}_{fmt}_{int(trace)}.db"), 4)
+        exported, export_seconds, export_peak = _measure(lambda: export_transactions(source, path), trace)
+        imported, import_seconds, import_peak = _measure(lambda: import_transactions(target, path), trace)
+        if exported["rows"] != rows or imported["rows"] != rows:
+            raise AssertionError(f"{fmt}: exported {exported['rows']}, imported {imported['rows']} of {rows} rows")
+        entry = {"file_bytes": os.path.getsize(path)}
+        if trace:
+            entry.update(export_peak_bytes=export_peak, import_peak_bytes=import_peak)
+        else:
+            entry.update(export_rows_per_sec=rows / export_seconds, import_rows_per_sec=rows / import_seconds)
+        results[fmt] = entry
+        os.remove(path)
+    return results
+
+
+def run_export(sizes=(100000, 400000), memory=True):
+    formats = [fmt for fmt in FORMATS if fmt != "parquet" or PYARROW_AVAILABLE]
+    result = {"benchmark": "export", "environment": environment_info(),
+              "params": {"rows": list(sizes), "formats": formats, "memory": memory}, "sizes": {}}
+    with tempfile.TemporaryDirectory(prefix="lgb_export_") as work_dir:
+        for rows in sizes:
+            source = fill_ledger(os.path.join(work_dir, f"source_{rows}.db"), rows)
+            entry = bench_size(work_dir, source, rows, formats, trace=False)
+            if memory:
+                for fmt, peaks in bench_size(work_dir, source, rows, formats, trace=True).items():
+                    entry[fmt].update(export_peak_bytes=peaks["export_peak_bytes"],
+                                      import_peak_bytes=peaks["import_peak_bytes"])
+            result["sizes"][str(rows)] = entry
+    return result
+
+
+def format_summary(result):
+    lines = [f"export/import ({', '.join(result['params']['formats'])})"]
+    for rows, entry in result["sizes"].items():
+        for fmt, stats in entry.items():
+            line = (f"  {int(rows):>9d} rows {fmt:8s} export {stats['export_rows_per_sec']:9.0f} rows/s  "
+                    f"import {stats['import_rows_per_sec']:9.0f} rows/s  {stats['file_bytes'] / 1e6:7.1f} MB")
+            if "export_peak_bytes" in stats:
+                line += (f"  peak heap export {stats['export_peak_bytes'] / 1e6:5.1f} MB"
+                         f" / import {stats['import_peak_bytes'] / 1e6:5.1f} MB")
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="100000,400000", help="Comma-separated ledger sizes")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slower) tracemalloc pass")
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/export-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_export([int(rows) for rows in args.rows.split(",")], not args.no_memory)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'export')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
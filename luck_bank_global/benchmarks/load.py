@@ -0,0 +1,119 @@
+# benchmarks/load.py
+"""
+End-to-end load test: N headless nodes on loopback, a configurable share of them sending transfers
+to the rest through the real P2P send/receive path and SQLite ledgers.
+
+Usage (from luck_bank_global/):  python -m benchmarks.load --nodes 8 --send-ratio 0.5 --duration 20
+"""
+import argparse
+import logging
+import math
+import random
+import threading
+import time
+
+from benchmarks import ResourceSampler, environment_info, summarize_latencies, write_results
+from benchmarks.node import start_nodes
+
+
+def run_load(nodes=4, send_ratio=0.5, duration=10.0, concurrency=16, amount=0.001, base_port=62000,
+             relax_admission=True, seed=None):
+    """
+    Runs one load test and returns the result dict.
+    send_ratio: share of nodes that send (the others only receive); 1.0 means every node sends to every other.
+    concurrency: max transfers in flight across the whole cluster.
+    """
+    if nodes < 2:
+        raise ValueError("At least two nodes are needed")
+    rng = random.Random(seed)
+    cluster, temp_dir = start_nodes(nodes, base_port, relax_admission=relax_admission)
+    sender_count = min(nodes, max(1, math.ceil(nodes * send_ratio)))
+    senders = cluster[:sender_count]
+    receivers = cluster[sender_count:] or cluster
+
+    in_flight = threading.BoundedSemaphore(concurrency)
+    issued = 0
+    sampler = ResourceSampler().start()
+    deadline = time.perf_counter() + duration
+    try:
+        while time.perf_counter() < deadline:
+            if not in_flight.acquire(timeout=0.5):
+                continue
+            sender = senders[issued % len(senders)]
+            receiver = rng.choice([n for n in receivers if n is not sender] or [n for n in cluster if n is not sender])
+            sender.send(receiver, amount, on_done=lambda ok: in_flight.release())
+            issued += 1
+
+        # Drain: wait until every in-flight send has reported back (bounded by the socket timeout)
+        for _ in range(concurrency):
+            in_flight.acquire(timeout=30)
+        usage = sampler.stop()
+    finally:
+        for node in cluster:
+            node.stop()
+
+    latencies = [lat for node in senders for lat in node.send_latencies]
+    failures = sum(node.send_failures for node in senders)
+    received = sum(node.received for node in cluster)
+    if temp_dir:
+        temp_dir.cleanup()
+    return {
+        "benchmark": "load",
+        "environment": environment_info(),
+        "params": {"nodes": nodes, "senders": sender_count, "receivers": len(receivers), "duration": duration,
+                   "concurrency": concurrency, "amount": amount, "relax_admission": relax_admission},
+        "issued": issued,
+        "completed": len(latencies),
+        "failed": failures,
+        "received": received,
+        "throughput_per_sec": len(latencies) / usage["wall_seconds"] if usage["wall_seconds"] else 0.0,
+        "latency_seconds": summarize_latencies(latencies),
+        "resources": usage,
+    }
+
+
+def format_summary(result):
+    lat = result["latency_seconds"]
+    res = result["resources"]
+    lines = [
+        f"load: {result['params']['nodes']} nodes ({result['params']['senders']} sending), "
+        f"concurrency {result['params']['concurrency']}",
+        f"  completed {result['completed']} / issued {result['issued']}  (failed {result['failed']})",
+        f"  throughput {result['throughput_per_sec']:.1f} transfers/s",
+    ]
+    if lat.get("count"):
+        lines.append(f"  latency p50 {lat['p50'] * 1000:.2f} ms  p99 {lat['p99'] * 1000:.2f} ms  "
+                     f"max {lat['max'] * 1000:.2f} ms")
+    lines.append(f"  cpu {res['cpu_cores_used']:.2f} cores  rss {res['rss_bytes'] / 2**20:.1f} MiB")
+    return "\n".join(lines)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--send-ratio", type=float, default=0.5, help="Share of nodes that send (default 0.5)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load (default 10)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Transfers in flight (default 16)")
+    parser.add_argument("--base-port", type=int, default=62000)
+    parser.add_argument("--default-admission", action="store_true",
+                        help="Keep the production per-IP rate limits (they throttle loopback load)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/load-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_load(nodes=args.nodes, send_ratio=args.send_ratio, duration=args.duration,
+                      concurrency=args.concurrency, base_port=args.base_port,
+                      relax_admission=not args.default_admission, seed=args.seed)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'load')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
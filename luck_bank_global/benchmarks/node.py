@@ -0,0 +1,166 @@
+# benchmarks/node.py
+"""Headless node: BankLogic on a temp ledger and a loopback listener, with a thread in place of the Tk loop."""
+import itertools
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import benchmarks # noqa: F401  (sets up sys.path for the flat application imports)
+from admission import AdmissionController
+from logic import BankLogic
+from networking import P2PHandler
+
+
+class MainLoop:
+    """
+    Stands in for the Tk root that BankLogic schedules on: after(0, ...) queues the callback for one
+    thread, as Tk's main loop would run it; delayed callbacks run on a timer.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="main-loop")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def after(self, delay_ms, callback, *args):
+        if delay_ms:
+            timer = threading.Timer(delay_ms / 1000, self._queue.put, args=((callback, args),))
+            timer.daemon = True
+            timer.start()
+            return timer
+        self._queue.put((callback, args))
+        return None
+
+    def after_cancel(self, timer):
+        if timer is not None:
+            timer.cancel()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            callback, args = item
+            try:
+                callback(*args)
+            except Exception:
+                logging.exception("Main loop callback failed")
+
+
+def _discard_gui_update(update_type, data):
+    pass
+
+
+class HeadlessNode(BankLogic):
+    """
+    The node's own BankLogic, started without Tk: the ledger is a file in `db_dir`, the listener binds
+    `host`, and GUI updates are scheduled (and dropped) on a MainLoop thread. Transfers therefore go through
+    the same balance locking, ledger writes and peer-directory updates as in the GUI node. Adds the counters
+    and per-send completion callbacks the benchmarks need.
+    """
+
+    def __init__(self, port, db_dir, host="127.0.0.1", relax_admission=True, gossip_options=None, shards=1):
+        super().__init__(gui_callback=_discard_gui_update)
+        self.tk_root = MainLoop()
+        self.db_file = os.path.join(db_dir, f"node_{port}.db")
+        self.db_shards = shards
+        self.local_ip = host
+        self.port = port
+        self._open_ledger()
+        self.p2p_handler = P2PHandler(self, host, port)
+        if relax_admission: # All load comes from 127.0.0.1, which the per-IP limits would throttle
+            self.p2p_handler.admission = AdmissionController(max_handlers=10_000, rate=1e9, burst=1e9)
+        if gossip_options is not None: # GossipService keyword arguments (seeds, interval, fanout, ...)
+            self._attach_gossip(**gossip_options)
+        self.received = 0
+        self.send_latencies = []
+        self.send_failures = 0
+        self._pending = {} # send tag -> completion callback
+        self._pending_lock = threading.Lock()
+        self._tags = itertools.count()
+
+    def start(self, listen=True):
+        """Starts the main loop and background services, and the listener unless `listen` is False."""
+        self.tk_root.start()
+        if listen and not self.p2p_handler.start_listener():
+            raise RuntimeError(f"Benchmark node could not listen on {self.local_ip}:{self.port}")
+        self.peer_directory.start()
+        if self.gossip:
+            self.gossip.start()
+        self.ready = True
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.tk_root.stop()
+
+    # --- Driving ---
+    def send(self, peer, amount, on_done=None):
+        """Sends `amount` to another HeadlessNode's primary wallet via the real send path."""
+        started_at = time.perf_counter()
+
+        def _done(result):
+            elapsed = time.perf_counter() - started_at
+            ok = result.get("status") == "success"
+            with self._pending_lock:
+                if ok:
+                    self.send_latencies.append(elapsed)
+                else:
+                    self.send_failures += 1
+            if on_done:
+                on_done(ok)
+
+        # P2PHandler reports back through handle_send_result; tag the amount so we can find the callback
+        tag = next(self._tags)
+        with self._pending_lock:
+            self._pending[tag] = _done
+        sender = self._wallet()
+        self.p2p_handler.send_message(peer.local_ip, peer.port, _TaggedAmount(amount, tag), sender['address'],
+                                      sender['private_key'], peer.address)
+
+    # --- BankLogic callbacks, plus bookkeeping ---
+    def handle_received_transfer(self, amount, sender_address, sender_ip_port, recipient_address=None):
+        success = super().handle_received_transfer(amount, sender_address, sender_ip_port, recipient_address)
+        if success:
+            with self._pending_lock:
+                self.received += 1
+        return success
+
+    def handle_send_result(self, result, amount, recipient_info_str):
+        super().handle_send_result(result, amount, recipient_info_str)
+        with self._pending_lock:
+            done = self._pending.pop(getattr(amount, "tag", None), None)
+        if done:
+            done(result)
+
+
+class _TaggedAmount(float):
+    """A float that remembers which pending send it belongs to (P2PHandler passes it through unchanged)."""
+
+    def __new__(cls, value, tag):
+        obj = super().__new__(cls, value)
+        obj.tag = tag
+        return obj
+
+
+def start_nodes(count, base_port, db_dir=None, relax_admission=True):
+    """Starts `count` nodes on consecutive loopback ports. Returns (nodes, temp_dir_handle_or_None)."""
+    temp_dir = None
+    if db_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix="lgb_bench_")
+        db_dir = temp_dir.name
+    nodes = [HeadlessNode(base_port + i, db_dir, relax_admission=relax_admission).start() for i in range(count)]
+    return nodes, temp_dir
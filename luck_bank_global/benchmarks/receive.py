@@ -0,0 +1,187 @@
+# benchmarks/receive.py
+"""
+Accepted transfers/sec on the receive path versus listener worker processes: the classic threaded
+listener (workers=0) against MultiProcessListener with 1..N SO_REUSEPORT workers. Load comes from
+separate client processes so the clients don't share the server's GIL.
+
+By default the writer only counts transfers (--ledger null) so the numbers show the parse/validate
+path; --ledger sqlite applies them to a real ledger. --signed sends Ed25519-signed transfers
+(needs the 'cryptography' package), which makes validation much more CPU-heavy.
+
+Usage (from luck_bank_global/):  python -m benchmarks.receive --workers 0,1,2,4 --clients 4 --duration 10
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from benchmarks import ResourceSampler, environment_info, write_results
+from admission import AdmissionController
+from benchmarks.node import HeadlessNode
+from networking import P2PHandler
+from signing import CRYPTO_AVAILABLE, address_from_public_key, generate_keypair, sign_transfer
+from utils import generate_address
+from workers import MultiProcessListener
+
+_RELAXED_ADMISSION = {"max_handlers": 10_000, "rate": 1e9, "burst": 1e9} # All load comes from 127.0.0.1
+
+
+class _CountingLedger:
+    """Writer-side logic that accepts every transfer without a database."""
+
+    def __init__(self):
+        self.address = generate_address()
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def hosts_wallet(self, address):
+        return address == self.address
+
+    def handle_received_transfer(self, amount, sender_address, sender_ip_port, recipient_address=None):
+        with self._lock:
+            self.received += 1
+        return True
+
+    def handle_network_error(self, message):
+        logging.error(message)
+
+    def schedule_task(self, delay_ms, callback, *args):
+        callback(*args)
+
+
+def _fetch_address(host, port):
+    with socket.create_connection((host, port), timeout=5.0) as sock:
+        sock.sendall(json.dumps({"action": "address"}).encode('utf-8'))
+        return json.loads(sock.recv(4096).decode('utf-8'))["address"]
+
+
+def _client_main(host, port, duration, threads, signed, results):
+    """Client process: `threads` connections in a loop, one transfer each, until the deadline."""
+    private_key = recipient_address = None
+    if signed:
+        private_key, public_key = generate_keypair()
+        sender_address = address_from_public_key(public_key)
+        recipient_address = _fetch_address(host, port) # Signatures name the recipient wallet
+    else:
+        sender_address = generate_address()
+    counts = [[0, 0] for _ in range(threads)] # [accepted, failed] per thread
+    deadline = time.perf_counter() + duration
+
+    def _loop(index):
+        while time.perf_counter() < deadline:
+            message = {"action": "transfer", "amount": "0.001", "sender_address": sender_address}
+            if private_key:
+                message["recipient_address"] = recipient_address
+                message.update(sign_transfer(private_key, sender_address, message["amount"], recipient_address))
+            try:
+                with socket.create_connection((host, port), timeout=5.0) as sock:
+                    sock.sendall(json.dumps(message).encode('utf-8'))
+                    accepted = b'"success"' in sock.recv(4096)
+            except OSError:
+                accepted = False
+            counts[index][0 if accepted else 1] += 1
+
+    workers = [threading.Thread(target=_loop, args=(i,), daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put((sum(c[0] for c in counts), sum(c[1] for c in counts)))
+
+
+def bench_receive(workers, port, clients, client_threads, duration, ledger, signed, db_dir):
+    if ledger == "sqlite":
+        logic = HeadlessNode(port, db_dir).start(listen=False) # Listening is set up below
+        handler = logic.p2p_handler
+    else:
+        logic = _CountingLedger()
+        handler = P2PHandler(logic, "127.0.0.1", port)
+    if workers:
+        pool = MultiProcessListener(logic, handler, workers, admission_limits=_RELAXED_ADMISSION)
+        if not pool.start():
+            raise RuntimeError(f"Listener workers could not start on port {port}")
+    else:
+        pool = None
+        handler.admission = AdmissionController(**_RELAXED_ADMISSION)
+        if not handler.start_listener():
+            raise RuntimeError(f"Listener could not start on port {port}")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=_client_main, args=("127.0.0.1", port, duration, client_threads, signed,
+                                                            results), daemon=True) for _ in range(clients)]
+    sampler = ResourceSampler().start()
+    for process in processes:
+        process.start()
+    totals = [results.get(timeout=duration + 60) for _ in processes]
+    usage = sampler.stop()
+    for process in processes:
+        process.join()
+    if pool:
+        pool.stop()
+    handler.stop_listener()
+    if ledger == "sqlite":
+        logic.stop()
+
+    accepted = sum(t[0] for t in totals)
+    return {"throughput_per_sec": accepted / usage["wall_seconds"], "accepted": accepted,
+            "failed": sum(t[1] for t in totals), "resources": usage}
+
+
+def run_receive(worker_counts=(0, 1, 2, 4), clients=4, client_threads=8, duration=10.0, ledger="null",
+                signed=False, base_port=64000):
+    if signed and not CRYPTO_AVAILABLE:
+        raise RuntimeError("--signed needs the 'cryptography' package")
+    result = {"benchmark": "receive", "environment": environment_info(),
+              "params": {"worker_counts": list(worker_counts), "clients": clients, "client_threads": client_threads,
+                         "duration": duration, "ledger": ledger, "signed": signed, "cpu_count": os.cpu_count()}}
+    with tempfile.TemporaryDirectory(prefix="lgb_receive_") as db_dir:
+        for index, workers in enumerate(worker_counts):
+            result[f"workers_{workers}"] = bench_receive(workers, base_port + index, clients, client_threads,
+                                                         duration, ledger, signed, db_dir)
+    baseline = result[f"workers_{worker_counts[0]}"]["throughput_per_sec"]
+    for key in (f"workers_{w}" for w in worker_counts):
+        result[key]["speedup"] = result[key]["throughput_per_sec"] / baseline if baseline else None
+    return result
+
+
+def format_summary(result):
+    params = result["params"]
+    lines = [f"receive: {params['clients']} client processes x {params['client_threads']} threads, "
+             f"ledger {params['ledger']}, {'signed' if params['signed'] else 'unsigned'}, {params['cpu_count']} CPUs"]
+    for workers in params["worker_counts"]:
+        entry = result[f"workers_{workers}"]
+        label = "threaded" if workers == 0 else f"{workers} workers"
+        lines.append(f"  {label:12s} {entry['throughput_per_sec']:10.0f} accepted/s  x{entry['speedup']:5.2f}  "
+                     f"failed {entry['failed']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="0,1,2,4", help="Comma-separated worker counts (0 = threaded listener)")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--client-threads", type=int, default=8, help="Connections in flight per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per configuration")
+    parser.add_argument("--ledger", choices=("null", "sqlite"), default="null")
+    parser.add_argument("--signed", action="store_true", help="Send signed transfers")
+    parser.add_argument("--base-port", type=int, default=64000)
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/receive-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_receive([int(n) for n in args.workers.split(",")], args.clients, args.client_threads,
+                         args.duration, args.ledger, args.signed, args.base_port)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'receive')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+# benchmarks/run.py
+"""
+Runs the micro-benchmarks and a load test, writes one combined JSON result and optionally compares it
+with an earlier result file.
+
+Usage (from luck_bank_global/):  python -m benchmarks.run [--baseline results/old.json] [load options]
+"""
+import json
+import logging
+
+from benchmarks import environment_info, write_results
+from benchmarks import load, micro
+
+# Leaf keys compared against a baseline, and whether higher is better
+_COMPARED_KEYS = {"ops_per_sec": True, "throughput_per_sec": True, "p50": False, "p99": False,
+                  "rss_bytes": False}
+
+
+def _flatten(tree, prefix=""):
+    """Yields (dotted.path, value) for numeric leaves whose key is in _COMPARED_KEYS."""
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if key not in ("environment", "params"):
+                yield from _flatten(value, path + ".")
+        elif key in _COMPARED_KEYS and isinstance(value, (int, float)):
+            yield path, value
+
+
+def compare(current, baseline):
+    """Returns printable lines describing the change of each compared metric (positive % = better)."""
+    previous = dict(_flatten(baseline))
+    lines = [f"vs baseline {baseline.get('environment', {}).get('git_commit')} "
+             f"({baseline.get('environment', {}).get('timestamp')}):"]
+    for path, value in _flatten(current):
+        old = previous.get(path)
+        if not old:
+            continue
+        change = (value - old) / old * 100
+        if not _COMPARED_KEYS[path.rsplit(".", 1)[-1]]:
+            change = -change
+        flag = "  REGRESSION" if change < -10 else ""
+        lines.append(f"  {path:60s} {old:14.6g} -> {value:14.6g}  {change:+6.1f}%{flag}")
+    return lines
+
+
+def main(argv=None):
+    parser = load.build_arg_parser()
+    parser.description = __doc__
+    parser.add_argument("--iterations", type=int, default=2000, help="Micro-benchmark iterations")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    result = {"benchmark": "suite", "environment": environment_info(), "micro": micro.run_micro(args.iterations)}
+    print(micro.format_summary(result["micro"]))
+    if not args.skip_load:
+        result["load"] = load.run_load(nodes=args.nodes, send_ratio=args.send_ratio, duration=args.duration,
+                                       concurrency=args.concurrency, base_port=args.base_port,
+                                       relax_admission=not args.default_admission, seed=args.seed)
+        print(load.format_summary(result["load"]))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\n".join(compare(result, json.load(f))))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'suite')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+# benchmarks/shards.py
+"""
+Write throughput of the ledger versus shard count: client threads deliver incoming transfers to random
+hosted wallets through BankLogic.handle_received_transfer (balance lock, ledger write, GUI scheduling)
+for a fixed time. One shard is the single-file DatabaseManager; more use ShardedDatabaseManager.
+
+Usage (from luck_bank_global/):  python -m benchmarks.shards --shards 1,2,4,8 --threads 16 --duration 10
+Use --dir to put the database files on the disk you want to measure (the default is a temp directory).
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks import ResourceSampler, environment_info, summarize_latencies, write_results
+from benchmarks.node import HeadlessNode
+from utils import generate_address
+
+
+def bench_writes(logic, addresses, threads, duration, seed=None):
+    """Runs `threads` writers against `logic` for `duration` seconds; returns throughput and latency."""
+    remote = generate_address()
+    deadline = time.perf_counter() + duration
+    latencies = [[] for _ in range(threads)]
+    failures = [0] * threads
+
+    def _writer(index):
+        rng = random.Random(None if seed is None else seed + index)
+        while time.perf_counter() < deadline:
+            address = rng.choice(addresses)
+            started = time.perf_counter()
+            if logic.handle_received_transfer(1.0, remote, ("127.0.0.1", 0), address):
+                latencies[index].append(time.perf_counter() - started)
+            else:
+                failures[index] += 1
+
+    sampler = ResourceSampler().start()
+    workers = [threading.Thread(target=_writer, args=(i,), daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    usage = sampler.stop()
+    completed = [lat for per_thread in latencies for lat in per_thread]
+    return {"ops_per_sec": len(completed) / usage["wall_seconds"], "completed": len(completed),
+            "failed": sum(failures), "latency_seconds": summarize_latencies(completed), "resources": usage}
+
+
+def _prepare(logic, wallets):
+    logic.create_wallets(wallets - len(logic.wallets))
+    return list(logic.wallets)
+
+
+def run_shards(shard_counts=(1, 2, 4, 8), threads=16, duration=10.0, wallets=256, base_dir=None, seed=None):
+    results = {"benchmark": "shards", "environment": environment_info(),
+               "params": {"shard_counts": list(shard_counts), "threads": threads, "duration": duration,
+                          "wallets": wallets, "cpu_count": os.cpu_count()}}
+    with tempfile.TemporaryDirectory(prefix="lgb_shards_", dir=base_dir) as db_dir:
+        for count in shard_counts:
+            shard_dir = os.path.join(db_dir, f"shards_{count}")
+            os.mkdir(shard_dir)
+            logic = HeadlessNode(0, shard_dir, shards=count).start(listen=False)
+            try:
+                results[f"shards_{count}"] = bench_writes(logic, _prepare(logic, wallets), threads, duration, seed)
+            finally:
+                logic.stop()
+    baseline = results[f"shards_{shard_counts[0]}"]["ops_per_sec"]
+    for key, entry in results.items():
+        if isinstance(entry, dict) and "ops_per_sec" in entry:
+            entry["speedup"] = entry["ops_per_sec"] / baseline if baseline else None
+    return results
+
+
+def format_summary(result):
+    params = result["params"]
+    lines = [f"shards: {params['threads']} writer threads, {params['wallets']} wallets, {params['duration']}s each, "
+             f"{params['cpu_count']} CPUs"]
+    for key, entry in result.items():
+        if isinstance(entry, dict) and "ops_per_sec" in entry:
+            lat = entry["latency_seconds"]
+            p99 = f"{lat['p99'] * 1e3:8.2f} ms" if lat["count"] else "       -"
+            lines.append(f"  {key:12s} {entry['ops_per_sec']:10.0f} writes/s  x{entry['speedup']:5.2f}  "
+                         f"p99 {p99}  failed {entry['failed']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,2,4,8",
+                        help="Comma-separated shard counts (1 = single file; the first is the baseline)")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent writer threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per configuration")
+    parser.add_argument("--wallets", type=int, default=256)
+    parser.add_argument("--dir", help="Directory for the database files (default: system temp dir)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/shards-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_shards([int(n) for n in args.shards.split(",")], args.threads, args.duration, args.wallets,
+                        args.dir, args.seed)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'shards')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+# benchmarks/signing.py
+"""
+Signature verification throughput: the single-message path with and without the public key cache, and
+SignatureVerifier.verify_batch with 1..cpu_count workers (also normalised per worker).
+
+Needs the optional 'cryptography' package.
+
+Usage (from luck_bank_global/):  python -m benchmarks.signing [--messages N] [--senders N]
+"""
+import argparse
+import logging
+import os
+
+from benchmarks import ResourceSampler, environment_info, write_results
+from signing import (CRYPTO_AVAILABLE, SignatureVerifier, PublicKeyCache, generate_keypair,
+                     address_from_public_key, sign_transfer)
+
+
+def build_messages(count, senders):
+    """Creates `count` signed transfer messages spread over `senders` wallets."""
+    wallets = []
+    for _ in range(senders):
+        private_key, public_key = generate_keypair()
+        wallets.append((private_key, address_from_public_key(public_key)))
+    recipient = address_from_public_key(generate_keypair()[1])
+    messages = []
+    for i in range(count):
+        private_key, address = wallets[i % senders]
+        message = {"action": "transfer", "amount": "1.0", "sender_address": address, "recipient_address": recipient}
+        message.update(sign_transfer(private_key, address, message["amount"], recipient))
+        messages.append(message)
+    return messages
+
+
+def bench_verify(verify, messages):
+    """Runs verify(messages) once; returns verifications/sec and the resources used."""
+    sampler = ResourceSampler().start()
+    results = verify(messages)
+    usage = sampler.stop()
+    if not all(ok for ok, _ in results):
+        raise AssertionError("Benchmark produced rejected signatures")
+    return {"ops_per_sec": len(messages) / usage["wall_seconds"], "resources": usage}
+
+
+def run_signing(messages=5000, senders=50):
+    if not CRYPTO_AVAILABLE:
+        raise RuntimeError("The signing benchmark needs the 'cryptography' package")
+    batch = build_messages(messages, senders)
+    result = {"benchmark": "signing", "environment": environment_info(),
+              "params": {"messages": messages, "senders": senders}}
+
+    # Fresh verifier per run: the replay cache would otherwise reject the second pass
+    cold = SignatureVerifier(key_cache=PublicKeyCache(max_size=1)) # Forces a key parse per message
+    result["sequential_no_key_cache"] = bench_verify(lambda ms: [cold.verify(m) for m in ms], batch)
+    warm = SignatureVerifier()
+    result["sequential_key_cache"] = bench_verify(lambda ms: [warm.verify(m) for m in ms], batch)
+    result["sequential_key_cache"]["key_cache_hits"] = warm.key_cache.hits
+
+    result["batch"] = {}
+    for workers in range(1, (os.cpu_count() or 1) + 1):
+        verifier = SignatureVerifier(max_workers=workers)
+        entry = bench_verify(verifier.verify_batch, batch)
+        verifier.shutdown()
+        entry["ops_per_sec_per_worker"] = entry["ops_per_sec"] / workers
+        result["batch"][str(workers)] = entry
+    return result
+
+
+def format_summary(result):
+    params = result["params"]
+    lines = [f"signing ({params['messages']} messages, {params['senders']} senders, "
+             f"{result['environment']['cpu_count']} cores)",
+             f"  sequential, no key cache  {result['sequential_no_key_cache']['ops_per_sec']:10.0f} verif/s",
+             f"  sequential, LRU key cache {result['sequential_key_cache']['ops_per_sec']:10.0f} verif/s  "
+             f"(hits={result['sequential_key_cache']['key_cache_hits']})"]
+    for workers, entry in result["batch"].items():
+        lines.append(f"  batch, {int(workers):2d} workers         {entry['ops_per_sec']:10.0f} verif/s  "
+                     f"({entry['ops_per_sec_per_worker']:8.0f} per worker)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--senders", type=int, default=50, help="Distinct sender wallets (drives key cache hit rate)")
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/signing-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    if not CRYPTO_AVAILABLE:
+        print("The 'cryptography' package is not installed; nothing to benchmark.")
+        return 1
+    result = run_signing(args.messages, args.senders)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'signing')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+# benchmarks/startup.py
+"""
+Cold-start cost of a node without Tk: each run is a fresh interpreter that imports the application
+modules, opens a ledger (a new file first, then the same file again, which skips the schema DDL) and
+resolves the local IP. Reports the median over --runs.
+
+The GUI writes the same stages (plus window_shown and ready) as a 'startup_report' log record on every
+start; this benchmark tracks the non-GUI part from one commit to the next.
+
+Usage (from luck_bank_global/):  python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import PACKAGE_DIR, environment_info, write_results
+
+# Runs in the child interpreter; prints one JSON object with the timings in seconds
+_CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+from logic import BankLogic
+from sharding import open_database
+from utils import get_local_ip
+timings = {"imports": time.perf_counter() - started}
+for name in ("ledger_new", "ledger_existing"):
+    began = time.perf_counter()
+    db = open_database(sys.argv[1], 1)
+    db.get_wallet_data()
+    db.close()
+    timings[name] = time.perf_counter() - began
+began = time.perf_counter()
+get_local_ip()
+timings["local_ip"] = time.perf_counter() - began
+timings["total"] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def run_once(db_dir, index):
+    db_file = os.path.join(db_dir, f"startup_{index}.db")
+    output = subprocess.run([sys.executable, "-c", _CHILD, db_file], cwd=PACKAGE_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup(runs=10):
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="lgb_startup_") as db_dir:
+        for index in range(runs):
+            samples.append(run_once(db_dir, index))
+    medians = {name: statistics.median(sample[name] for sample in samples) for name in samples[0]}
+    return {"benchmark": "startup", "environment": environment_info(), "params": {"runs": runs},
+            "median_seconds": medians, "samples": samples}
+
+
+def format_summary(result):
+    lines = [f"startup (median of {result['params']['runs']} fresh interpreters)"]
+    for name, seconds in result["median_seconds"].items():
+        lines.append(f"  {name:16s} {seconds * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="Result JSON path (default benchmarks/results/startup-<time>.json)")
+    parser.add_argument("--no-write", action="store_true", help="Print only, don't write a result file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_startup(args.runs)
+    print(format_summary(result))
+    if not args.no_write:
+        print(f"Results written to {write_results(result, args.output, 'startup')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,390 @@
+# codec.py
+import json
+import re
+import struct
+import threading
+from collections import OrderedDict
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError: # Optional dependency: the pure-Python packer below writes the same bytes, only slower
+    MSGPACK_AVAILABLE = False
+
+from config import MAX_MESSAGE_SIZE, P2P_CODEC, P2P_CODEC_CACHE_SIZE
+
+# Binary frames: fixed header, then the body. JSON messages always start with '{', so the magic
+# is enough to tell the two apart on the first bytes of a connection.
+FRAME_MAGIC = b"LB"
+FRAME_VERSION = 1
+_FRAME_HEADER = struct.Struct("!2sBBI") # magic, version, codec id, body length
+FRAME_HEADER_SIZE = _FRAME_HEADER.size
+
+_MAX_DEPTH = 32 # Nesting limit when decoding untrusted bodies
+_HEX_EXT_TYPE = 1 # Lowercase hex strings (signatures, keys, nonces) travel as raw bytes
+_HEX_STRING = re.compile(r"(?:[0-9a-f]{2})+")
+_MIN_HEX_LENGTH = 16 # Shorter strings aren't worth the check
+
+
+class JsonCodec:
+    """The original wire format: one UTF-8 JSON object per message. Spoken by every peer."""
+    name = "json"
+
+    def encode(self, message):
+        return json.dumps(message).encode('utf-8')
+
+    def decode(self, data):
+        return json.loads(data.decode('utf-8').strip())
+
+
+class BinaryCodec:
+    """
+    Framed MessagePack body (the subset the protocol uses: nil, bool, int, float, str, bin, array, map).
+    Lowercase hex strings of 16+ characters are sent as an ext type holding the raw bytes and turned
+    back into the same hex string on decode, which halves signatures and public keys on the wire.
+    Uses the 'msgpack' package when installed. Malformed input raises ValueError.
+    """
+    name = "binary"
+    codec_id = 1
+
+    def encode(self, message):
+        if MSGPACK_AVAILABLE:
+            body = msgpack.packb(_hex_to_ext(message))
+        else:
+            body = bytearray()
+            _pack(message, body)
+        if len(body) > MAX_MESSAGE_SIZE:
+            raise ValueError("Message too large to encode")
+        return _FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, self.codec_id, len(body)) + body
+
+    def decode(self, data):
+        size = frame_size(data)
+        if size is None or len(data) != size:
+            raise ValueError("Truncated or oversized binary frame")
+        if MSGPACK_AVAILABLE:
+            try: # Its errors are ValueErrors already, except running out of data
+                return msgpack.unpackb(memoryview(data)[FRAME_HEADER_SIZE:], ext_hook=_ext_hook)
+            except msgpack.UnpackException as e:
+                raise ValueError(f"Malformed binary message: {e}") from None
+        message, end = _unpack(data, FRAME_HEADER_SIZE, 0)
+        if end != len(data):
+            raise ValueError("Trailing bytes after binary message")
+        return message
+
+
+JSON = JsonCodec()
+CODECS = {} # name -> codec
+_FRAMED_CODECS = {} # frame codec id -> codec
+
+
+def register_codec(codec):
+    """Makes a codec available for negotiation. Framed codecs need a unique `codec_id`."""
+    CODECS[codec.name] = codec
+    if hasattr(codec, 'codec_id'):
+        _FRAMED_CODECS[codec.codec_id] = codec
+
+
+register_codec(JSON)
+register_codec(BinaryCodec())
+
+
+def frame_size(data):
+    """
+    Total size (header included) of the binary frame at the start of `data`, or None while the header
+    is incomplete. Raises ValueError for a bad header or a body larger than MAX_MESSAGE_SIZE.
+    """
+    if len(data) < FRAME_HEADER_SIZE:
+        return None
+    magic, version, codec_id, body_length = _FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("Unsupported frame header")
+    if codec_id not in _FRAMED_CODECS:
+        raise ValueError(f"Unknown codec id {codec_id}")
+    if body_length > MAX_MESSAGE_SIZE:
+        raise ValueError("Frame body too large")
+    return FRAME_HEADER_SIZE + body_length
+
+
+def is_framed(data):
+    """True if `data` starts like a binary frame (JSON never does)."""
+    return data[:len(FRAME_MAGIC)] == FRAME_MAGIC
+
+
+def message_complete(data):
+    """True once `data` holds a whole message: the full frame, or (JSON) a closing brace."""
+    if is_framed(data):
+        size = frame_size(data)
+        return size is not None and len(data) >= size
+    return data.rstrip().endswith(b'}')
+
+
+def detect_codec(data):
+    """Returns the codec a received message was encoded with. Raises ValueError for a bad or partial header."""
+    if is_framed(data):
+        if frame_size(data) is None: # Validates the header
+            raise ValueError("Truncated binary frame header")
+        return _FRAMED_CODECS[data[len(FRAME_MAGIC) + 1]]
+    return JSON
+
+
+def preferred_codec_name():
+    """
+    P2P_CODEC, except that "binary" falls back to "json" without msgpack: the pure-Python packer is
+    several times slower than the stdlib json module, so it only serves frames sent to us by other nodes.
+    """
+    if P2P_CODEC != JSON.name and not MSGPACK_AVAILABLE:
+        return JSON.name
+    return P2P_CODEC
+
+
+class CodecNegotiator:
+    """
+    Remembers, per peer endpoint, whether the peer speaks the preferred codec.
+
+    Unknown peers always get JSON, so nodes that predate the binary format are never sent a frame they
+    can't parse. Upgraded nodes list their codecs in every JSON response ("codecs"); once a peer has
+    advertised the preferred codec, later connections to it use that codec. A failed exchange in the
+    preferred codec drops the peer back to JSON until it advertises again.
+    """
+
+    def __init__(self, preferred=None, max_peers=P2P_CODEC_CACHE_SIZE):
+        self.preferred = CODECS[preferred or preferred_codec_name()]
+        self.max_peers = max_peers
+        self._peers = OrderedDict() # (ip, port) -> codec
+        self._lock = threading.Lock()
+
+    def codec_for(self, ip, port):
+        with self._lock:
+            return self._peers.get((ip, port), JSON)
+
+    def record_response(self, ip, port, response):
+        """Learns from a decoded JSON response whether the peer advertises the preferred codec."""
+        if self.preferred is JSON or not isinstance(response, dict):
+            return
+        codecs = response.get("codecs")
+        if isinstance(codecs, list) and self.preferred.name in codecs:
+            with self._lock:
+                self._peers[(ip, port)] = self.preferred
+                self._peers.move_to_end((ip, port))
+                while len(self._peers) > self.max_peers:
+                    self._peers.popitem(last=False)
+
+    def record_failure(self, ip, port):
+        with self._lock:
+            self._peers.pop((ip, port), None)
+
+
+# --- MessagePack packing ---
+def _is_hex(text):
+    n = len(text)
+    return n >= _MIN_HEX_LENGTH and not n & 1 and _HEX_STRING.fullmatch(text) is not None
+
+
+def _hex_to_ext(obj):
+    """Copy of `obj` with hex strings replaced by msgpack ExtTypes (what _pack does inline)."""
+    kind = type(obj)
+    if kind is str:
+        return msgpack.ExtType(_HEX_EXT_TYPE, bytes.fromhex(obj)) if _is_hex(obj) else obj
+    if kind is dict:
+        return {key: _hex_to_ext(value) for key, value in obj.items()}
+    if kind is list or kind is tuple:
+        return [_hex_to_ext(item) for item in obj]
+    return obj
+
+
+def _pack(obj, out):
+    kind = type(obj)
+    if kind is str:
+        if _is_hex(obj):
+            _pack_ext(_HEX_EXT_TYPE, bytes.fromhex(obj), out)
+            return
+        data = obj.encode('utf-8')
+        n = len(data)
+        if n < 32:
+            out.append(0xa0 | n)
+        elif n < 0x100:
+            out += b'\xd9' + n.to_bytes(1, 'big')
+        elif n < 0x10000:
+            out += b'\xda' + n.to_bytes(2, 'big')
+        else:
+            out += b'\xdb' + n.to_bytes(4, 'big')
+        out += data
+    elif kind is dict:
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n < 0x10000:
+            out += b'\xde' + n.to_bytes(2, 'big')
+        else:
+            out += b'\xdf' + n.to_bytes(4, 'big')
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    elif kind is int:
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif 0 <= obj < 0x10000: # Ports
+            out += b'\xcd' + obj.to_bytes(2, 'big')
+        elif 0 <= obj < 0x100000000: # Timestamps
+            out += b'\xce' + obj.to_bytes(4, 'big')
+        elif 0 <= obj < 0x10000000000000000:
+            out += b'\xcf' + obj.to_bytes(8, 'big')
+        elif -0x8000000000000000 <= obj < 0:
+            out += b'\xd3' + obj.to_bytes(8, 'big', signed=True)
+        else:
+            raise ValueError("Integer out of 64-bit range")
+    elif kind is float:
+        out += b'\xcb' + struct.pack("!d", obj)
+    elif obj is None:
+        out.append(0xc0)
+    elif kind is bool:
+        out.append(0xc3 if obj else 0xc2)
+    elif kind is list or kind is tuple:
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n < 0x10000:
+            out += b'\xdc' + n.to_bytes(2, 'big')
+        else:
+            out += b'\xdd' + n.to_bytes(4, 'big')
+        for item in obj:
+            _pack(item, out)
+    elif kind is bytes:
+        n = len(obj)
+        if n < 0x100:
+            out += b'\xc4' + n.to_bytes(1, 'big')
+        elif n < 0x10000:
+            out += b'\xc5' + n.to_bytes(2, 'big')
+        else:
+            out += b'\xc6' + n.to_bytes(4, 'big')
+        out += obj
+    else:
+        raise ValueError(f"Cannot encode {kind.__name__} in a binary message")
+
+
+def _pack_ext(ext_type, data, out):
+    n = len(data)
+    fixed = {1: 0xd4, 2: 0xd5, 4: 0xd6, 8: 0xd7, 16: 0xd8}.get(n)
+    if fixed is not None:
+        out.append(fixed)
+    elif n < 0x100:
+        out += b'\xc7' + n.to_bytes(1, 'big')
+    elif n < 0x10000:
+        out += b'\xc8' + n.to_bytes(2, 'big')
+    else:
+        out += b'\xc9' + n.to_bytes(4, 'big')
+    out.append(ext_type)
+    out += data
+
+
+# --- MessagePack unpacking ---
+_INT_FORMATS = {0xcc: ">B", 0xcd: ">H", 0xce: ">I", 0xcf: ">Q", 0xd0: ">b", 0xd1: ">h", 0xd2: ">i", 0xd3: ">q",
+                0xca: ">f", 0xcb: ">d"}
+_FIXED_EXT_SIZES = {0xd4: 1, 0xd5: 2, 0xd6: 4, 0xd7: 8, 0xd8: 16}
+_LENGTH_FORMATS = {1: ">B", 2: ">H", 4: ">I"}
+
+
+def _read_length(data, pos, size):
+    end = pos + size
+    if end > len(data):
+        raise ValueError("Truncated binary message")
+    return struct.unpack_from(_LENGTH_FORMATS[size], data, pos)[0], end
+
+
+def _take(data, pos, n):
+    end = pos + n
+    if end > len(data):
+        raise ValueError("Truncated binary message")
+    return data[pos:end], end
+
+
+def _unpack(data, pos, depth):
+    """Decodes one value starting at data[pos]; returns (value, next position)."""
+    if pos >= len(data):
+        raise ValueError("Truncated binary message")
+    tag = data[pos]
+    pos += 1
+    if 0xa0 <= tag <= 0xbf: # fixstr, by far the most common
+        end = pos + (tag & 0x1f)
+        if end > len(data):
+            raise ValueError("Truncated binary message")
+        return data[pos:end].decode('utf-8'), end
+    if tag < 0x80: # positive fixint
+        return tag, pos
+    if tag <= 0x8f:
+        return _unpack_map(data, pos, tag & 0x0f, depth)
+    if tag <= 0x9f:
+        return _unpack_array(data, pos, tag & 0x0f, depth)
+    if tag >= 0xe0: # negative fixint
+        return tag - 0x100, pos
+    if tag == 0xc0:
+        return None, pos
+    if tag == 0xc2 or tag == 0xc3:
+        return tag == 0xc3, pos
+    fmt = _INT_FORMATS.get(tag) # ints and floats
+    if fmt is not None:
+        raw, end = _take(data, pos, struct.calcsize(fmt))
+        return struct.unpack(fmt, raw)[0], end
+    if 0xd9 <= tag <= 0xdb:
+        n, pos = _read_length(data, pos, 1 << (tag - 0xd9))
+        raw, end = _take(data, pos, n)
+        return raw.decode('utf-8'), end
+    if 0xc4 <= tag <= 0xc6:
+        n, pos = _read_length(data, pos, 1 << (tag - 0xc4))
+        return _take(data, pos, n)
+    if tag == 0xdc or tag == 0xdd:
+        n, pos = _read_length(data, pos, 2 if tag == 0xdc else 4)
+        return _unpack_array(data, pos, n, depth)
+    if tag == 0xde or tag == 0xdf:
+        n, pos = _read_length(data, pos, 2 if tag == 0xde else 4)
+        return _unpack_map(data, pos, n, depth)
+    if tag in _FIXED_EXT_SIZES:
+        n = _FIXED_EXT_SIZES[tag]
+    elif 0xc7 <= tag <= 0xc9:
+        n, pos = _read_length(data, pos, 1 << (tag - 0xc7))
+    else:
+        raise ValueError(f"Invalid type byte 0x{tag:02x}")
+    ext_type, pos = _take(data, pos, 1)
+    raw, end = _take(data, pos, n)
+    return _ext_hook(ext_type[0], raw), end
+
+
+def _ext_hook(ext_type, data):
+    if ext_type != _HEX_EXT_TYPE:
+        raise ValueError(f"Unknown ext type {ext_type}")
+    return data.hex()
+
+
+def _unpack_array(data, pos, n, depth):
+    if depth >= _MAX_DEPTH:
+        raise ValueError("Binary message nested too deeply")
+    if n > len(data) - pos: # Every element takes at least one byte
+        raise ValueError("Truncated binary message")
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos, depth + 1)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data, pos, n, depth):
+    if depth >= _MAX_DEPTH:
+        raise ValueError("Binary message nested too deeply")
+    if 2 * n > len(data) - pos:
+        raise ValueError("Truncated binary message")
+    result = {}
+    for _ in range(n):
+        tag = data[pos] if pos < len(data) else None
+        if tag is not None and 0xa0 <= tag <= 0xbf: # Keys are nearly always short strings
+            end = pos + 1 + (tag & 0x1f)
+            if end > len(data):
+                raise ValueError("Truncated binary message")
+            key, pos = data[pos + 1:end].decode('utf-8'), end
+        else:
+            key, pos = _unpack(data, pos, depth + 1)
+            if type(key) is not str:
+                raise ValueError("Map keys must be strings")
+        result[key], pos = _unpack(data, pos, depth + 1)
+    return result, pos
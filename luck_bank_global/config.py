@@ -5,9 +5,17 @@ import logging
 APP_NAME = "Luck Global Bank (Steady)"
 TOKEN_NAME = "ONTIME"
 DATABASE_FILENAME = "luck_bank_data.db"
+DATABASE_SHARDS = 1 # >1 spreads wallets over that many SQLite files (<name>.shard<N>.db), one writer thread each
 LOG_DIRECTORY = "log"
 LOG_FILENAME = "bank_app.log"
 LOG_LEVEL = logging.INFO # DEBUG, INFO, WARNING, ERROR, CRITICAL
+LOG_JSON_FILE = True # Write the log file as JSON lines (console stays human-readable)
+LOG_ROTATION = "size" # "size", "time" or None
+LOG_MAX_BYTES = 10 * 1024 * 1024 # Size-based rotation threshold
+LOG_ROTATE_WHEN = "midnight" # Time-based rotation interval (see logging.handlers.TimedRotatingFileHandler)
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000 # Records buffered for the background log writer; excess records are dropped
+TRANSFER_DEBUG_SAMPLE_RATE = 0.0 # Fraction of per-transfer DEBUG records kept (0 disables them, 1 keeps all)
 
 # --- Token Issuance ---
 ISSUANCE_INTERVAL_MINUTES = 20 # Every 20 minutes
@@ -17,10 +25,67 @@ ISSUANCE_AMOUNT = 1.0
 DEFAULT_P2P_PORT = 61001 # Slightly different port from previous example
 SOCKET_TIMEOUT = 15.0 # Seconds for connection/send/receive attempts
 SOCKET_BUFFER_SIZE = 2048
+MAX_MESSAGE_SIZE = SOCKET_BUFFER_SIZE * 64 # Upper bound for one incoming message (batches included)
+LISTENER_WORKERS = 1 # >1 receives in that many processes sharing the port (SO_REUSEPORT, Linux/BSD)
+LISTENER_WORKER_START_TIMEOUT = 10.0 # Seconds to wait for worker processes to bind
+P2P_CODEC = "binary" # Preferred wire format ("binary" or "json"); "binary" needs msgpack, else JSON is kept
+P2P_CODEC_CACHE_SIZE = 4096 # Peer endpoints whose codec support is remembered
+
+# --- Admission Control ---
+MAX_CONCURRENT_HANDLERS = 64 # Global cap on connection handler threads
+PEER_RATE_LIMIT_PER_SEC = 5.0 # Token bucket refill rate per source IP (connections/sec)
+PEER_RATE_BURST = 20 # Token bucket capacity per source IP
+PEER_INVALID_STRIKES = 5 # Invalid messages within PEER_STRIKE_WINDOW_SECONDS before a ban
+PEER_STRIKE_WINDOW_SECONDS = 60
+PEER_BAN_SECONDS = 300 # Temporary ban duration
+PEER_TABLE_MAX = 10000 # Per-IP state entries kept before idle ones are pruned
+
+# --- Peer Directory ---
+PEER_CACHE_TTL_SECONDS = 600 # In-memory address -> endpoint entries are re-read from the DB after this
+PEER_FLUSH_INTERVAL_SECONDS = 5 # Learned endpoints are written to the DB in batches this often
+PEER_EXPIRY_DAYS = 30 # Peers not seen for this long are pruned from the directory
+
+# --- Gossip Discovery ---
+GOSSIP_ENABLED = True # Exchange known peers with other nodes ('hello'/'peers' messages)
+GOSSIP_SEED_PEERS = [] # "IP:PORT" endpoints contacted at startup, e.g. ["192.168.1.5:61001"]
+GOSSIP_INTERVAL_SECONDS = 15 # Mean time between gossip rounds (each round is jittered +/-50%)
+GOSSIP_FANOUT = 3 # Peers contacted per round
+GOSSIP_SAMPLE_SIZE = 16 # Known peers sent (and accepted) per 'peers' message
+GOSSIP_HELLOS_PER_ROUND = 4 # Newly learned endpoints greeted per round
+GOSSIP_MAX_PEERS = 256 # Known-peer set bound; the stalest entry is evicted when full
+GOSSIP_PEER_MAX_AGE_SECONDS = 3600 # Entries not seen (directly or via gossip) for this long are dropped
+GOSSIP_MAX_FAILURES = 3 # Consecutive failed contacts before a peer is forgotten
+GOSSIP_TIMEOUT_SECONDS = 3.0 # Connect/receive timeout for one gossip exchange
+GOSSIP_OBSERVED_IP_QUORUM = 2 # Distinct peers that must report the same external IP before it is shown
+
+# --- Metrics ---
+METRICS_HTTP_HOST = "127.0.0.1" # Prometheus endpoint only listens locally by default
+METRICS_HTTP_PORT = None # e.g. 9101 to serve GET /metrics; None disables the endpoint
+
+# --- Profiling ---
+PROFILE_DEFAULT_SECONDS = 30 # Window profiled when started from the GUI or the control signal
+PROFILE_SAMPLE_INTERVAL_MS = 5 # Sampling profiler interval
+PROFILE_CONTROL_SIGNAL = "SIGUSR1" # `kill -USR1 <pid>` toggles profiling (POSIX only)
+
+# --- Export / Import ---
+EXPORT_CHUNK_ROWS = 5000 # Transaction rows fetched and written per chunk; bounds export memory
+EXPORT_PARQUET_ROW_GROUP = 65536 # Rows per Parquet row group (buffered in memory before each write)
+IMPORT_BATCH_ROWS = 50000 # Rows inserted per transaction during a bulk import
 
 # --- Wallet ---
 ADDRESS_PREFIX = "LGBX_" # Changed prefix slightly
-ADDRESS_LENGTH = 32
+ADDRESS_LENGTH = 32 # Base32 characters before the checksum
+ADDRESS_CHECKSUM_LENGTH = 4 # Base32 checksum characters appended for typo detection
+ACCEPT_LEGACY_ADDRESSES = True # Accept pre-checksum addresses (prefix + ADDRESS_LENGTH alphanumerics)
+HOSTED_WALLETS = 1 # Wallets hosted by this node (one listener, one DB); missing ones are created at startup
+
+# --- Signing ---
+SIGNATURE_REQUIRED = False # Reject unsigned transfers when True (legacy peers send unsigned)
+SIGNATURE_MAX_AGE_SECONDS = 300 # Signed transfers older than this are rejected
+SIGNATURE_VERIFY_WORKERS = 4 # Worker threads used for batch signature verification
+PUBLIC_KEY_CACHE_SIZE = 1024 # Parsed public keys kept in memory (LRU, keyed by address)
+REPLAY_CACHE_SIZE = 262144 # Unexpired signatures kept to reject replays (~870 transfers/s); when full, new ones are refused
+TRANSFER_BATCH_MAX = 64 # Max transfers accepted in one 'transfer_batch' message
 
 # --- GUI ---
 WINDOW_TITLE = f"{APP_NAME} - Node"
@@ -1,15 +1,44 @@
 # database.py
+import itertools
 import sqlite3
 import logging
-from config import DATABASE_FILENAME
-from utils import generate_address
+import time
+from config import DATABASE_FILENAME, EXPORT_CHUNK_ROWS, IMPORT_BATCH_ROWS
+from utils import generate_address, generate_addresses
 from config import ADDRESS_PREFIX, ADDRESS_LENGTH
+from signing import CRYPTO_AVAILABLE, generate_keypair, address_from_public_key
+from metrics import REGISTRY
+
+DB_COMMIT_SECONDS = REGISTRY.histogram("db_commit_seconds", "Balance update + transaction insert, BEGIN to COMMIT")
+DB_COMMIT_FAILURES = REGISTRY.counter("db_commit_failures_total", "Balance/transaction writes rolled back or failed")
+
+# Stored in PRAGMA user_version once _init_db has brought a file up to date; bump it with every schema change
+SCHEMA_VERSION = 1
+
+_WALLET_COLUMNS = "id, address, balance, private_key, public_key, label"
+# Column order of exported/imported transaction rows (see ledger_io)
+TRANSACTION_COLUMNS = ("id", "wallet_id", "timestamp", "type", "amount", "remote_address", "local_balance_after",
+                       "details")
+TRANSACTION_TYPES = ('issuance', 'sent', 'received')
+_WALLET_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        address TEXT UNIQUE NOT NULL,
+        balance REAL NOT NULL DEFAULT 0.0,
+        private_key TEXT, -- Ed25519 signing key (hex), NULL for legacy unsigned wallets
+        public_key TEXT,
+        label TEXT -- Optional operator-assigned name
+    )
+'''
 
 class DatabaseManager:
     def __init__(self, db_file=DATABASE_FILENAME):
         self.db_file = db_file
         self._init_db()
 
+    def close(self):
+        """Nothing to release: connections are opened per operation. (ShardedDatabaseManager stops its writers.)"""
+
     def _get_connection(self):
         """Creates a database connection."""
         try:
@@ -24,22 +53,30 @@ class DatabaseManager:
             raise  # Re-raise the critical error
 
     def _init_db(self):
-        """Initializes the database tables if they don't exist."""
+        """Initializes the database tables if they don't exist. Files already at SCHEMA_VERSION skip the DDL."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                # Wallet Table (should only ever have one row for this app instance)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS wallet (
-                        id INTEGER PRIMARY KEY CHECK (id = 1), -- Enforce only one row
-                        address TEXT UNIQUE NOT NULL,
-                        balance REAL NOT NULL DEFAULT 0.0
-                    )
-                ''')
+                version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                if version >= SCHEMA_VERSION:
+                    if version > SCHEMA_VERSION:
+                        logging.warning(f"Database schema version {version} is newer than this build "
+                                        f"({SCHEMA_VERSION}).")
+                    logging.info(f"Database schema is current (version {version}).")
+                    return
+                # Wallet Table: one row per hosted wallet; id 1 is the node's primary wallet
+                cursor.execute(_WALLET_TABLE_SQL.format(table="wallet"))
+                # Older databases predate the keypair and label columns
+                wallet_columns = {row['name'] for row in cursor.execute("PRAGMA table_info(wallet)")}
+                for column in ('private_key', 'public_key', 'label'):
+                    if column not in wallet_columns:
+                        cursor.execute(f"ALTER TABLE wallet ADD COLUMN {column} TEXT")
+                self._migrate_single_wallet_table(cursor)
                 # Transactions Table
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS transactions (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        wallet_id INTEGER NOT NULL DEFAULT 1 REFERENCES wallet(id), -- Hosted wallet the row belongs to
                         timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
                         type TEXT NOT NULL CHECK(type IN ('issuance', 'sent', 'received')),
                         amount REAL NOT NULL,
@@ -48,35 +85,86 @@ class DatabaseManager:
                         details TEXT -- e.g., Recipient IP:Port for sent transactions
                     )
                 ''')
+                if 'wallet_id' not in {row['name'] for row in cursor.execute("PRAGMA table_info(transactions)")}:
+                    # Rows written before multi-wallet hosting belong to the primary wallet
+                    cursor.execute("ALTER TABLE transactions ADD COLUMN wallet_id INTEGER NOT NULL DEFAULT 1 "
+                                   "REFERENCES wallet(id)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp DESC);")
+                # Per-wallet history reads
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_wallet_timestamp "
+                               "ON transactions (wallet_id, timestamp DESC);")
+                # Peer directory: wallet address -> P2P endpoint (see peers.PeerDirectory)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS peers (
+                        address TEXT PRIMARY KEY,
+                        ip TEXT NOT NULL,
+                        port INTEGER NOT NULL,
+                        last_seen REAL NOT NULL, -- Unix time
+                        source TEXT -- How it was learned, e.g. 'transfer', 'send_ack'
+                    )
+                ''')
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_peers_last_seen ON peers (last_seen);")
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
                 logging.info("Database tables checked/created successfully.")
         except sqlite3.Error as e:
             logging.error(f"Database initialization failed: {e}")
             raise
 
-    def get_wallet_data(self):
-        """Retrieves wallet address and balance, creating if necessary."""
+    def _migrate_single_wallet_table(self, cursor):
+        """Rebuilds a wallet table created with the old single-row CHECK (id = 1) constraint (keeps all data)."""
+        row = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'wallet'").fetchone()
+        if not row or "CHECK (id = 1)" not in row['sql']:
+            return
+        cursor.execute("BEGIN TRANSACTION;")
+        try:
+            cursor.execute(_WALLET_TABLE_SQL.format(table="wallet_migrated"))
+            cursor.execute("""INSERT INTO wallet_migrated (id, address, balance, private_key, public_key, label)
+                              SELECT id, address, balance, private_key, public_key, label FROM wallet""")
+            cursor.execute("DROP TABLE wallet")
+            cursor.execute("ALTER TABLE wallet_migrated RENAME TO wallet")
+            cursor.execute("COMMIT;")
+            logging.info("Migrated wallet table to multi-wallet layout.")
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK;")
+            raise
+
+    @staticmethod
+    def _new_wallet_identity(address=None):
+        """Returns (address, private_key, public_key) for a new wallet; keys are None without signing support."""
+        if CRYPTO_AVAILABLE:
+            private_key, public_key = generate_keypair()
+            return address_from_public_key(public_key, ADDRESS_PREFIX, ADDRESS_LENGTH), private_key, public_key
+        return address or generate_address(ADDRESS_PREFIX, ADDRESS_LENGTH), None, None
+
+    def get_wallet_data(self, wallet_id=1):
+        """Retrieves wallet address and balance, creating the primary wallet (id 1) if necessary."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT address, balance FROM wallet WHERE id = 1")
+                cursor.execute(f"SELECT {_WALLET_COLUMNS} FROM wallet WHERE id = ?", (wallet_id,))
                 data = cursor.fetchone()
 
                 if data:
                     logging.info(f"Wallet data loaded: Address={data['address']}, Balance={data['balance']}")
-                    return {"address": data['address'], "balance": float(data['balance'])}
+                    return self._wallet_dict(data)
+                elif wallet_id != 1:
+                    logging.error(f"Wallet {wallet_id} does not exist.")
+                    return None
                 else:
-                    # Create new wallet entry
-                    new_address = generate_address(ADDRESS_PREFIX, ADDRESS_LENGTH)
+                    # Create new wallet entry; the address is derived from a fresh keypair when signing is available
+                    if not CRYPTO_AVAILABLE:
+                        logging.warning("'cryptography' not installed: creating an unsigned wallet.")
+                    new_address, private_key, public_key = self._new_wallet_identity()
                     initial_balance = 0.0
-                    cursor.execute("INSERT OR IGNORE INTO wallet (id, address, balance) VALUES (1, ?, ?)",
-                                   (new_address, initial_balance))
+                    cursor.execute("""INSERT OR IGNORE INTO wallet (id, address, balance, private_key, public_key)
+                                      VALUES (1, ?, ?, ?, ?)""",
+                                   (new_address, initial_balance, private_key, public_key))
                     # Fetch again to confirm insertion (or if another instance inserted first)
-                    cursor.execute("SELECT address, balance FROM wallet WHERE id = 1")
+                    cursor.execute(f"SELECT {_WALLET_COLUMNS} FROM wallet WHERE id = 1")
                     data = cursor.fetchone()
                     if data:
                          logging.info(f"New wallet created: Address={data['address']}, Balance={data['balance']}")
-                         return {"address": data['address'], "balance": float(data['balance'])}
+                         return self._wallet_dict(data)
                     else:
                          # This should ideally not happen with INSERT OR IGNORE and id=1 check
                          logging.error("Failed to create or retrieve wallet data after insertion attempt.")
@@ -84,48 +172,352 @@ class DatabaseManager:
         except sqlite3.Error as e:
             logging.error(f"Failed to get wallet data: {e}")
             # Provide default safe values to allow app to potentially continue partially
-            return {"address": "DB_ERROR", "balance": 0.0}
+            return {"address": "DB_ERROR", "balance": 0.0, "private_key": None, "public_key": None}
+
+    @staticmethod
+    def _wallet_dict(row):
+        """Converts a wallet row into the dict returned by get_wallet_data."""
+        return {"id": row['id'], "address": row['address'], "balance": float(row['balance']),
+                "private_key": row['private_key'], "public_key": row['public_key'], "label": row['label']}
+
+    def get_wallets(self):
+        """Returns every hosted wallet (same dicts as get_wallet_data), ordered by id."""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute(f"SELECT {_WALLET_COLUMNS} FROM wallet ORDER BY id").fetchall()
+                return [self._wallet_dict(row) for row in rows]
+        except sqlite3.Error as e:
+            logging.error(f"Failed to list wallets: {e}")
+            return []
+
+    def create_wallets(self, count, label=None, ids=None):
+        """
+        Creates `count` additional wallets in one transaction. Returns their dicts ([] on failure).
+        `ids` assigns explicit wallet ids (the sharded backend keeps ids unique across shard files).
+        """
+        # Without signing support the addresses are random; mint them in one batch
+        addresses = generate_addresses(count, ADDRESS_PREFIX, ADDRESS_LENGTH) if not CRYPTO_AVAILABLE else [None] * count
+        identities = [self._new_wallet_identity(address) for address in addresses]
+        try:
+            with self._get_connection() as conn:
+                conn.execute("BEGIN TRANSACTION;")
+                try:
+                    conn.executemany("INSERT INTO wallet (id, address, balance, private_key, public_key, label) "
+                                     "VALUES (?, ?, 0.0, ?, ?, ?)",
+                                     [(wallet_id, address, private_key, public_key, label)
+                                      for wallet_id, (address, private_key, public_key)
+                                      in zip(ids or [None] * count, identities)])
+                    conn.execute("COMMIT;")
+                except sqlite3.Error as inner_e:
+                    conn.execute("ROLLBACK;")
+                    logging.error(f"Failed to create wallets, rolling back: {inner_e}")
+                    return []
+                placeholders = ",".join("?" * len(identities))
+                rows = conn.execute(f"SELECT {_WALLET_COLUMNS} FROM wallet WHERE address IN ({placeholders}) "
+                                    "ORDER BY id", [identity[0] for identity in identities]).fetchall()
+                logging.info(f"Created {len(rows)} wallets")
+                return [self._wallet_dict(row) for row in rows]
+        except sqlite3.Error as e:
+            logging.error(f"Failed to create wallets: {e}")
+            return []
 
 
-    def update_balance_add_transaction(self, tx_type, amount, new_balance, remote_address=None, details=None):
-        """Atomically updates balance and adds a transaction record."""
+    def update_balance_add_transaction(self, tx_type, amount, new_balance, remote_address=None, details=None,
+                                       wallet_id=1):
+        """Atomically updates a wallet's balance and adds a transaction record."""
         try:
             with self._get_connection() as conn:
                  # Use a transaction block for atomicity
+                 started_at = time.perf_counter()
                  conn.execute("BEGIN TRANSACTION;")
                  try:
                      # Update balance
-                     conn.execute("UPDATE wallet SET balance = ? WHERE id = 1", (new_balance,))
+                     conn.execute("UPDATE wallet SET balance = ? WHERE id = ?", (new_balance, wallet_id))
 
                      # Add transaction log
                      conn.execute('''
-                         INSERT INTO transactions (type, amount, remote_address, local_balance_after, details)
-                         VALUES (?, ?, ?, ?, ?)
-                     ''', (tx_type, amount, remote_address, new_balance, details))
+                         INSERT INTO transactions (wallet_id, type, amount, remote_address, local_balance_after, details)
+                         VALUES (?, ?, ?, ?, ?, ?)
+                     ''', (wallet_id, tx_type, amount, remote_address, new_balance, details))
 
                      conn.execute("COMMIT;") # Commit changes
-                     logging.info(f"Transaction recorded: Type={tx_type}, Amount={amount}, New Balance={new_balance}")
+                     DB_COMMIT_SECONDS.observe(time.perf_counter() - started_at)
+                     logging.info("Transaction recorded: Type=%s, Amount=%s, New Balance=%s", tx_type, amount, new_balance,
+                                  extra={"event": "transaction_recorded", "tx_type": tx_type, "amount": amount})
                      return True
                  except sqlite3.Error as inner_e:
                       conn.execute("ROLLBACK;") # Rollback on error within transaction
+                      DB_COMMIT_FAILURES.inc()
                       logging.error(f"Database transaction failed, rolling back: {inner_e}")
                       return False
         except sqlite3.Error as e:
             logging.error(f"Failed to update balance/add transaction: {e}")
             return False
 
-    def get_transaction_history(self, limit=100):
-        """Retrieves the most recent transaction records."""
+    def transfer_between_wallets(self, from_wallet_id, to_wallet_id, amount, details=None):
+        """
+        Moves `amount` between two hosted wallets without touching the network: both balance updates and both
+        transaction rows commit in one transaction. Returns (from_balance, to_balance), or None if the source
+        wallet has insufficient funds or the write failed.
+        """
+        try:
+            with self._get_connection() as conn:
+                started_at = time.perf_counter()
+                conn.execute("BEGIN TRANSACTION;")
+                try:
+                    if conn.execute("UPDATE wallet SET balance = balance - ? WHERE id = ? AND balance >= ?",
+                                    (amount, from_wallet_id, amount)).rowcount != 1:
+                        conn.execute("ROLLBACK;")
+                        return None
+                    conn.execute("UPDATE wallet SET balance = balance + ? WHERE id = ?", (amount, to_wallet_id))
+                    conn.executemany('''
+                        INSERT INTO transactions (wallet_id, type, amount, remote_address, local_balance_after, details)
+                        SELECT ?, ?, ?, (SELECT address FROM wallet WHERE id = ?), balance, ? FROM wallet WHERE id = ?
+                    ''', [(from_wallet_id, 'sent', amount, to_wallet_id, details, from_wallet_id),
+                          (to_wallet_id, 'received', amount, from_wallet_id, details, to_wallet_id)])
+                    balances = dict(conn.execute("SELECT id, balance FROM wallet WHERE id IN (?, ?)",
+                                                 (from_wallet_id, to_wallet_id)).fetchall())
+                    conn.execute("COMMIT;")
+                    DB_COMMIT_SECONDS.observe(time.perf_counter() - started_at)
+                    logging.info("Local transfer recorded: %s from wallet %s to wallet %s", amount, from_wallet_id,
+                                 to_wallet_id, extra={"event": "local_transfer_recorded", "amount": amount})
+                    return balances[from_wallet_id], balances[to_wallet_id]
+                except sqlite3.Error as inner_e:
+                    conn.execute("ROLLBACK;")
+                    DB_COMMIT_FAILURES.inc()
+                    logging.error(f"Local transfer failed, rolling back: {inner_e}")
+                    return None
+        except sqlite3.Error as e:
+            logging.error(f"Failed to record local transfer: {e}")
+            return None
+
+    def apply_balance_delta(self, wallet_id, tx_type, amount, delta, remote_address=None, details=None):
+        """
+        Adds `delta` to a wallet's balance (refusing to go below zero) and logs one transaction row, in one
+        transaction. Returns the new balance, or None if funds were insufficient or the write failed.
+        """
+        try:
+            with self._get_connection() as conn:
+                started_at = time.perf_counter()
+                conn.execute("BEGIN TRANSACTION;")
+                try:
+                    if conn.execute("UPDATE wallet SET balance = balance + ? WHERE id = ? AND balance + ? >= 0",
+                                    (delta, wallet_id, delta)).rowcount != 1:
+                        conn.execute("ROLLBACK;")
+                        return None
+                    new_balance = conn.execute("SELECT balance FROM wallet WHERE id = ?", (wallet_id,)).fetchone()[0]
+                    conn.execute('''
+                        INSERT INTO transactions (wallet_id, type, amount, remote_address, local_balance_after, details)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (wallet_id, tx_type, amount, remote_address, new_balance, details))
+                    conn.execute("COMMIT;")
+                    DB_COMMIT_SECONDS.observe(time.perf_counter() - started_at)
+                    return new_balance
+                except sqlite3.Error as inner_e:
+                    conn.execute("ROLLBACK;")
+                    DB_COMMIT_FAILURES.inc()
+                    logging.error(f"Balance change failed, rolling back: {inner_e}")
+                    return None
+        except sqlite3.Error as e:
+            logging.error(f"Failed to apply balance change: {e}")
+            return None
+
+    def apply_issuance(self, amount, details=None):
+        """
+        Credits `amount` to every hosted wallet and logs one issuance row each, in a single transaction
+        (two statements regardless of the wallet count). Returns {wallet_id: new_balance}, or None on failure.
+        """
+        try:
+            with self._get_connection() as conn:
+                started_at = time.perf_counter()
+                conn.execute("BEGIN TRANSACTION;")
+                try:
+                    conn.execute("UPDATE wallet SET balance = balance + ?", (amount,))
+                    conn.execute("""INSERT INTO transactions (wallet_id, type, amount, local_balance_after, details)
+                                    SELECT id, 'issuance', ?, balance, ? FROM wallet""", (amount, details))
+                    balances = dict(conn.execute("SELECT id, balance FROM wallet").fetchall())
+                    conn.execute("COMMIT;")
+                    DB_COMMIT_SECONDS.observe(time.perf_counter() - started_at)
+                    logging.info("Issuance of %s recorded for %d wallets", amount, len(balances),
+                                 extra={"event": "issuance_recorded", "amount": amount, "wallets": len(balances)})
+                    return balances
+                except sqlite3.Error as inner_e:
+                    conn.execute("ROLLBACK;")
+                    DB_COMMIT_FAILURES.inc()
+                    logging.error(f"Issuance failed, rolling back: {inner_e}")
+                    return None
+        except sqlite3.Error as e:
+            logging.error(f"Failed to apply issuance: {e}")
+            return None
+
+    def get_transaction_history(self, limit=100, wallet_id=1):
+        """Retrieves a wallet's most recent transaction records (all wallets' if wallet_id is None)."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
+                where, params = ("WHERE wallet_id = ?", (wallet_id, limit)) if wallet_id is not None else ("", (limit,))
+                cursor.execute(f"""
                     SELECT timestamp, type, amount, remote_address, local_balance_after, details
                     FROM transactions
-                    ORDER BY timestamp DESC
+                    {where}
+                    ORDER BY timestamp DESC, id DESC
                     LIMIT ?
-                """, (limit,))
+                """, params)
                 return cursor.fetchall() # Returns list of sqlite3.Row objects
         except sqlite3.Error as e:
             logging.error(f"Failed to retrieve transaction history: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def iter_transactions(self, since=None, until=None, tx_types=None, wallet_id=None, chunk_size=EXPORT_CHUNK_ROWS):
+        """
+        Streams transaction rows (tuples in TRANSACTION_COLUMNS order) oldest first, in lists of up to
+        `chunk_size` rows read with fetchmany, so memory stays flat however large the ledger is.
+        Filters: `since` (inclusive) / `until` (exclusive) timestamps as 'YYYY-MM-DD[ HH:MM:SS]' (UTC),
+        `tx_types` (iterable of types) and `wallet_id`. The read runs in one transaction, so the export is a
+        consistent snapshot while the node keeps writing (WAL). Raises sqlite3.Error on failure.
+        """
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        if tx_types:
+            tx_types = list(tx_types)
+            conditions.append(f"type IN ({','.join('?' * len(tx_types))})")
+            params.extend(tx_types)
+        if wallet_id is not None:
+            conditions.append("wallet_id = ?")
+            params.append(wallet_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self._get_connection()
+        try:
+            conn.row_factory = None # Plain tuples: cheaper, and what the writers want
+            conn.execute("BEGIN;")
+            cursor = conn.execute(f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions {where} "
+                                  "ORDER BY timestamp, id", params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            conn.execute("COMMIT;")
+        finally:
+            conn.close()
+
+    def bulk_insert_transactions(self, rows, batch_size=IMPORT_BATCH_ROWS):
+        """
+        Appends transaction rows (tuples in TRANSACTION_COLUMNS order; `id` is ignored and reassigned) with
+        executemany, committing every `batch_size` rows. Balances are not touched: this imports history.
+        Rows already in the ledger (same wallet, timestamp, type, amount, remote address, balance after and
+        details) are skipped, so importing the same file twice adds nothing. The connection, which is closed
+        afterwards, runs with synchronous=OFF (an OS crash can lose the last batches, but never corrupts the
+        file) and a larger page cache. Returns the number of rows inserted; on error the current batch is
+        rolled back, earlier batches stay committed, and sqlite3.Error is raised.
+        """
+        inserted = 0
+        conn = self._get_connection()
+        try:
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA cache_size = -65536") # 64 MiB for this connection
+            iterator = iter(rows)
+            while True:
+                # Built inside the call so only one batch is held at a time
+                count, added = self._insert_transaction_batch(conn, [row[1:] for row in itertools.islice(iterator,
+                                                                                                      batch_size)])
+                if not count:
+                    break
+                inserted += added
+                logging.debug(f"Bulk insert: {inserted} transactions committed")
+            return inserted
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert_transaction_batch(conn, batch):
+        """
+        Inserts (wallet_id, ..., details) tuples that are not in the ledger yet, in one transaction.
+        Returns (rows in the batch, rows inserted).
+        """
+        if not batch:
+            return 0, 0
+        changes_before = conn.total_changes
+        conn.execute("BEGIN TRANSACTION;")
+        try:
+            # The duplicate check is a lookup on idx_transactions_wallet_timestamp
+            conn.executemany("INSERT INTO transactions (wallet_id, timestamp, type, amount, remote_address, "
+                             "local_balance_after, details) SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7 WHERE NOT EXISTS ("
+                             "SELECT 1 FROM transactions WHERE wallet_id = ?1 AND timestamp = ?2 AND type = ?3 "
+                             "AND amount = ?4 AND remote_address IS ?5 AND local_balance_after = ?6 "
+                             "AND details IS ?7)", batch)
+            conn.execute("COMMIT;")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK;")
+            raise
+        return len(batch), conn.total_changes - changes_before
+
+    def get_ledger_stats(self, wallet_id=None):
+        """
+        Summary counts for one wallet (or all): {"wallets", "total_balance", "transactions",
+        "by_type": {type: {"count", "amount"}}}. Returns None on error.
+        """
+        try:
+            with self._get_connection() as conn:
+                where, params = ("WHERE wallet_id = ?", (wallet_id,)) if wallet_id is not None else ("", ())
+                by_type = {row['type']: {"count": row['count'], "amount": row['amount']}
+                           for row in conn.execute(f"""SELECT type, COUNT(*) AS count, COALESCE(SUM(amount), 0.0) AS amount
+                                                       FROM transactions {where} GROUP BY type""", params)}
+                where = where.replace("wallet_id", "id")
+                wallets, total_balance = conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(balance), 0.0) FROM wallet {where}", params).fetchone()
+                return {"wallets": wallets, "total_balance": total_balance,
+                        "transactions": sum(entry["count"] for entry in by_type.values()), "by_type": by_type}
+        except sqlite3.Error as e:
+            logging.error(f"Failed to compute ledger stats: {e}")
+            return None
+
+    def upsert_peers(self, entries):
+        """Inserts or refreshes peer directory entries: iterable of (address, ip, port, last_seen, source)."""
+        try:
+            with self._get_connection() as conn:
+                conn.execute("BEGIN TRANSACTION;")
+                try:
+                    conn.executemany("""
+                        INSERT INTO peers (address, ip, port, last_seen, source) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(address) DO UPDATE SET
+                            ip = excluded.ip, port = excluded.port, last_seen = excluded.last_seen,
+                            source = excluded.source
+                        WHERE excluded.last_seen >= peers.last_seen
+                    """, entries)
+                    conn.execute("COMMIT;")
+                    return True
+                except sqlite3.Error as inner_e:
+                    conn.execute("ROLLBACK;")
+                    logging.error(f"Failed to store peers, rolling back: {inner_e}")
+                    return False
+        except sqlite3.Error as e:
+            logging.error(f"Failed to store peers: {e}")
+            return False
+
+    def get_peer(self, address):
+        """Returns the peers row (address, ip, port, last_seen, source) for a wallet address, or None."""
+        try:
+            with self._get_connection() as conn:
+                return conn.execute("SELECT address, ip, port, last_seen, source FROM peers WHERE address = ?",
+                                    (address,)).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to look up peer {address}: {e}")
+            return None
+
+    def prune_peers(self, older_than):
+        """Deletes peers last seen before the given Unix time. Returns the number removed."""
+        try:
+            with self._get_connection() as conn:
+                removed = conn.execute("DELETE FROM peers WHERE last_seen < ?", (older_than,)).rowcount
+                if removed:
+                    logging.info(f"Pruned {removed} stale peers from the directory")
+                return removed
+        except sqlite3.Error as e:
+            logging.error(f"Failed to prune peers: {e}")
+            return 0
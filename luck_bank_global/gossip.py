@@ -0,0 +1,336 @@
+# gossip.py
+import ipaddress
+import logging
+import random
+import secrets
+import threading
+import time
+import weakref
+from collections import Counter
+from config import (GOSSIP_SEED_PEERS, GOSSIP_INTERVAL_SECONDS, GOSSIP_FANOUT, GOSSIP_SAMPLE_SIZE,
+                    GOSSIP_HELLOS_PER_ROUND, GOSSIP_MAX_PEERS, GOSSIP_PEER_MAX_AGE_SECONDS, GOSSIP_MAX_FAILURES,
+                    GOSSIP_TIMEOUT_SECONDS, GOSSIP_OBSERVED_IP_QUORUM)
+from signing import CRYPTO_AVAILABLE, sign_hello
+from utils import is_valid_address
+from metrics import REGISTRY
+
+GOSSIP_ROUNDS = REGISTRY.counter("gossip_rounds_total", "Gossip rounds run")
+GOSSIP_REQUEST_FAILURES = REGISTRY.counter("gossip_request_failures_total", "Outgoing hello/peers requests that failed")
+
+_SERVICES = weakref.WeakSet() # Live GossipService instances, summed by gossip_known_peers
+REGISTRY.function("gossip_known_peers", "Endpoints in the gossip known-peer set",
+                  lambda: sum(len(service._peers) for service in list(_SERVICES)))
+
+_OBSERVED_VOTES_MAX = 64 # Reporters remembered for the observed-IP quorum
+_CHALLENGE_BYTES = 16 # Random challenge sent with each outgoing hello
+_MAX_CHALLENGE_LENGTH = 64 # Longest challenge we agree to sign
+
+
+class _KnownPeer:
+    __slots__ = ("ip", "port", "address", "last_seen", "greeted", "failures")
+
+    def __init__(self, ip, port, address, last_seen):
+        self.ip, self.port, self.address, self.last_seen = ip, port, address, last_seen
+        self.greeted = False # We exchanged a 'hello' with it ourselves
+        self.failures = 0 # Consecutive failed requests
+
+
+def _parse_endpoint(ip, port):
+    """Returns (ip_address, port) or None if either part is malformed or unusable."""
+    try:
+        ip = ipaddress.ip_address(ip)
+        port = int(port)
+    except (TypeError, ValueError):
+        return None
+    if ip.is_unspecified or ip.is_multicast or not 0 < port < 65536:
+        return None
+    return ip, port
+
+
+class GossipService:
+    """
+    Peer discovery over the P2P socket, without a central registry.
+      - 'hello' introduces a node (address and listen port, signed when the wallet has a key) and carries a
+        random challenge. The reply carries the responder's own hello, signed over that challenge, and the
+        IP it saw the request come from.
+      - 'peers' is a push-pull exchange: the request carries a sample of the sender's known peers and the
+        response a sample of the responder's.
+    Every GOSSIP_INTERVAL_SECONDS (jittered) a background thread greets up to GOSSIP_HELLOS_PER_ROUND new
+    endpoints and exchanges samples with up to GOSSIP_FANOUT random known peers. Known peers are keyed by
+    endpoint, so repeated advertisements merge into one entry; the set is capped at GOSSIP_MAX_PEERS by
+    evicting the stalest entry. Gossiped addresses and incoming hellos are only hints: the peer directory is
+    updated (via `on_peer_verified`) only from replies to our own hellos that are signed over our challenge,
+    which shows the key holder answered on the endpoint we connected to.
+    """
+
+    def __init__(self, p2p_handler, address, private_key=None, on_peer_verified=None, on_observed_ip=None,
+                 seeds=GOSSIP_SEED_PEERS, interval=GOSSIP_INTERVAL_SECONDS, fanout=GOSSIP_FANOUT,
+                 sample_size=GOSSIP_SAMPLE_SIZE, hellos_per_round=GOSSIP_HELLOS_PER_ROUND,
+                 max_peers=GOSSIP_MAX_PEERS, timeout=GOSSIP_TIMEOUT_SECONDS):
+        self.p2p_handler = p2p_handler
+        self.address = address
+        self.private_key = private_key if CRYPTO_AVAILABLE else None
+        self.on_peer_verified = on_peer_verified # (address, ip, port) -> None, called outside the lock
+        self.on_observed_ip = on_observed_ip # (ip) -> None, once a quorum of peers agrees on our IP
+        self.interval = interval
+        self.fanout = fanout
+        self.sample_size = sample_size
+        self.hellos_per_round = hellos_per_round
+        self.max_peers = max_peers
+        self.timeout = timeout
+        self.observed_ip = None
+        self.stats = Counter() # Per-instance counts (rounds, requests, failures, peers_learned, ...)
+        self._peers = {} # (ip_address, port) -> _KnownPeer
+        self._observed_votes = {} # reporter IP -> the IP it saw us connect from
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        for seed in seeds:
+            ip, _, port = seed.rpartition(':')
+            if not self.add_peer(ip, port):
+                logging.warning("Ignoring invalid gossip seed '%s' (use IP:PORT)", seed)
+        _SERVICES.add(self)
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts the background gossip thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._gossip_loop, daemon=True, name="gossip")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout + 1.0)
+            self._thread = None
+
+    # --- Known peers ---
+    def add_peer(self, ip, port, address=None):
+        """Adds or refreshes an endpoint (e.g. a seed or a peer we transacted with). Returns False if invalid."""
+        endpoint = _parse_endpoint(ip, port)
+        if endpoint is None:
+            return False
+        with self._lock:
+            self._merge_locked(endpoint, address, time.monotonic())
+        return True
+
+    def get_known_peers(self):
+        """Returns [(ip, port, address_or_None), ...] for the current known-peer set."""
+        with self._lock:
+            return [(str(p.ip), p.port, p.address) for p in self._peers.values()]
+
+    def _is_self(self, endpoint, address):
+        if address is not None and address == self.address:
+            return True
+        ip, port = endpoint
+        return port == self.p2p_handler.port and str(ip) in (self.p2p_handler.local_ip, self.observed_ip)
+
+    def _merge_locked(self, endpoint, address, last_seen):
+        """Adds or refreshes one entry. Returns True if the endpoint was new."""
+        if address is not None and not is_valid_address(address):
+            address = None
+        if self._is_self(endpoint, address):
+            return False
+        peer = self._peers.get(endpoint)
+        if peer is not None:
+            peer.last_seen = max(peer.last_seen, last_seen)
+            if peer.address is None:
+                peer.address = address
+            return False
+        if len(self._peers) >= self.max_peers:
+            stalest = min(self._peers.values(), key=lambda p: p.last_seen)
+            if stalest.last_seen >= last_seen:
+                return False
+            del self._peers[(stalest.ip, stalest.port)]
+        self._peers[endpoint] = _KnownPeer(endpoint[0], endpoint[1], address, last_seen)
+        return True
+
+    def _merge_entries_locked(self, entries, source_ip):
+        """Merges a received 'peers' sample. Returns the number of new endpoints."""
+        now = time.monotonic()
+        learned = 0
+        for entry in entries[:self.sample_size]: # Never do more work than one sample is worth
+            if not isinstance(entry, dict):
+                continue
+            endpoint = _parse_endpoint(entry.get("ip"), entry.get("port"))
+            try:
+                age = max(0.0, float(entry.get("age", 0)))
+            except (TypeError, ValueError):
+                continue
+            if endpoint is None or age > GOSSIP_PEER_MAX_AGE_SECONDS:
+                continue
+            # A remote node's loopback is not ours
+            if endpoint[0].is_loopback and not source_ip.is_loopback:
+                continue
+            learned += self._merge_locked(endpoint, entry.get("address"), now - age)
+        self.stats["peers_learned"] += learned
+        return learned
+
+    def _sample_locked(self, exclude=None):
+        """A random sample of fresh known peers, as sent in 'peers' messages."""
+        now = time.monotonic()
+        candidates = [p for key, p in self._peers.items()
+                      if key != exclude and now - p.last_seen <= GOSSIP_PEER_MAX_AGE_SECONDS]
+        sample = random.sample(candidates, min(self.sample_size, len(candidates)))
+        return [{"ip": str(p.ip), "port": p.port, "address": p.address, "age": int(now - p.last_seen)}
+                for p in sample]
+
+    def _expire_locked(self):
+        cutoff = time.monotonic() - GOSSIP_PEER_MAX_AGE_SECONDS
+        for key in [key for key, p in self._peers.items() if p.last_seen < cutoff]:
+            del self._peers[key]
+
+    # --- Incoming messages (P2PHandler threads) ---
+    def handle_message(self, action, message, addr):
+        """
+        Answers a 'hello' or 'peers' message received from `addr`. Returns the response dict.
+        Raises ValueError for malformed messages (counted against the sender by admission control).
+        """
+        sender = _parse_endpoint(addr[0], message.get("port"))
+        if sender is None:
+            raise ValueError("Missing or invalid 'port'")
+        address = message.get("address")
+        if address is not None and not is_valid_address(address):
+            raise ValueError("Invalid address (bad format or checksum)")
+        if action == "hello":
+            return self._handle_hello(message, sender, address)
+        return self._handle_peers(message, sender, address)
+
+    def _handle_hello(self, message, sender, address):
+        challenge = message.get("challenge")
+        if challenge is not None and (not isinstance(challenge, str) or len(challenge) > _MAX_CHALLENGE_LENGTH):
+            raise ValueError("Invalid 'challenge'")
+        # Anyone can replay a signed hello from another IP, so it only names the peer; we greet it ourselves
+        verified = self._verify_hello(message, sender)
+        with self._lock:
+            self.stats["hellos_received"] += 1
+            self._merge_locked(sender, address, time.monotonic())
+            peer = self._peers.get(sender)
+            if peer is not None and verified:
+                peer.address = address
+        response = self._hello_message(challenge)
+        response.update(status="success", observed_ip=str(sender[0]))
+        return response
+
+    def _handle_peers(self, message, sender, address):
+        entries = message.get("peers")
+        if not isinstance(entries, list):
+            raise ValueError("'peers' must be a list")
+        with self._lock:
+            self.stats["peers_received"] += 1
+            self._merge_locked(sender, address, time.monotonic())
+            self._merge_entries_locked(entries, sender[0])
+            sample = self._sample_locked(exclude=sender)
+        return {"status": "success", "action": "peers", "peers": sample}
+
+    def _verify_hello(self, message, endpoint, challenge=None):
+        """Checks a hello's signature (over `challenge`, for a reply to our hello). Returns bool."""
+        if message.get("address") is None or "signature" not in message:
+            return False
+        ok, reason = self.p2p_handler.verifier.verify_hello(message, challenge)
+        if not ok:
+            logging.debug("Unverified hello from %s:%s: %s", endpoint[0], endpoint[1], reason)
+        return ok
+
+    def _hello_message(self, challenge=None):
+        message = {"action": "hello", "address": self.address, "port": self.p2p_handler.port}
+        if self.private_key:
+            message.update(sign_hello(self.private_key, self.address, message["port"], challenge))
+        if challenge is not None:
+            message["challenge"] = challenge
+        return message
+
+    # --- Outgoing rounds (gossip thread) ---
+    def run_round(self):
+        """One round: greet new endpoints, then push-pull samples with up to `fanout` random peers."""
+        with self._lock:
+            self._expire_locked()
+            peers = list(self._peers.values())
+            ungreeted = [p for p in peers if not p.greeted]
+            to_greet = random.sample(ungreeted, min(self.hellos_per_round, len(ungreeted)))
+            targets = random.sample(peers, min(self.fanout, len(peers)))
+            self.stats["rounds"] += 1
+        GOSSIP_ROUNDS.inc()
+        for peer in to_greet:
+            self._send_hello(peer)
+        for peer in targets:
+            self._exchange_peers(peer)
+
+    def _send_hello(self, peer):
+        challenge = secrets.token_hex(_CHALLENGE_BYTES)
+        message = self._hello_message()
+        message["challenge"] = challenge
+        response = self._request(peer, message)
+        if response is None:
+            return
+        endpoint = (peer.ip, peer.port)
+        # The responder signs its own port and our challenge; the port must be the one we reached it on
+        verified = response.get("port") == peer.port and self._verify_hello(response, endpoint, challenge)
+        address = response.get("address")
+        if verified and self.on_peer_verified:
+            self.on_peer_verified(address, str(peer.ip), peer.port)
+        with self._lock:
+            peer.greeted = True
+            if verified or (peer.address is None and is_valid_address(address)):
+                peer.address = address
+        self._record_observed_ip(peer.ip, response.get("observed_ip"))
+
+    def _exchange_peers(self, peer):
+        with self._lock:
+            sample = self._sample_locked(exclude=(peer.ip, peer.port))
+        response = self._request(peer, {"action": "peers", "address": self.address, "port": self.p2p_handler.port,
+                                        "peers": sample})
+        if response is None or not isinstance(response.get("peers"), list):
+            return
+        with self._lock:
+            self._merge_entries_locked(response["peers"], peer.ip)
+
+    def _request(self, peer, message):
+        """Sends one gossip request. Returns the response dict, or None (and counts a failure) on error."""
+        try:
+            response = self.p2p_handler.request(str(peer.ip), peer.port, message, timeout=self.timeout)
+            if not isinstance(response, dict) or response.get("status") != "success":
+                raise ValueError(response.get("message") if isinstance(response, dict) else "Malformed response")
+        except (OSError, ValueError) as e:
+            GOSSIP_REQUEST_FAILURES.inc()
+            logging.debug("Gossip %s to %s:%s failed: %s", message["action"], peer.ip, peer.port, e)
+            with self._lock:
+                self.stats["failures"] += 1
+                peer.failures += 1
+                if peer.failures >= GOSSIP_MAX_FAILURES and self._peers.get((peer.ip, peer.port)) is peer:
+                    del self._peers[(peer.ip, peer.port)]
+            return None
+        with self._lock:
+            self.stats["requests"] += 1
+            peer.failures = 0
+            peer.last_seen = time.monotonic()
+        return response
+
+    def _record_observed_ip(self, reporter_ip, observed):
+        """Counts a peer's report of our IP; adopts it once GOSSIP_OBSERVED_IP_QUORUM distinct peers agree."""
+        if _parse_endpoint(observed, 1) is None:
+            return
+        with self._lock:
+            self._observed_votes.pop(reporter_ip, None)
+            self._observed_votes[reporter_ip] = observed
+            if len(self._observed_votes) > _OBSERVED_VOTES_MAX:
+                del self._observed_votes[next(iter(self._observed_votes))]
+            votes = sum(1 for ip in self._observed_votes.values() if ip == observed)
+            if votes < GOSSIP_OBSERVED_IP_QUORUM or observed == self.observed_ip:
+                return
+            self.observed_ip = observed
+        logging.info("Peers reach this node at %s:%s", observed, self.p2p_handler.port)
+        if self.on_observed_ip:
+            self.on_observed_ip(observed)
+
+    def _gossip_loop(self):
+        # Short random delay so nodes started together don't gossip in lockstep
+        delay = random.uniform(0, min(1.0, self.interval))
+        while not self._stop_event.wait(delay):
+            try:
+                self.run_round()
+            except Exception as e:
+                logging.error("Gossip round failed: %s", e)
+            delay = self.interval * random.uniform(0.5, 1.5)
@@ -2,11 +2,12 @@
 import tkinter as tk
 from tkinter import scrolledtext, simpledialog, messagebox, Toplevel, ttk
 import logging
+import time
 from logic import BankLogic # Import the logic class
 from config import WINDOW_TITLE, TOKEN_NAME, HISTORY_WINDOW_TITLE
 
 class BankAppGUI:
-    def __init__(self, root):
+    def __init__(self, root, startup_timer=None):
         self.root = root
         self.root.title(WINDOW_TITLE)
         # self.root.geometry("650x500") # Optional: Set initial size
@@ -15,29 +16,28 @@ class BankAppGUI:
         self.style = ttk.Style()
         self.style.theme_use('clam') # Or 'alt', 'default', 'classic'
 
-        # Create and initialize the logic component
+        # Create the logic component (cheap: its slow setup runs in the background, see below)
         # Pass the 'update_gui' method as the callback
-        self.logic = BankLogic(gui_callback=self.update_gui)
-
-        # Complete logic initialization (requires root for scheduling)
-        self.logic.initialize(self.root)
+        self.logic = BankLogic(gui_callback=self.update_gui, startup_timer=startup_timer)
 
         # --- GUI Elements ---
         self.create_widgets()
-
-        # Populate initial data
-        self.update_balance_display(self.logic.get_balance())
-        self.address_var.set(self.logic.get_address())
-        self.p2p_info_var.set(self.logic.get_p2p_info())
+        self.set_actions_enabled(False) # Until the ledger is open
+        self.address_var.set("Loading...")
+        self.p2p_info_var.set("Starting...")
         self.log_message(f"Welcome to {WINDOW_TITLE}!")
-        self.log_message(f"Your Address: {self.logic.get_address()}")
-        self.log_message(f"Share your P2P Info to receive tokens: {self.logic.get_p2p_info()}")
 
         self.history_window = None # To track the history window
 
         # Handle window closing
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Draw the window now, then let the logic open the ledger, find the local IP and start the
+        # listener in the background; progress shows up in the log and 'startup_complete' fills in the data
+        self.root.update_idletasks()
+        self.logic.startup.mark("window_shown")
+        self.logic.initialize(self.root)
+
 
     def create_widgets(self):
         """Creates and arranges all GUI widgets."""
@@ -73,12 +73,16 @@ class BankAppGUI:
         action_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
         action_frame.columnconfigure(0, weight=1)
         action_frame.columnconfigure(1, weight=1)
+        action_frame.columnconfigure(2, weight=1)
 
-        send_button = ttk.Button(action_frame, text=f"Send {TOKEN_NAME}", command=self.show_send_dialog, width=18)
-        send_button.grid(row=0, column=0, padx=5, pady=5, sticky=tk.E)
+        self.send_button = ttk.Button(action_frame, text=f"Send {TOKEN_NAME}", command=self.show_send_dialog, width=18)
+        self.send_button.grid(row=0, column=0, padx=5, pady=5, sticky=tk.E)
 
-        history_button = ttk.Button(action_frame, text="Show History", command=self.show_history_window, width=18)
-        history_button.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        self.history_button = ttk.Button(action_frame, text="Show History", command=self.show_history_window, width=18)
+        self.history_button.grid(row=0, column=1, padx=5, pady=5)
+
+        self.profile_button = ttk.Button(action_frame, text="Start Profiling", command=self.toggle_profiling, width=18)
+        self.profile_button.grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
 
 
         # --- Log Section ---
@@ -95,6 +99,25 @@ class BankAppGUI:
         self.log_text.tag_configure("INFO", foreground="black")
         self.log_text.tag_configure("WARNING", foreground="orange")
 
+    def set_actions_enabled(self, enabled):
+        """Enables or disables the buttons that need a running node."""
+        for button in (self.send_button, self.history_button, self.profile_button):
+            button.state(['!disabled'] if enabled else ['disabled'])
+
+    def on_startup_complete(self):
+        """Fills in the wallet data once the background startup has finished."""
+        self.update_balance_display(self.logic.get_balance())
+        self.address_var.set(self.logic.get_address())
+        self.p2p_info_var.set(self.logic.get_p2p_info())
+        self.set_actions_enabled(True)
+        self.log_message(f"Your Address: {self.logic.get_address()}")
+        self.log_message(f"Share your P2P Info to receive tokens: {self.logic.get_p2p_info()}")
+
+    def on_startup_failed(self, error):
+        """Startup errors are fatal, as they were when the stack was built before the window appeared."""
+        messagebox.showerror("Fatal Error", f"Application failed to start:\n{error}\n\nCheck logs for details.",
+                             parent=self.root)
+        self.root.destroy()
 
     def update_gui(self, update_type, data):
         """
@@ -102,7 +125,7 @@ class BankAppGUI:
         This method MUST run in the main Tkinter thread.
         Logic layer ensures this using root.after().
         """
-        logging.debug(f"GUI received update: Type={update_type}, Data={data}")
+        logging.debug("GUI received update: Type=%s, Data=%s", update_type, data)
         if update_type == 'balance_update':
             self.update_balance_display(data)
         elif update_type == 'log':
@@ -117,6 +140,12 @@ class BankAppGUI:
             # If history window is open, refresh it
             if self.history_window and self.history_window.winfo_exists():
                 self.populate_history_tree(data)
+        elif update_type == 'startup_complete':
+            self.on_startup_complete()
+        elif update_type == 'startup_failed':
+            self.on_startup_failed(data)
+        elif update_type == 'profiling_state':
+            self.profile_button.config(text="Stop Profiling" if data else "Start Profiling")
         elif update_type == 'error_popup':
             messagebox.showerror("Error", data, parent=self.root)
         elif update_type == 'info_popup':
@@ -147,7 +176,7 @@ class BankAppGUI:
     def show_send_dialog(self):
         """Opens dialogs to get recipient info and amount for sending."""
         recipient_info = simpledialog.askstring("Send ONTIME",
-                                                "Enter recipient's P2P Info (IP_ADDRESS:PORT):",
+                                                "Enter recipient's wallet address or P2P Info (IP_ADDRESS:PORT):",
                                                 parent=self.root)
         if not recipient_info: return # User cancelled
 
@@ -160,6 +189,10 @@ class BankAppGUI:
         self.logic.initiate_send(recipient_info, amount_str)
 
 
+    def toggle_profiling(self):
+        """Starts a profiling window (or stops the running one early)."""
+        self.logic.toggle_profiling()
+
     def show_history_window(self):
         """Opens or focuses the transaction history window."""
         if self.history_window and self.history_window.winfo_exists():
@@ -0,0 +1,273 @@
+# ledger_io.py
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError: # Optional dependency: without it only CSV and JSONL are available
+    PYARROW_AVAILABLE = False
+
+from config import (DATABASE_FILENAME, DATABASE_SHARDS, EXPORT_CHUNK_ROWS, EXPORT_PARQUET_ROW_GROUP,
+                    IMPORT_BATCH_ROWS)
+from database import TRANSACTION_COLUMNS, TRANSACTION_TYPES
+from sharding import open_database
+from utils import setup_logging
+
+FORMATS = ("csv", "jsonl", "parquet")
+_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+_STORED_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}") # SQLite CURRENT_TIMESTAMP text
+
+
+def detect_format(path, fmt=None):
+    """Returns the explicit format, or the one implied by the file extension. Raises ValueError."""
+    fmt = fmt or _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format for '{path}'; use one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and not PYARROW_AVAILABLE:
+        raise RuntimeError("The 'pyarrow' package is required for Parquet files.")
+    return fmt
+
+
+def parse_timestamp(value):
+    """'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' (UTC, as stored) -> the same text, validated. Raises ValueError."""
+    for pattern in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, pattern).strftime(pattern)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid timestamp '{value}', expected YYYY-MM-DD or 'YYYY-MM-DD HH:MM:SS'")
+
+
+# --- Export ---
+def _write_csv(chunks, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(TRANSACTION_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def _write_jsonl(chunks, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in chunks:
+            f.write("".join(json.dumps(dict(zip(TRANSACTION_COLUMNS, row))) + "\n" for row in rows))
+
+
+def _parquet_schema():
+    return pa.schema([("id", pa.int64()), ("wallet_id", pa.int64()), ("timestamp", pa.string()),
+                      ("type", pa.string()), ("amount", pa.float64()), ("remote_address", pa.string()),
+                      ("local_balance_after", pa.float64()), ("details", pa.string())])
+
+
+def _write_parquet(chunks, path, row_group_size=EXPORT_PARQUET_ROW_GROUP):
+    schema = _parquet_schema()
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        buffered = []
+        for rows in chunks:
+            buffered.extend(rows)
+            if len(buffered) >= row_group_size:
+                writer.write_table(_parquet_table(buffered, schema))
+                buffered = []
+        if buffered:
+            writer.write_table(_parquet_table(buffered, schema))
+
+
+def _parquet_table(rows, schema):
+    columns = list(zip(*rows)) # Row tuples -> one tuple per column
+    return pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                                schema=schema)
+
+
+_WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def export_transactions(db, path, fmt=None, since=None, until=None, tx_types=None, wallet_id=None,
+                        chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Streams the transactions matching the filters (see DatabaseManager.iter_transactions) to `path` as CSV,
+    JSONL or Parquet, oldest first. Memory stays bounded by `chunk_size` rows (one Parquet row group for
+    Parquet), so monthly exports of millions of rows are safe. The file is written next to `path` and
+    renamed into place when complete. Returns {"rows", "seconds", "format", "path"}.
+    """
+    fmt = detect_format(path, fmt)
+    started = time.perf_counter()
+    count = 0
+
+    def counted(chunks):
+        nonlocal count
+        for rows in chunks:
+            count += len(rows)
+            yield rows
+
+    partial = f"{path}.partial"
+    try:
+        _WRITERS[fmt](counted(db.iter_transactions(since, until, tx_types, wallet_id, chunk_size)), partial)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    seconds = time.perf_counter() - started
+    logging.info("Exported %d transactions to %s in %.1f s", count, path, seconds,
+                 extra={"event": "transactions_exported", "rows": count, "format": fmt, "seconds": seconds})
+    return {"rows": count, "seconds": seconds, "format": fmt, "path": path}
+
+
+# --- Import ---
+def _read_csv(path, chunk_size):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _read_jsonl(path, chunk_size):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_parquet(path, chunk_size):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=list(TRANSACTION_COLUMNS)):
+        yield from batch.to_pylist()
+
+
+_READERS = {"csv": _read_csv, "jsonl": _read_jsonl, "parquet": _read_parquet}
+
+
+def _optional_text(value):
+    return None if value in (None, "") else str(value) # CSV writes NULL as an empty field
+
+
+def _stored_timestamp(value):
+    """Checks an imported timestamp has the stored text form, so filters and ordering keep working."""
+    value = str(value)
+    if not _STORED_TIMESTAMP.fullmatch(value):
+        raise ValueError(f"Invalid timestamp '{value}', expected 'YYYY-MM-DD HH:MM:SS'")
+    datetime.fromisoformat(value) # Rejects impossible dates; much cheaper than strptime per row
+    return value
+
+
+def parse_record(record, wallet_id=None, hosted_ids=None):
+    """
+    Exported record (dict) -> row tuple in TRANSACTION_COLUMNS order. Raises ValueError if it is invalid,
+    or if `hosted_ids` is given and the row's wallet is not among them.
+    """
+    try:
+        row = (None, # New ids are assigned on insert
+               int(wallet_id if wallet_id is not None else record["wallet_id"]),
+               _stored_timestamp(record["timestamp"]),
+               record["type"],
+               float(record["amount"]),
+               _optional_text(record.get("remote_address")),
+               float(record["local_balance_after"]),
+               _optional_text(record.get("details")))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Missing or malformed field: {e}") from e
+    if row[1] < 1:
+        raise ValueError(f"Invalid wallet id {row[1]}")
+    if hosted_ids is not None and row[1] not in hosted_ids: # The schema doesn't enforce the foreign key
+        raise ValueError(f"Wallet {row[1]} is not hosted by this ledger")
+    if row[3] not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid transaction type {row[3]!r}")
+    return row
+
+
+def import_transactions(db, path, fmt=None, wallet_id=None, batch_size=IMPORT_BATCH_ROWS,
+                        chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Streams an exported file into the ledger with db.bulk_insert_transactions (executemany, `batch_size`
+    rows per transaction). Rows get new ids; `wallet_id` reassigns every row, e.g. when merging another
+    node's ledger into a hosted wallet. This appends history only: wallet balances are not changed.
+    Invalid records and records for wallets this ledger doesn't host are logged and skipped; records
+    already in the ledger (e.g. from importing the same file before) are counted as duplicates.
+    Returns {"rows", "skipped", "duplicates", "seconds", "format", "path"}. Raises ValueError if
+    `wallet_id` is not a hosted wallet.
+    """
+    fmt = detect_format(path, fmt)
+    hosted_ids = {wallet['id'] for wallet in db.get_wallets()}
+    if wallet_id is not None and wallet_id not in hosted_ids:
+        raise ValueError(f"Wallet {wallet_id} is not hosted by this ledger")
+    started = time.perf_counter()
+    skipped = 0
+    parsed = 0
+
+    def rows():
+        nonlocal skipped, parsed
+        for number, record in enumerate(_READERS[fmt](path, chunk_size), start=1):
+            try:
+                row = parse_record(record, wallet_id, hosted_ids)
+            except ValueError as e:
+                skipped += 1
+                logging.warning(f"Skipping record {number} of {path}: {e}")
+                continue
+            parsed += 1
+            yield row
+
+    inserted = db.bulk_insert_transactions(rows(), batch_size)
+    duplicates = parsed - inserted
+    seconds = time.perf_counter() - started
+    logging.info("Imported %d transactions from %s in %.1f s (%d skipped, %d duplicates)", inserted, path, seconds,
+                 skipped, duplicates,
+                 extra={"event": "transactions_import_finished", "rows": inserted, "skipped": skipped,
+                        "duplicates": duplicates, "format": fmt, "seconds": seconds})
+    return {"rows": inserted, "skipped": skipped, "duplicates": duplicates, "seconds": seconds, "format": fmt,
+            "path": path}
+
+
+# --- Command line ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the transaction ledger to CSV/JSONL/Parquet, or bulk-import such a file.",
+        epilog="Run from luck_bank_global/ while the node is stopped or running (exports read a snapshot), e.g.\n"
+               "  python ledger_io.py export 2026-09.parquet --since 2026-09-01 --until 2026-10-01\n"
+               "  python ledger_io.py import other_node.csv --wallet 3",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DATABASE_FILENAME, help="Ledger file (default %(default)s)")
+    parser.add_argument("--shards", type=int, default=DATABASE_SHARDS, help="Shard count of the ledger")
+    parser.add_argument("--format", choices=FORMATS, help="File format (default: from the file extension)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write transactions to a file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--since", type=parse_timestamp, help="First timestamp included (UTC)")
+    export_parser.add_argument("--until", type=parse_timestamp, help="First timestamp excluded (UTC)")
+    export_parser.add_argument("--type", dest="tx_types", action="append", choices=TRANSACTION_TYPES,
+                               help="Only this transaction type (repeatable)")
+    export_parser.add_argument("--wallet", type=int, help="Only this hosted wallet id")
+    import_parser = commands.add_parser("import", help="Append transactions from a file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--wallet", type=int, help="Assign every imported row to this wallet id")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_ROWS, help="Rows per transaction")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    db = open_database(args.db, args.shards)
+    try:
+        if args.command == "export":
+            result = export_transactions(db, args.path, args.format, args.since, args.until, args.tx_types,
+                                         args.wallet)
+            print(f"Exported {result['rows']} transactions to {result['path']} in {result['seconds']:.1f} s")
+        else:
+            result = import_transactions(db, args.path, args.format, args.wallet, args.batch_size)
+            print(f"Imported {result['rows']} transactions from {result['path']} in {result['seconds']:.1f} s "
+                  f"({result['skipped']} skipped, {result['duplicates']} already present)")
+    except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+        logging.error(f"{args.command.capitalize()} failed: {e}")
+        return 1
+    finally:
+        if hasattr(db, "close"):
+            db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
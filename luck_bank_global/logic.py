@@ -1,16 +1,32 @@
 # logic.py
 import logging
+import signal
+import threading
 import time
-from database import DatabaseManager
+from contextlib import ExitStack, contextmanager
+from sharding import open_database
 from networking import P2PHandler
 from config import ISSUANCE_INTERVAL_MINUTES, ISSUANCE_AMOUNT, TOKEN_NAME
 from utils import get_local_ip
-from config import DEFAULT_P2P_PORT
+from config import DEFAULT_P2P_PORT, METRICS_HTTP_HOST, METRICS_HTTP_PORT
+from metrics import REGISTRY, MetricsServer
+from peers import PeerDirectory
+from gossip import GossipService
+from config import GOSSIP_ENABLED, HOSTED_WALLETS, LISTENER_WORKERS, DATABASE_FILENAME, DATABASE_SHARDS
+from config import SIGNATURE_REQUIRED
+from utils import is_valid_address
+from signing import CRYPTO_AVAILABLE, sign_ack
+from profiling import PROFILER
+from config import PROFILE_DEFAULT_SECONDS, PROFILE_CONTROL_SIGNAL
+from startup import StartupTimer
+
+GUI_QUEUE_DEPTH = REGISTRY.gauge("gui_queue_depth", "GUI updates scheduled via Tk after() but not yet run")
 
 class BankLogic:
-    def __init__(self, gui_callback=None):
+    def __init__(self, gui_callback=None, startup_timer=None):
         """
-        Initializes the core bank logic.
+        Initializes the core bank logic. Nothing slow happens here: the ledger, IP discovery and the
+        listener are set up in the background by initialize(), so the window can appear first.
         Args:
             gui_callback: A callable function in the GUI layer to update the UI.
                           It should accept arguments like (update_type, data).
@@ -18,42 +34,159 @@ class BankLogic:
                                 gui_callback('log', message)
                                 gui_callback('history_update', history_list)
                                 gui_callback('error', message)
+                                gui_callback('startup_complete', None)
+            startup_timer: StartupTimer that collects the startup timing report (a new one if None).
         """
-        self.db_manager = DatabaseManager() # Manages database interactions
         self.gui_callback = gui_callback   # Function to call for GUI updates
         self.tk_root = None                # Reference to Tkinter root needed for scheduling
-
-        # Load initial state
-        wallet_data = self.db_manager.get_wallet_data()
-        self.address = wallet_data['address']
-        self._balance = wallet_data['balance'] # Use internal var for controlled updates
-
-        self.local_ip = get_local_ip()
+        self.startup = startup_timer or StartupTimer()
+        self.ready = False # Set on the main thread once the background startup has finished
+        self._stopping = False
+        self._release_lock = threading.Lock() # Serializes shutdown()'s cleanup with an interrupted startup
+
+        self.db_file = DATABASE_FILENAME # Ledger location and layout, read by _open_ledger
+        self.db_shards = DATABASE_SHARDS
+
+        # Filled in by the background startup (see _start_in_background)
+        self.db_manager = None # Manages database interactions (single file or sharded)
+        self.address = None # Primary wallet (id 1): shown in the GUI, used for gossip
+        self.private_key = None # None for legacy (unsigned) wallets
+        # Every wallet hosted by this node, by address. Balances here are the controlled in-memory copies
+        self.wallets = {}
+        # One lock per ledger shard (wallet id % shards), serializing read-modify-write of balances between
+        # the main thread and network handlers. Writes to different shards run in parallel; within one
+        # SQLite file they would only contend for its write lock
+        self._shard_locks = []
+
+        self.local_ip = None
         self.port = DEFAULT_P2P_PORT # Use the configured port
 
-        # Initialize networking (pass self for callbacks)
-        self.p2p_handler = P2PHandler(self, self.local_ip, self.port)
+        # Wallet address -> endpoint directory, learned from signed transfers and send acknowledgements
+        self.peer_directory = None
+        self.p2p_handler = None
+        # Gossip discovery: spreads known endpoints between nodes; verified hellos feed the peer directory
+        self.gossip = None
+        # Multi-process receive path (LISTENER_WORKERS > 1); this process stays the only ledger writer
+        self.listener_pool = None
 
         self._issuance_timer_id = None # To store the .after() timer ID
+        self.metrics_server = None
+        self._profile_timer_id = None
 
     def initialize(self, tk_root):
         """
-        Completes initialization requiring the Tkinter root.
-        Starts networking and schedules token issuance.
+        Starts the staged startup: opening the ledger (schema check), IP discovery, the P2P listener and
+        the background services run on a startup thread, with progress in the GUI log. The GUI gets
+        'startup_complete' once the node is ready ('startup_failed' with the error otherwise).
         MUST be called after Tkinter root window is created.
         """
         if not tk_root:
              logging.critical("Tkinter root object not provided to BankLogic.initialize()")
              raise ValueError("Tkinter root is required for scheduling.")
         self.tk_root = tk_root
+        threading.Thread(target=self._start_in_background, daemon=True, name="startup").start()
+
+    @contextmanager
+    def _startup_stage(self, name, description):
+        """Times one startup stage and reports it in the GUI log."""
+        self._notify_gui('log', f"{description}...")
+        began = time.perf_counter()
+        with self.startup.stage(name):
+            yield
+        self._notify_gui('log', f"{description}: done ({(time.perf_counter() - began) * 1000:.0f} ms)")
+
+    def _start_in_background(self):
+        """Startup thread: everything that does disk or network I/O before the node is ready."""
+        stages = [("ledger", "Opening ledger", self._open_ledger),
+                  ("local_ip", "Detecting local IP", self._detect_local_ip),
+                  ("listener", f"Starting P2P listener on port {self.port}", self._start_network),
+                  ("services", "Starting background services", self._start_services)]
+        try:
+            for name, description, start in stages:
+                if self._stopping:
+                    break
+                with self._startup_stage(name, description):
+                    start()
+        except Exception as e:
+            logging.critical(f"Failed to initialize application: {e}", exc_info=True)
+            self._notify_gui('startup_failed', str(e))
+            if not self._stopping:
+                return
+        if self._stopping:
+            # shutdown() ran while a stage was starting things it could not see yet; stop those too
+            self._release_resources()
+            return
+        self.schedule_task(0, self._finish_startup)
+
+    def _detect_local_ip(self):
+        self.local_ip = get_local_ip()
+
+    def _open_ledger(self):
+        # Schema DDL only runs when the stored version is out of date
+        self.db_manager = open_database(self.db_file, self.db_shards)
+        self._shard_locks = [threading.Lock() for _ in range(max(1, self.db_shards))]
+        wallet_data = self.db_manager.get_wallet_data()
+        if wallet_data.get('id') is None: # The {"address": "DB_ERROR"} placeholder; never host it
+            raise RuntimeError(f"Could not load the primary wallet from {self.db_file} (see the log)")
+        self.private_key = wallet_data.get('private_key')
+        self.wallets = self._load_wallets(wallet_data)
+        self.address = wallet_data['address']
+        self.peer_directory = PeerDirectory(self.db_manager)
+
+    def _start_network(self):
+        if not CRYPTO_AVAILABLE:
+            # The peer directory only learns from signed transfers, acks and hellos, so it stays empty too
+            message = ("Signature verification disabled ('cryptography' is not installed): signed transfers are "
+                       "accepted unverified, and wallet addresses cannot be resolved from the peer directory.")
+            if SIGNATURE_REQUIRED:
+                message = ("SIGNATURE_REQUIRED is set but 'cryptography' is not installed: every incoming "
+                           "transfer will be rejected.")
+            logging.warning(message)
+            self._notify_gui('warning', message)
+        # Initialize networking (pass self for callbacks)
+        self.p2p_handler = P2PHandler(self, self.local_ip, self.port)
+        if GOSSIP_ENABLED:
+            self._attach_gossip()
 
         # Start P2P Listener
-        if not self.p2p_handler.start_listener():
+        if LISTENER_WORKERS > 1:
+            from workers import MultiProcessListener # Only multi-process nodes pay for multiprocessing
+            self.listener_pool = MultiProcessListener(self, self.p2p_handler, LISTENER_WORKERS)
+            listening = self.listener_pool.start()
+        else:
+            listening = self.p2p_handler.start_listener()
+        if not listening:
              # Handle listener start failure (already logged in P2PHandler)
              self._notify_gui('error', f"Failed to start P2P listener on port {self.port}. Receiving disabled.")
 
+    def _attach_gossip(self, **options):
+        """Creates the GossipService (GossipService keyword `options` override the config) on the P2P handler."""
+        self.gossip = GossipService(self.p2p_handler, self.address, self.private_key,
+                                    on_peer_verified=lambda address, ip, port: self.handle_peer_seen(
+                                        address, ip, port, 'hello'),
+                                    on_observed_ip=self.handle_observed_ip, **options)
+        self.p2p_handler.gossip = self.gossip
+
+    def _start_services(self):
+        if METRICS_HTTP_PORT:
+            self.metrics_server = MetricsServer(METRICS_HTTP_HOST, METRICS_HTTP_PORT)
+            if not self.metrics_server.start():
+                self.metrics_server = None
+        self.peer_directory.start()
+        if self.gossip:
+            self.gossip.start()
+
+    def _finish_startup(self):
+        """Main thread: the parts that need Tk or the main thread, then hand over to the GUI."""
+        if self._stopping:
+            return
+        self._install_profiling_signal()
         # Schedule first token issuance check
         self.schedule_token_issuance()
+        self.ready = True
+        self._notify_gui('startup_complete', None)
+        self.startup.mark("ready")
+        self.startup.report()
         logging.info("BankLogic initialized.")
 
 
@@ -62,24 +195,83 @@ class BankLogic:
         if self.gui_callback:
             try:
                  # Schedule the GUI update in the main Tkinter thread
-                 self.tk_root.after(0, self.gui_callback, update_type, data)
+                 GUI_QUEUE_DEPTH.inc()
+                 self.tk_root.after(0, self._run_gui_callback, update_type, data)
             except Exception as e:
+                 GUI_QUEUE_DEPTH.dec()
                  logging.error(f"Error calling GUI callback ({update_type}): {e}")
         else:
             logging.warning(f"GUI callback not set. Update ({update_type}) not sent to UI.")
 
+    def _run_gui_callback(self, update_type, data):
+        """Runs a scheduled GUI update (main thread) and tracks the pending-update depth."""
+        GUI_QUEUE_DEPTH.dec()
+        self.gui_callback(update_type, data)
+
+    def _load_wallets(self, primary):
+        """Loads the hosted wallets, creating new ones until HOSTED_WALLETS are hosted."""
+        wallets = self.db_manager.get_wallets()
+        if len(wallets) < HOSTED_WALLETS:
+            wallets += self.db_manager.create_wallets(HOSTED_WALLETS - len(wallets))
+        wallets = {wallet['address']: wallet for wallet in wallets}
+        wallets.setdefault(primary['address'], primary)
+        logging.info("Hosting %d wallet(s)", len(wallets))
+        return wallets
+
+    @contextmanager
+    def _locked(self, *wallets):
+        """Holds the balance locks of the shards holding `wallets`, taken in shard order (no deadlocks)."""
+        with ExitStack() as stack:
+            for shard in sorted({wallet['id'] % len(self._shard_locks) for wallet in wallets}):
+                stack.enter_context(self._shard_locks[shard])
+            yield
+
     # --- Wallet Data Access ---
-    def get_balance(self):
-        return self._balance
+    def _wallet(self, address=None):
+        """The hosted wallet dict for `address` (the primary wallet if None). Raises KeyError if not hosted."""
+        return self.wallets[address or self.address]
+
+    def get_balance(self, address=None):
+        return self._wallet(address)['balance']
 
     def get_address(self):
         return self.address
 
+    def get_wallets(self):
+        """Returns [(address, balance, label), ...] for every hosted wallet."""
+        return [(w['address'], w['balance'], w['label']) for w in self.wallets.values()]
+
+    def hosts_wallet(self, address):
+        """True if `address` is one of this node's wallets (used to route incoming transfers)."""
+        return address in self.wallets
+
+    def sign_ack(self, address, transfer_signature):
+        """Ack fields for a signed transfer received by hosted wallet `address`; empty for unsigned wallets."""
+        wallet = self.wallets.get(address)
+        if not wallet or not wallet.get('private_key') or not CRYPTO_AVAILABLE:
+            return {}
+        return sign_ack(wallet['private_key'], address, transfer_signature)
+
+    def create_wallets(self, count=1, label=None):
+        """Creates and starts hosting `count` new wallets. Returns their addresses."""
+        created = self.db_manager.create_wallets(count, label)
+        for wallet in created:
+            self.wallets[wallet['address']] = wallet
+        if created and self.listener_pool: # Worker processes check recipients against their own copy
+            self.listener_pool.update_hosted_addresses()
+        if created:
+            self._notify_gui('log', f"Created {len(created)} wallet(s); now hosting {len(self.wallets)}.")
+        return [wallet['address'] for wallet in created]
+
     def get_p2p_info(self):
         return f"{self.local_ip}:{self.port}"
 
-    def get_history(self, limit=100):
-        return self.db_manager.get_transaction_history(limit)
+    def get_history(self, limit=100, address=None):
+        return self.db_manager.get_transaction_history(limit, self._wallet(address)['id'])
+
+    def get_metrics_snapshot(self):
+        """Current values of all in-process metrics (see metrics.REGISTRY)."""
+        return REGISTRY.snapshot()
 
     # --- Token Issuance ---
     def schedule_token_issuance(self):
@@ -94,21 +286,25 @@ class BankLogic:
     def _issue_token_callback(self):
         """Callback function executed by the timer to issue tokens."""
         logging.info("Issuance interval reached. Processing token issuance.")
-        new_balance = self._balance + ISSUANCE_AMOUNT
-
-        # Update database and record transaction
-        success = self.db_manager.update_balance_add_transaction(
-            tx_type='issuance',
-            amount=ISSUANCE_AMOUNT,
-            new_balance=new_balance,
-            remote_address=None, # No remote address for issuance
-            details=f"{ISSUANCE_AMOUNT} {TOKEN_NAME} issued"
-        )
-
-        if success:
-            self._balance = new_balance
-            self._notify_gui('balance_update', self._balance)
-            self._notify_gui('log', f"Received {ISSUANCE_AMOUNT:.8f} {TOKEN_NAME} via periodic issuance.")
+        wallets = list(self.wallets.values())
+        with self._locked(*wallets):
+            # One transaction credits every hosted wallet (one per shard: some may commit while others fail)
+            balances = self.db_manager.apply_issuance(ISSUANCE_AMOUNT, details=f"{ISSUANCE_AMOUNT} {TOKEN_NAME} issued")
+            balances = balances or {}
+            for wallet in wallets: # Every committed credit must reach the in-memory balance
+                wallet['balance'] = balances.get(wallet['id'], wallet['balance'])
+        missed = sum(1 for wallet in wallets if wallet['id'] not in balances)
+        success = not missed
+
+        if balances and missed:
+            logging.error("Token issuance failed for %d of %d wallets.", missed, len(wallets))
+            self._notify_gui('error', f"Database error during token issuance ({missed} wallets not credited).")
+            self._notify_gui('balance_update', self.get_balance())
+            self._notify_gui('history_update', self.get_history())
+        elif success:
+            self._notify_gui('balance_update', self.get_balance())
+            self._notify_gui('log', f"Received {ISSUANCE_AMOUNT:.8f} {TOKEN_NAME} via periodic issuance"
+                                    + (f" (all {len(self.wallets)} wallets)." if len(self.wallets) > 1 else "."))
             self._notify_gui('history_update', self.get_history()) # Update history view
             # Optional: Show a popup (might be annoying over time)
             # self._notify_gui('info_popup', f"Received {ISSUANCE_AMOUNT:.8f} {TOKEN_NAME}!")
@@ -122,22 +318,46 @@ class BankLogic:
 
     # --- P2P Transfer Handling ---
 
-    def initiate_send(self, recipient_info, amount_str):
-        """Validates and initiates a P2P token transfer."""
-        # 1. Validate Recipient Info
-        try:
-            if ':' not in recipient_info:
-                 raise ValueError("Invalid format. Use IP_ADDRESS:PORT")
-            recipient_ip, recipient_port_str = recipient_info.strip().split(':')
-            recipient_port = int(recipient_port_str)
-            # Basic IP format check (can be improved)
-            parts = recipient_ip.split('.')
-            if len(parts) != 4 or not all(0 <= int(p) <= 255 for p in parts):
-                 raise ValueError("Invalid IP address format")
-        except ValueError as e:
-            logging.warning(f"Invalid recipient info format: {recipient_info} - {e}")
-            self._notify_gui('error', f"Invalid P2P Info: {e}. Use IP:PORT (e.g., 192.168.1.5:61001).")
+    def initiate_send(self, recipient_info, amount_str, from_address=None):
+        """
+        Validates and initiates a token transfer to a wallet address or an IP:PORT endpoint, from the hosted
+        wallet `from_address` (default: the primary wallet). Transfers between hosted wallets stay local.
+        """
+        sender = self.wallets.get(from_address or self.address)
+        if sender is None:
+            self._notify_gui('error', f"Wallet {from_address} is not hosted by this node.")
             return
+        # 1. Validate Recipient Info
+        recipient_info = recipient_info.strip()
+        recipient_address = None
+        local_recipient = self.wallets.get(recipient_info)
+        if local_recipient is not None:
+            if local_recipient is sender:
+                self._notify_gui('error', "Cannot send to the sending wallet itself.")
+                return
+        elif is_valid_address(recipient_info):
+            # Wallet address: resolve the endpoint from the peer directory (cache first, then DB)
+            endpoint = self.peer_directory.resolve(recipient_info)
+            if endpoint is None:
+                self._notify_gui('error', f"No known endpoint for {recipient_info}. "
+                                          "Send to its IP:PORT once, or receive a transfer from it first.")
+                return
+            recipient_address = recipient_info
+            recipient_ip, recipient_port = endpoint
+        else:
+            try:
+                if ':' not in recipient_info:
+                     raise ValueError("Invalid format. Use IP_ADDRESS:PORT or a wallet address")
+                recipient_ip, recipient_port_str = recipient_info.split(':')
+                recipient_port = int(recipient_port_str)
+                # Basic IP format check (can be improved)
+                parts = recipient_ip.split('.')
+                if len(parts) != 4 or not all(0 <= int(p) <= 255 for p in parts):
+                     raise ValueError("Invalid IP address format")
+            except ValueError as e:
+                logging.warning(f"Invalid recipient info format: {recipient_info} - {e}")
+                self._notify_gui('error', f"Invalid P2P Info: {e}. Use IP:PORT (e.g., 192.168.1.5:61001).")
+                return
 
         # 2. Validate Amount
         try:
@@ -146,17 +366,40 @@ class BankLogic:
                 self._notify_gui('error', "Send amount must be positive.")
                 return
             # Use a small tolerance for float comparison
-            if amount > self._balance + 1e-9: # Add tolerance
-                self._notify_gui('error', f"Insufficient funds. You have {self._balance:.8f} {TOKEN_NAME}.")
+            if amount > sender['balance'] + 1e-9: # Add tolerance
+                self._notify_gui('error', f"Insufficient funds. You have {sender['balance']:.8f} {TOKEN_NAME}.")
                 return
         except ValueError:
             self._notify_gui('error', "Invalid amount. Please enter a number.")
             return
 
+        if local_recipient is not None:
+            self._transfer_local(sender, local_recipient, amount)
+            return
+
         # 3. Initiate Send via Networking Layer
-        self._notify_gui('log', f"Validating send of {amount:.8f} to {recipient_ip}:{recipient_port}...")
+        target = f"{recipient_ip}:{recipient_port}"
+        if recipient_address:
+            target = f"{recipient_address} ({target})"
+        self._notify_gui('log', f"Validating send of {amount:.8f} to {target}...")
         # Networking layer will handle the actual sending in a background thread
-        self.p2p_handler.send_message(recipient_ip, recipient_port, amount, self.address)
+        self.p2p_handler.send_message(recipient_ip, recipient_port, amount, sender['address'], sender['private_key'],
+                                      recipient_address)
+
+    def _transfer_local(self, sender, recipient, amount):
+        """Moves tokens between two hosted wallets in one database transaction, without the network."""
+        with self._locked(sender, recipient):
+            balances = self.db_manager.transfer_between_wallets(sender['id'], recipient['id'], amount,
+                                                                details="Local transfer")
+            if balances is not None:
+                sender['balance'], recipient['balance'] = balances
+        if balances is None:
+            self._notify_gui('error', "Local transfer failed (insufficient funds or database error).")
+            return
+        self._notify_gui('balance_update', self.get_balance())
+        self._notify_gui('log', f"Transferred {amount:.8f} {TOKEN_NAME} locally from {sender['address']} "
+                                f"to {recipient['address']}.")
+        self._notify_gui('history_update', self.get_history())
 
 
     def handle_send_result(self, result, amount, recipient_info_str):
@@ -165,20 +408,31 @@ class BankLogic:
         MUST run in the main thread (use root.after from P2PHandler).
         """
         # This function is scheduled by P2PHandler using root.after, so it runs in the main thread
-        logging.debug(f"Handling send result: {result}")
+        logging.debug("Handling send result: %s", result)
         if result.get("status") == "success":
+            # The acknowledgement names the recipient wallet; remember where it lives if the ack proves it
+            recipient_address = result.get("recipient_address")
+            if recipient_address and result.get("recipient_verified"):
+                recipient_ip, _, recipient_port = recipient_info_str.rpartition(':')
+                self.peer_directory.learn(recipient_address, recipient_ip, recipient_port, 'send_ack')
+                if self.gossip:
+                    self.gossip.add_peer(recipient_ip, recipient_port, recipient_address)
             # Send was successful, update balance and log transaction
-            new_balance = self._balance - amount
-            success = self.db_manager.update_balance_add_transaction(
-                tx_type='sent',
-                amount=amount,
-                new_balance=new_balance,
-                remote_address=None, # We don't store recipient *wallet address* here easily
-                details=f"Sent to {recipient_info_str}" # Log IP:Port
-            )
+            sender = self.wallets.get(result.get("sender_address")) or self._wallet()
+            with self._locked(sender):
+                new_balance = sender['balance'] - amount
+                success = self.db_manager.update_balance_add_transaction(
+                    tx_type='sent',
+                    amount=amount,
+                    new_balance=new_balance,
+                    remote_address=recipient_address, # None for legacy peers that don't report it
+                    details=f"Sent to {recipient_info_str}", # Log IP:Port
+                    wallet_id=sender['id']
+                )
+                if success:
+                    sender['balance'] = new_balance
             if success:
-                self._balance = new_balance
-                self._notify_gui('balance_update', self._balance)
+                self._notify_gui('balance_update', self.get_balance())
                 self._notify_gui('log', f"Successfully sent {amount:.8f} {TOKEN_NAME} to {recipient_info_str}.")
                 self._notify_gui('history_update', self.get_history())
             else:
@@ -194,31 +448,41 @@ class BankLogic:
             self._notify_gui('error_popup', f"Failed to send {TOKEN_NAME}:\n{reason}")
 
 
-    def handle_received_transfer(self, amount, sender_address, sender_ip_port):
+    def handle_received_transfer(self, amount, sender_address, sender_ip_port, recipient_address=None):
         """
         Processes an incoming transfer request (called by P2PHandler).
+        `recipient_address` selects the hosted wallet to credit (legacy transfers without it go to the primary).
         This method might be called from a network thread, so database/GUI updates
         need careful handling (DB manager is likely okay, GUI needs scheduling).
         Returns True on success, False on failure (e.g., DB error).
         """
-        logging.info(f"Processing received transfer: {amount} from {sender_address} via {sender_ip_port}")
-        new_balance = self._balance + amount
-
-        # Update database and record transaction
-        success = self.db_manager.update_balance_add_transaction(
-            tx_type='received',
-            amount=amount,
-            new_balance=new_balance,
-            remote_address=sender_address, # Store sender's wallet address
-            details=f"Received from {sender_ip_port[0]}:{sender_ip_port[1]}" # Log sender IP:Port
-        )
+        logging.info("Processing received transfer: %s from %s via %s", amount, sender_address, sender_ip_port)
+        wallet = self.wallets.get(recipient_address or self.address)
+        if wallet is None:
+            logging.error(f"Received transfer for {recipient_address}, which this node does not host.")
+            return False
+        # Concurrent handlers (and batch transfers) must each build on the previous balance
+        with self._locked(wallet):
+            new_balance = wallet['balance'] + amount
+
+            # Update database and record transaction
+            success = self.db_manager.update_balance_add_transaction(
+                tx_type='received',
+                amount=amount,
+                new_balance=new_balance,
+                remote_address=sender_address, # Store sender's wallet address
+                details=f"Received from {sender_ip_port[0]}:{sender_ip_port[1]}", # Log sender IP:Port
+                wallet_id=wallet['id']
+            )
+            if success:
+                wallet['balance'] = new_balance
 
         if success:
-            # Schedule the balance/GUI update in the main thread
+            # Schedule the GUI update in the main thread
             def _update_state_and_gui():
-                self._balance = new_balance
-                self._notify_gui('balance_update', self._balance)
-                self._notify_gui('log', f"Received {amount:.8f} {TOKEN_NAME} from {sender_address}.")
+                self._notify_gui('balance_update', self.get_balance())
+                self._notify_gui('log', f"Received {amount:.8f} {TOKEN_NAME} from {sender_address}"
+                                        + (f" for {wallet['address']}." if wallet['address'] != self.address else "."))
                 self._notify_gui('history_update', self.get_history())
 
             self.schedule_task(0, _update_state_and_gui) # Use scheduler
@@ -229,6 +493,56 @@ class BankLogic:
             # P2PHandler will send an error response back to the sender
             return False
 
+    # --- Profiling ---
+    def start_profiling(self, seconds=PROFILE_DEFAULT_SECONDS):
+        """
+        Profiles the running node for `seconds` without a restart. Must run in the main thread,
+        so cProfile also covers Tk callbacks; output goes to the log directory.
+        """
+        if not PROFILER.start():
+            self._notify_gui('warning', "Profiling is already running.")
+            return
+        self._notify_gui('profiling_state', True)
+        self._notify_gui('log', f"Profiling for {seconds}s...")
+        self._profile_timer_id = self.tk_root.after(int(seconds * 1000), self.stop_profiling)
+
+    def stop_profiling(self):
+        """Stops profiling early (or when the window ends) and reports where the output was written."""
+        if self._profile_timer_id:
+            self.tk_root.after_cancel(self._profile_timer_id)
+            self._profile_timer_id = None
+        paths = PROFILER.stop()
+        self._notify_gui('profiling_state', False)
+        if paths:
+            self._notify_gui('success', f"Profile written: {', '.join(paths)}")
+
+    def toggle_profiling(self):
+        if PROFILER.active:
+            self.stop_profiling()
+        else:
+            self.start_profiling()
+
+    def _install_profiling_signal(self):
+        """Lets operators toggle profiling with a signal (e.g. `kill -USR1 <pid>`) where supported."""
+        signum = getattr(signal, PROFILE_CONTROL_SIGNAL, None)
+        if signum is None:
+            return
+        try:
+            signal.signal(signum, lambda *_: self.schedule_task(0, self.toggle_profiling))
+            logging.info("Send %s to toggle profiling.", PROFILE_CONTROL_SIGNAL)
+        except (ValueError, OSError) as e: # Not in the main thread, or unsupported
+            logging.warning("Could not install profiling signal handler: %s", e)
+
+    def handle_peer_seen(self, address, ip, port, source):
+        """Called by P2PHandler (network thread) when a peer proves it owns `address` at ip:port."""
+        if self.peer_directory.learn(address, ip, port, source) and self.gossip and source != 'hello':
+            self.gossip.add_peer(ip, port, address)
+
+    def handle_observed_ip(self, ip):
+        """Called by GossipService (gossip thread) once several peers agree on the IP they see us at."""
+        if ip != self.local_ip:
+            self._notify_gui('log', f"Peers reach this node at {ip}:{self.port} (P2P Info shows {self.local_ip}).")
+
     def handle_network_error(self, message):
          """Callback for network errors (e.g., listener bind failure)."""
          self._notify_gui('error', message) # Show error in main GUI log
@@ -245,12 +559,34 @@ class BankLogic:
     def shutdown(self):
         """Performs cleanup operations."""
         logging.info("BankLogic shutting down...")
+        self._stopping = True # A startup still in progress stops at its next stage
         if self._issuance_timer_id:
             try:
                  self.tk_root.after_cancel(self._issuance_timer_id)
                  logging.info("Token issuance timer cancelled.")
             except Exception as e:
                  logging.warning(f"Could not cancel issuance timer: {e}")
-        self.p2p_handler.stop_listener()
-        # Database connection is managed per-operation, no explicit close needed here
-        logging.info("BankLogic shutdown complete.")
\ No newline at end of file
+        if PROFILER.active:
+            self.stop_profiling()
+        self._release_resources()
+        logging.info("BankLogic shutdown complete.")
+
+    def _release_resources(self):
+        """
+        Stops the listener, background services and ledger writers that exist. Called by shutdown() and,
+        if shutdown() raced a startup stage, again by the startup thread; every stop is idempotent.
+        """
+        with self._release_lock:
+            if self.listener_pool:
+                self.listener_pool.stop()
+            if self.p2p_handler:
+                self.p2p_handler.stop_listener()
+            if self.gossip:
+                self.gossip.stop()
+            if self.peer_directory:
+                self.peer_directory.stop()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            # Connections are per-operation; this only stops the shard writer threads when sharding is on
+            if self.db_manager:
+                self.db_manager.close()
\ No newline at end of file
@@ -1,11 +1,19 @@
 # main.py
+import time
+STARTED_AT = time.perf_counter() # Taken before the other imports so the startup report includes them
+
 import tkinter as tk
+from tkinter import messagebox
 import logging
 from gui import BankAppGUI
 from utils import setup_logging
 from config import APP_NAME
+from startup import StartupTimer
 
 if __name__ == "__main__":
+    startup_timer = StartupTimer(STARTED_AT)
+    startup_timer.mark("imports")
+
     # Configure logging first
     setup_logging()
     logging.info(f"Starting {APP_NAME}...")
@@ -16,11 +24,11 @@ if __name__ == "__main__":
     # Set window properties (optional, can also be in GUI class)
     # root.geometry("650x500")
 
-    # Instantiate the GUI application (which also initializes logic)
+    # Instantiate the GUI application; it shows the window and starts the logic in the background
     try:
-        app = BankAppGUI(root)
+        app = BankAppGUI(root, startup_timer)
     except Exception as e:
-        # Catch critical errors during initialization (e.g., DB connection)
+        # Catch critical errors during initialization (startup errors after this are shown by the GUI)
         logging.critical(f"Failed to initialize application: {e}", exc_info=True)
         messagebox.showerror("Fatal Error", f"Application failed to start:\n{e}\n\nCheck logs for details.")
         root.destroy() # Close the empty window
@@ -31,4 +39,4 @@ if __name__ == "__main__":
     logging.info("Starting Tkinter main event loop.")
     root.mainloop()
 
-    logging.info(f"{APP_NAME} exited gracefully.")
\ No newline at end of file
+    logging.info(f"{APP_NAME} exited gracefully.")
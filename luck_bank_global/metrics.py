@@ -0,0 +1,247 @@
+# metrics.py
+import bisect
+import logging
+import threading
+from collections import deque
+
+# Seconds; covers sub-millisecond DB commits up to socket-timeout-sized network waits
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0)
+_REGISTRATION_BACKLOG = 256 # New thread cells queued before a writer tries to fold them in itself
+
+
+class _PerThreadCells:
+    """
+    Per-thread value cells so the hot path never takes a lock: each thread only ever writes its own cell
+    and readers sum all cells. Every connection runs on a new thread, so registering a thread's cell is on
+    the hot path too: it is a deque append (atomic), and the cells are moved into the table under the lock
+    on collection. Cells of finished threads are folded into `retired` so short-lived threads don't
+    accumulate; if nobody collects, a writer does that once the backlog grows, but only if the lock is free.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._cells = {} # Thread -> list of values
+        self._registered = deque() # (Thread, cell) not yet moved into _cells
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0] * self._size
+            self._registered.append((threading.current_thread(), cell))
+            if len(self._registered) > _REGISTRATION_BACKLOG and self._lock.acquire(blocking=False):
+                try:
+                    self._collect()
+                finally:
+                    self._lock.release()
+            return cell
+
+    def totals(self):
+        with self._lock:
+            self._collect()
+            totals = list(self._retired)
+            for cell in self._cells.values():
+                for i, value in enumerate(cell):
+                    totals[i] += value
+        return totals
+
+    def _collect(self):
+        """Moves newly registered cells into the table and retires those of exited threads. Lock held."""
+        while self._registered:
+            thread, cell = self._registered.popleft()
+            self._cells[thread] = cell
+        for thread in [t for t in self._cells if not t.is_alive()]:
+            for i, value in enumerate(self._cells.pop(thread)):
+                self._retired[i] += value
+
+
+class Counter:
+    """Monotonically increasing value."""
+    type_name = "counter"
+
+    def __init__(self, name, help_text, labels=None):
+        self.name, self.help_text, self.labels = name, help_text, labels or {}
+        self._cells = _PerThreadCells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return self._cells.totals()[0]
+
+
+class Gauge:
+    """Value that can go up and down. inc/dec are per-thread deltas; set() overrides them."""
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, labels=None):
+        self.name, self.help_text, self.labels = name, help_text, labels or {}
+        self._cells = _PerThreadCells(1)
+        self._base = 0.0
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def dec(self, amount=1):
+        self._cells.cell()[0] -= amount
+
+    def set(self, value):
+        self._base = value - self._cells.totals()[0]
+
+    def value(self):
+        return self._base + self._cells.totals()[0]
+
+
+class FunctionMetric:
+    """Counter or gauge whose value is read from a callable at collection time (e.g. existing counters)."""
+
+    def __init__(self, name, help_text, fn, type_name="gauge", labels=None):
+        self.name, self.help_text, self.labels = name, help_text, labels or {}
+        self.type_name = type_name
+        self._fn = fn
+
+    def value(self):
+        try:
+            return self._fn()
+        except Exception as e:
+            logging.debug(f"Metric {self.name} callback failed: {e}")
+            return float('nan')
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus semantics: cumulative buckets, _sum and _count)."""
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_LATENCY_BUCKETS, labels=None):
+        self.name, self.help_text, self.labels = name, help_text, labels or {}
+        self.buckets = tuple(sorted(buckets))
+        # Layout: one slot per bucket, one for +Inf, then sum and count
+        self._cells = _PerThreadCells(len(self.buckets) + 3)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def value(self):
+        """Returns {"buckets": [(upper_bound, cumulative_count), ...], "sum": s, "count": n}."""
+        totals = self._cells.totals()
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), totals[:-2]):
+            running += count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": totals[-2], "count": totals[-1]}
+
+
+class MetricsRegistry:
+    """Holds all metrics of the process; creation is get-or-create so modules can declare metrics at import."""
+
+    def __init__(self):
+        self._metrics = {} # (name, frozenset(labels)) -> metric
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labels=None):
+        return self._get_or_create(Counter, name, help_text, labels=labels)
+
+    def gauge(self, name, help_text, labels=None):
+        return self._get_or_create(Gauge, name, help_text, labels=labels)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_LATENCY_BUCKETS, labels=None):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets, labels=labels)
+
+    def function(self, name, help_text, fn, type_name="gauge", labels=None):
+        """Registers (or replaces) a metric read from `fn()` at collection time."""
+        metric = FunctionMetric(name, help_text, fn, type_name, labels)
+        with self._lock:
+            self._metrics[(name, frozenset((labels or {}).items()))] = metric
+        return metric
+
+    def snapshot(self):
+        """Returns {metric_name{labels}: value} for local inspection (GUI, logs, benchmarks)."""
+        return {_series_name(m.name, m.labels): m.value() for m in self._all()}
+
+    def render_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines, described = [], set()
+        for metric in sorted(self._all(), key=lambda m: m.name):
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            value = metric.value()
+            if metric.type_name == "histogram":
+                for bound, count in value["buckets"]:
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f"{_series_name(metric.name + '_bucket', {**metric.labels, 'le': le})} {count}")
+                lines.append(f"{_series_name(metric.name + '_sum', metric.labels)} {value['sum']}")
+                lines.append(f"{_series_name(metric.name + '_count', metric.labels)} {value['count']}")
+            else:
+                lines.append(f"{_series_name(metric.name, metric.labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _all(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        key = (name, frozenset((kwargs.get("labels") or {}).items()))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, help_text, **kwargs)
+            return metric
+
+
+def _series_name(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+REGISTRY = MetricsRegistry() # Process-wide registry used by all modules
+
+
+class MetricsServer:
+    """Serves REGISTRY at GET /metrics in Prometheus text format on a background thread."""
+
+    def __init__(self, host, port, registry=REGISTRY):
+        self.host, self.port, self.registry = host, port, registry
+        self._server = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # ~25 ms to import; only needed here
+        registry = self.registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args): # Keep scrapes out of the app log
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        except OSError as e:
+            logging.error(f"Could not start metrics endpoint on {self.host}:{self.port}: {e}")
+            return False
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="metrics-http").start()
+        logging.info(f"Metrics endpoint available at http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
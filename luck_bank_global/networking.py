@@ -1,9 +1,53 @@
 # networking.py
 import socket
 import threading
+import time
 import json
 import logging
-from config import DEFAULT_P2P_PORT, SOCKET_TIMEOUT, SOCKET_BUFFER_SIZE
+import weakref
+from config import DEFAULT_P2P_PORT, SOCKET_TIMEOUT, SOCKET_BUFFER_SIZE, MAX_MESSAGE_SIZE, TOKEN_NAME
+from config import SIGNATURE_REQUIRED, TRANSFER_BATCH_MAX
+from signing import CRYPTO_AVAILABLE, SignatureVerifier, sign_transfer
+from utils import begin_sampled_unit, is_valid_address, TRANSFER_LOGGER_NAME
+from codec import CODECS, JSON, MSGPACK_AVAILABLE, CodecNegotiator, detect_codec, is_framed, message_complete
+from admission import (AdmissionController, REJECT_BANNED, REJECT_RATE_LIMITED, REJECT_AT_CAPACITY,
+                       REJECT_INVALID_MESSAGE)
+from metrics import REGISTRY
+from profiling import PROFILER
+
+ACCEPT_TO_ACK_SECONDS = REGISTRY.histogram("p2p_accept_to_ack_seconds", "Time from accept() to response sent")
+SEND_RTT_SECONDS = REGISTRY.histogram("p2p_send_rtt_seconds", "Outgoing transfer round trip (connect to response)")
+BYTES_IN = REGISTRY.counter("p2p_bytes_in_total", "Bytes received over P2P sockets")
+BYTES_OUT = REGISTRY.counter("p2p_bytes_out_total", "Bytes sent over P2P sockets")
+MESSAGES_BY_CODEC = {name: REGISTRY.counter("p2p_messages_received_total", "Messages received, by wire codec",
+                                            labels={"codec": name}) for name in CODECS}
+
+TRANSFER_LOG = logging.getLogger(TRANSFER_LOGGER_NAME) # Sampled per-transfer debug output
+
+# Admission state is per handler; the metrics below are registered once and sum over the live handlers
+_HANDLERS = weakref.WeakSet()
+
+
+def _admission_total(read):
+    return sum(read(handler.admission) for handler in list(_HANDLERS))
+
+
+REGISTRY.function("p2p_active_handlers", "Connection handler threads currently running",
+                  lambda: _admission_total(lambda admission: admission.active_handlers))
+REGISTRY.function("p2p_connections_admitted_total", "Connections admitted to a handler",
+                  lambda: _admission_total(lambda admission: admission.admitted), type_name="counter")
+for _reason in (REJECT_BANNED, REJECT_RATE_LIMITED, REJECT_AT_CAPACITY, REJECT_INVALID_MESSAGE):
+    REGISTRY.function("p2p_connections_rejected_total", "Connections/messages rejected, by reason",
+                      lambda reason=_reason: _admission_total(lambda admission: admission.rejections[reason]),
+                      type_name="counter", labels={"reason": _reason})
+
+# Pre-encoded so rejecting a connection costs no JSON work
+_REJECTION_PAYLOADS = {
+    reason: json.dumps({"status": "error", "message": f"Connection rejected: {reason}"}).encode('utf-8')
+    for reason in (REJECT_RATE_LIMITED, REJECT_AT_CAPACITY)
+}
+# Listed in JSON responses so upgraded peers switch to binary; not advertised without msgpack (slower than JSON)
+_ADVERTISED_CODECS = sorted(CODECS) if MSGPACK_AVAILABLE else [JSON.name]
 
 class P2PHandler:
     def __init__(self, logic_callback_object, local_ip, port=DEFAULT_P2P_PORT):
@@ -20,6 +64,12 @@ class P2PHandler:
         self.server_socket = None
         self.listener_thread = None
         self.running = False
+        self.verifier = SignatureVerifier() # Shared so the public key cache outlives single connections
+        self.admission = AdmissionController() # Per-IP rate limits, handler cap and ban list
+        self.gossip = None # GossipService answering 'hello'/'peers' messages, attached by the owner
+        self.reuse_port = False # Set before start_listener() to share the port between processes (SO_REUSEPORT)
+        self.codecs = CodecNegotiator() # Which peers we may send the binary format to
+        _HANDLERS.add(self) # Admission metrics (read at scrape time, nothing on the hot path)
 
     def start_listener(self):
         """Starts the network listener thread."""
@@ -29,6 +79,8 @@ class P2PHandler:
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port: # The kernel spreads incoming connections across all sockets bound this way
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.server_socket.bind((self.local_ip, self.port))
             self.server_socket.listen(5)
             self.running = True
@@ -70,6 +122,7 @@ class P2PHandler:
             except Exception as e:
                 logging.warning(f"Unexpected error closing server socket: {e}")
         self.server_socket = None
+        self.verifier.shutdown()
         # Wait briefly for thread to exit (optional, as it's daemon)
         # if self.listener_thread and self.listener_thread.is_alive():
         #     self.listener_thread.join(timeout=1.0)
@@ -80,11 +133,24 @@ class P2PHandler:
         while self.running and self.server_socket:
             try:
                 client_socket, addr = self.server_socket.accept()
-                logging.info(f"Accepted connection from {addr}")
+                accepted_at = time.perf_counter()
+                # Admission control runs before any data is read or parsed
+                rejection = self.admission.admit(addr[0])
+                if rejection:
+                    self._reject_connection(client_socket, addr, rejection)
+                    continue
+                logging.info("Accepted connection from %s", addr)
                 client_socket.settimeout(SOCKET_TIMEOUT)
                 # Handle each client in a new thread
-                handler_thread = threading.Thread(target=self._handle_client, args=(client_socket, addr), daemon=True)
-                handler_thread.start()
+                # Handlers get their own cProfile while profiling is switched on
+                handler_thread = threading.Thread(target=PROFILER.wrap(self._handle_client),
+                                                  args=(client_socket, addr, accepted_at), daemon=True)
+                try:
+                    handler_thread.start()
+                except RuntimeError: # Thread limit reached: give the slot back
+                    self.admission.release()
+                    client_socket.close()
+                    raise
             except socket.timeout: # Should not happen with accept, but defensive
                 continue
             except OSError: # Expected when socket is closed by stop_listener
@@ -99,79 +165,92 @@ class P2PHandler:
         logging.info("P2P Listener thread finished.")
 
 
-    def _handle_client(self, client_socket, addr):
-        """Handles message reception from a connected client."""
+    def _reject_connection(self, client_socket, addr, reason):
+        """Closes a connection refused by admission control (banned peers get no response at all)."""
+        logging.debug("Rejected connection from %s: %s", addr, reason)
+        try:
+            if reason != REJECT_BANNED:
+                client_socket.setblocking(False) # Never let a rejection stall the accept loop
+                client_socket.send(_REJECTION_PAYLOADS[reason])
+        except OSError:
+            pass
+        finally:
+            client_socket.close()
+
+    def get_admission_stats(self):
+        """Returns admission counters: admitted, active handlers, banned peers and rejections by reason."""
+        return self.admission.snapshot()
+
+    def _handle_client(self, client_socket, addr, accepted_at=None):
+        """Handles message reception from a connected client. `accepted_at` is the perf_counter() at accept."""
+        begin_sampled_unit() # The connection's transfer debug records are kept or dropped together
         raw_data = b''
         try:
-            while True: # Loop to receive potentially fragmented data
-                chunk = client_socket.recv(SOCKET_BUFFER_SIZE)
-                if not chunk:
-                    break # Connection closed by peer
-                raw_data += chunk
-                # Basic check: assume message ends with '}' for JSON
-                if raw_data.strip().endswith(b'}'):
-                    break
-                # Add a safeguard against infinitely growing buffer if peer sends non-JSON
-                if len(raw_data) > SOCKET_BUFFER_SIZE * 10:
-                     raise ValueError("Received data too large or not valid JSON.")
+            with PROFILER.phase("recv"):
+                while True: # Loop to receive potentially fragmented data
+                    chunk = client_socket.recv(SOCKET_BUFFER_SIZE)
+                    if not chunk:
+                        break # Connection closed by peer
+                    raw_data += chunk
+                    # Binary frames carry their length; for JSON assume the message ends with '}'
+                    if message_complete(raw_data):
+                        break
+                    # Add a safeguard against infinitely growing buffer if peer sends non-JSON
+                    if len(raw_data) > MAX_MESSAGE_SIZE:
+                         raise ValueError("Received data too large or not valid JSON.")
 
+            BYTES_IN.inc(len(raw_data))
             if not raw_data:
                  logging.warning(f"No data received from {addr} or connection closed prematurely.")
                  return
 
-            data_str = raw_data.decode('utf-8').strip()
-            logging.debug(f"Received raw data from {addr}: {data_str}")
-            message = json.loads(data_str)
+            with PROFILER.phase("parse"):
+                codec = detect_codec(raw_data) # Replies go out in the codec the peer used
+                message = codec.decode(raw_data)
+                TRANSFER_LOG.debug("Received %s message from %s: %s", codec.name, addr, message)
+            MESSAGES_BY_CODEC[codec.name].inc()
+            if not isinstance(message, dict):
+                raise ValueError("Message must be an object")
 
             # --- Process Message ---
             action = message.get("action")
             response = {"status": "error", "message": "Unknown action"} # Default error response
 
             if action == "transfer":
-                amount_str = message.get("amount")
-                sender_address = message.get("sender_address")
-                if amount_str is None or sender_address is None:
-                    response = {"status": "error", "message": "Missing 'amount' or 'sender_address'"}
-                else:
-                    try:
-                        amount = float(amount_str)
-                        if amount <= 0:
-                            response = {"status": "error", "message": "Invalid amount (must be positive)"}
-                        else:
-                             # Call back to logic layer (must be thread-safe!)
-                             # Logic layer will handle DB update and GUI notification via scheduler
-                             success = self.logic.handle_received_transfer(amount, sender_address, addr)
-                             if success:
-                                 response = {"status": "success", "message": "Transfer acknowledged"}
-                                 logging.info(f"Received valid transfer of {amount} from {sender_address} via {addr}")
-                             else:
-                                 # Logic layer failed (e.g., DB error)
-                                 response = {"status": "error", "message": "Internal server error processing transfer"}
-                                 logging.error(f"Logic layer failed to process transfer from {sender_address}")
-
-                    except ValueError:
-                        response = {"status": "error", "message": "Invalid amount format"}
-                    except Exception as e:
-                         response = {"status": "error", "message": f"Server processing error: {e}"}
-                         logging.exception(f"Error processing transfer message from {addr}:") # Log full traceback
-
+                response = self._process_transfer(message, addr)
+            elif action == "transfer_batch":
+                response = self._process_transfer_batch(message, addr)
+            elif action == "address": # Lets a sender that only knows ip:port name (and sign for) our wallet
+                response = {"status": "success", "address": self.logic.address}
+            elif action in ("hello", "peers") and self.gossip:
+                response = self.gossip.handle_message(action, message, addr)
             else:
                 logging.warning(f"Received unknown action '{action}' from {addr}")
 
             # Send response back to client
-            client_socket.sendall(json.dumps(response).encode('utf-8'))
+            with PROFILER.phase("respond"):
+                if codec is JSON:
+                    response["codecs"] = _ADVERTISED_CODECS
+                payload = codec.encode(response)
+                client_socket.sendall(payload)
+            BYTES_OUT.inc(len(payload))
+            if accepted_at is not None:
+                ACCEPT_TO_ACK_SECONDS.observe(time.perf_counter() - accepted_at)
 
         except json.JSONDecodeError:
+            self.admission.record_invalid(addr[0])
             logging.error(f"Received invalid JSON from {addr}: {raw_data.decode('utf-8', errors='ignore')}")
             try:
                 client_socket.sendall(json.dumps({"status": "error", "message": "Invalid JSON format"}).encode('utf-8'))
             except Exception: pass
         except UnicodeDecodeError:
+             self.admission.record_invalid(addr[0])
              logging.error(f"Received non-UTF8 data from {addr}")
              try:
                   client_socket.sendall(json.dumps({"status": "error", "message": "Invalid encoding (use UTF-8)"}).encode('utf-8'))
              except Exception: pass
         except ValueError as e: # Handle amount conversion errors or custom value errors
+             self.admission.record_invalid(addr[0])
              logging.error(f"Data validation error handling client {addr}: {e}")
              try:
                   client_socket.sendall(json.dumps({"status": "error", "message": f"Data error: {e}"}).encode('utf-8'))
@@ -187,44 +266,205 @@ class P2PHandler:
             except Exception: pass
         finally:
             client_socket.close()
-            logging.debug(f"Connection from {addr} closed")
+            self.admission.release()
+            TRANSFER_LOG.debug("Connection from %s closed", addr)
 
 
-    def send_message(self, ip, port, amount, sender_address):
-        """Connects to a peer and sends a transfer message. Runs in background thread."""
+    def _check_signature(self, transfer):
+        """
+        Returns (ok, reason) for a transfer's signature; unsigned transfers pass unless SIGNATURE_REQUIRED.
+        Nodes without the 'cryptography' package treat signed transfers as unsigned (legacy) ones.
+        """
+        if "signature" in transfer and (CRYPTO_AVAILABLE or SIGNATURE_REQUIRED):
+            return self.verifier.verify(transfer)
+        if SIGNATURE_REQUIRED:
+            return False, "Unsigned transfers are not accepted"
+        TRANSFER_LOG.debug("Accepting unsigned (legacy) transfer from %s", transfer.get('sender_address'))
+        return True, None
+
+    def _process_transfer(self, transfer, addr, signature_result=None):
+        """
+        Validates one transfer and applies it. Returns the response dict.
+        `signature_result` is passed in when the signature was already checked (batch path).
+        """
+        amount_str = transfer.get("amount")
+        sender_address = transfer.get("sender_address")
+        if amount_str is None or sender_address is None:
+            return {"status": "error", "message": "Missing 'amount' or 'sender_address'"}
+        # Checksum check first: rejects typos and garbage before any signature work
+        if not is_valid_address(sender_address):
+            return {"status": "error", "message": "Invalid sender address (bad format or checksum)"}
+        # Senders that resolved us from their peer directory name the wallet they expect to reach;
+        # the node may host many wallets, so this also routes the transfer
+        recipient_address = transfer.get("recipient_address")
+        signed = "signature" in transfer and CRYPTO_AVAILABLE # Unverifiable signatures count for nothing
+        if signed and recipient_address is None: # The signature must cover the destination
+            return {"status": "error", "message": "Signed transfers must name the recipient address"}
+        if recipient_address is not None and not self.logic.hosts_wallet(recipient_address):
+            return {"status": "error", "message": "Wrong recipient: this node does not hold that address"}
+        if signature_result is None:
+            with PROFILER.phase("verify"):
+                signature_result = self._check_signature(transfer)
+        signature_ok, signature_reason = signature_result
+        if not signature_ok:
+            logging.warning("Rejected transfer from %s via %s: %s", sender_address, addr, signature_reason)
+            return {"status": "error", "message": f"Signature rejected: {signature_reason}"}
+        try:
+            amount = float(amount_str)
+            if amount <= 0:
+                return {"status": "error", "message": "Invalid amount (must be positive)"}
+            # Call back to logic layer (must be thread-safe!)
+            # Logic layer will handle DB update and GUI notification via scheduler
+            with PROFILER.phase("db"):
+                success = self.logic.handle_received_transfer(amount, sender_address, addr, recipient_address)
+            if success:
+                logging.info("Received valid transfer of %s from %s via %s", amount, sender_address, addr,
+                             extra={"event": "transfer_received", "amount": amount, "sender": sender_address})
+                # Only signed transfers prove address ownership (and the signature covers sender_port),
+                # so only they may update the peer directory
+                if signed and transfer.get("sender_port") and hasattr(self.logic, 'handle_peer_seen'):
+                    self.logic.handle_peer_seen(sender_address, addr[0], transfer["sender_port"], 'transfer')
+                response = {"status": "success", "message": "Transfer acknowledged",
+                            "recipient_address": recipient_address or self.logic.address}
+                # Signing the ack lets the sender trust recipient_address enough to add it to its directory
+                if signed and hasattr(self.logic, 'sign_ack'):
+                    response.update(self.logic.sign_ack(recipient_address, transfer["signature"]))
+                return response
+            # Logic layer failed (e.g., DB error)
+            logging.error(f"Logic layer failed to process transfer from {sender_address}")
+            return {"status": "error", "message": "Internal server error processing transfer"}
+        except ValueError:
+            return {"status": "error", "message": "Invalid amount format"}
+        except Exception as e:
+            logging.exception(f"Error processing transfer message from {addr}:") # Log full traceback
+            return {"status": "error", "message": f"Server processing error: {e}"}
+
+    def _process_transfer_batch(self, message, addr):
+        """
+        Handles a 'transfer_batch' message: {"action": "transfer_batch", "transfers": [transfer, ...]}.
+        Signatures are verified together on the verifier's worker pool, then each transfer is applied in order.
+        """
+        transfers = message.get("transfers")
+        if not isinstance(transfers, list) or not transfers:
+            return {"status": "error", "message": "Missing or empty 'transfers' list"}
+        if len(transfers) > TRANSFER_BATCH_MAX:
+            return {"status": "error", "message": f"Batch too large (max {TRANSFER_BATCH_MAX})"}
+        if not all(isinstance(t, dict) for t in transfers):
+            return {"status": "error", "message": "Each batch entry must be an object"}
+
+        signed = [t for t in transfers if "signature" in t and is_valid_address(t.get("sender_address"))
+                  and CRYPTO_AVAILABLE]
+        with PROFILER.phase("verify_batch"):
+            verified = dict(zip(map(id, signed), self.verifier.verify_batch(signed)))
+        results = [self._process_transfer(t, addr, verified.get(id(t))) for t in transfers]
+
+        accepted = sum(1 for r in results if r["status"] == "success")
+        logging.info("Processed transfer batch from %s: %d/%d accepted", addr, accepted, len(results))
+        return {"status": "success" if accepted == len(results) else "partial",
+                "message": f"{accepted}/{len(results)} transfers acknowledged",
+                "results": results}
+
+
+    def request(self, ip, port, message, timeout=SOCKET_TIMEOUT):
+        """
+        Sends one message and returns the peer's decoded response. Blocking: call from a background thread.
+        Raises OSError on connection problems and ValueError on a malformed or oversized response.
+        """
+        with socket.create_connection((ip, port), timeout=timeout) as sock:
+            return self._exchange(sock, ip, port, message)
+
+    def _exchange(self, sock, ip, port, message):
+        """
+        Sends `message` on a connected socket, in the codec negotiated for ip:port, and returns the decoded
+        response. Whatever happens, the negotiator learns from it (see CodecNegotiator).
+        """
+        codec = self.codecs.codec_for(ip, port)
+        try:
+            payload = codec.encode(message)
+            sock.sendall(payload)
+            BYTES_OUT.inc(len(payload))
+            raw = self._read_response(sock)
+            response = detect_codec(raw).decode(raw)
+        except (OSError, ValueError):
+            if codec is not JSON:
+                self.codecs.record_failure(ip, port)
+            raise
+        if not is_framed(raw): # A JSON reply says which codecs the peer speaks (nothing, if it predates them)
+            if codec is not JSON and "codecs" not in response:
+                self.codecs.record_failure(ip, port)
+            self.codecs.record_response(ip, port, response)
+        return response
+
+    def _read_response(self, sock):
+        """Reads a response until the peer closes the connection (or a binary frame is complete)."""
+        data = b''
+        while True:
+            chunk = sock.recv(SOCKET_BUFFER_SIZE)
+            if not chunk:
+                break
+            data += chunk
+            if len(data) > MAX_MESSAGE_SIZE:
+                raise ValueError("Response too large")
+            if is_framed(data) and message_complete(data):
+                break
+        BYTES_IN.inc(len(data))
+        if not data:
+            raise ConnectionAbortedError("Peer closed connection without response.")
+        return data
+
+    def send_message(self, ip, port, amount, sender_address, private_key=None, recipient_address=None):
+        """
+        Connects to a peer and sends a transfer message. Runs in background thread.
+        The message is signed when `private_key` is given and signing is available.
+        When `recipient_address` is given the peer rejects the transfer unless it holds that wallet. Signatures
+        cover the recipient, so a signed send without one first asks the peer for its address.
+        """
 
         def _send_thread_target():
-            result = {"status": "failed", "reason": "Unknown error"} # Default result
+            begin_sampled_unit()
+            # sender_address tells the logic layer which hosted wallet to debit
+            result = {"status": "failed", "reason": "Unknown error", "sender_address": sender_address}
             recipient_info_str = f"{ip}:{port}"
-            logging.info(f"Attempting to send {amount:.8f} {TOKEN_NAME} to {recipient_info_str}...")
+            logging.info("Attempting to send %.8f %s to %s...", amount, TOKEN_NAME, recipient_info_str)
 
             try:
                 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sign = private_key and CRYPTO_AVAILABLE
+                    target_address = recipient_address
+                    if sign and not target_address: # Signatures are bound to the recipient; ask the peer for it
+                        target_address = self.request(ip, port, {"action": "address"}).get("address")
+                        if not is_valid_address(target_address):
+                            raise ValueError("Recipient did not report a valid wallet address")
                     sock.settimeout(SOCKET_TIMEOUT)
+                    started_at = time.perf_counter()
                     sock.connect((ip, port))
 
                     message = {
                         "action": "transfer",
                         "amount": str(amount), # Send amount as string for broader compatibility
-                        "sender_address": sender_address
+                        "sender_address": sender_address,
+                        "sender_port": self.port # Lets the recipient add us to its peer directory
                     }
-                    payload = json.dumps(message).encode('utf-8')
-                    sock.sendall(payload)
-                    logging.debug(f"Sent payload to {recipient_info_str}: {payload.decode()}")
-
-                    # Wait for response
-                    response_raw = sock.recv(SOCKET_BUFFER_SIZE)
-                    if not response_raw:
-                         raise ConnectionAbortedError("Peer closed connection without response.")
+                    if target_address:
+                        message["recipient_address"] = target_address
+                    if sign:
+                        message.update(sign_transfer(private_key, sender_address, message["amount"], target_address,
+                                                     self.port))
+                    TRANSFER_LOG.debug("Sending to %s: %s", recipient_info_str, message)
 
-                    response_data = response_raw.decode('utf-8')
-                    response = json.loads(response_data)
-                    logging.debug(f"Received response from {recipient_info_str}: {response}")
+                    response = self._exchange(sock, ip, port, message)
+                    SEND_RTT_SECONDS.observe(time.perf_counter() - started_at)
+                    TRANSFER_LOG.debug("Received response from %s: %s", recipient_info_str, response)
 
                     if response.get("status") == "success":
                         result["status"] = "success"
+                        result["recipient_address"] = response.get("recipient_address")
+                        # Only an ack signed by the named wallet may teach us where that wallet lives
+                        result["recipient_verified"] = ("signature" in message
+                                                        and self.verifier.verify_ack(response, message["signature"]))
                         result["reason"] = response.get("message", "Transfer successful")
-                        logging.info(f"Successfully sent {amount:.8f} {TOKEN_NAME} to {recipient_info_str}")
+                        logging.info("Successfully sent %.8f %s to %s", amount, TOKEN_NAME, recipient_info_str,
+                                     extra={"event": "transfer_sent", "amount": amount, "recipient": recipient_info_str})
                     else:
                         result["status"] = "failed_peer_error"
                         result["reason"] = response.get('message', 'Unknown error reported by recipient')
@@ -241,10 +481,13 @@ class P2PHandler:
                  logging.warning(result["reason"])
             except json.JSONDecodeError:
                 result["reason"] = f"Invalid response format received from {recipient_info_str}."
-                logging.error(result["reason"] + f" Raw: {response_raw.decode('utf-8', errors='ignore')}")
+                logging.error(result["reason"])
             except UnicodeDecodeError:
                  result["reason"] = f"Received non-UTF8 response from {recipient_info_str}."
                  logging.error(result["reason"])
+            except ValueError as e: # Malformed binary frame or oversized response
+                result["reason"] = f"Invalid response received from {recipient_info_str}: {e}"
+                logging.error(result["reason"])
             except Exception as e:
                 result["reason"] = f"Unexpected error sending to {recipient_info_str}: {e}"
                 logging.exception(f"Detailed error during send to {recipient_info_str}:") # Log full traceback
@@ -0,0 +1,98 @@
+# peers.py
+import logging
+import threading
+import time
+from config import PEER_CACHE_TTL_SECONDS, PEER_FLUSH_INTERVAL_SECONDS, PEER_EXPIRY_DAYS
+from utils import is_valid_address
+
+
+class PeerDirectory:
+    """
+    Maps wallet addresses to P2P endpoints (ip, port).
+    Lookups hit an in-memory cache with a TTL and fall back to the `peers` table. Learned endpoints update
+    the cache immediately and are written to the database in batches by a background thread, which also
+    evicts expired cache entries and prunes peers not seen for PEER_EXPIRY_DAYS.
+    """
+
+    def __init__(self, db_manager, ttl=PEER_CACHE_TTL_SECONDS, flush_interval=PEER_FLUSH_INTERVAL_SECONDS):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._cache = {} # address -> (ip, port, expires_at)
+        self._dirty = {} # address -> (ip, port, last_seen, source), pending database write
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the background flush/refresh thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._maintenance_loop, daemon=True, name="peer-directory")
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread and writes out pending entries."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.flush()
+
+    def learn(self, address, ip, port, source):
+        """Records that `address` is reachable at ip:port. Returns False (and ignores it) if malformed."""
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            return False
+        if not is_valid_address(address) or not ip or not 0 < port < 65536:
+            return False
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(address)
+            self._cache[address] = (ip, port, now + self.ttl)
+            self._dirty[address] = (ip, port, now, source)
+        if cached is None or cached[:2] != (ip, port):
+            logging.info("Peer directory: %s -> %s:%s (%s)", address, ip, port, source)
+        return True
+
+    def resolve(self, address):
+        """Returns (ip, port) for a wallet address, or None if unknown."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(address)
+            if entry and entry[2] > now:
+                return entry[0], entry[1]
+        row = self.db_manager.get_peer(address)
+        if row is None:
+            return None
+        with self._lock:
+            self._cache[address] = (row['ip'], row['port'], now + self.ttl)
+        return row['ip'], row['port']
+
+    def flush(self):
+        """Writes learned entries to the database in one transaction."""
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+        if pending and not self.db_manager.upsert_peers(
+                [(address, ip, port, last_seen, source) for address, (ip, port, last_seen, source) in pending.items()]):
+            with self._lock: # Keep them for the next attempt unless a newer entry arrived meanwhile
+                for address, entry in pending.items():
+                    self._dirty.setdefault(address, entry)
+
+    def _maintenance_loop(self):
+        prune_every = max(1, int(3600 / self.flush_interval)) # Prune the table about once an hour
+        cycles = 0
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                now = time.time()
+                with self._lock:
+                    for address in [a for a, entry in self._cache.items() if entry[2] <= now]:
+                        del self._cache[address]
+                cycles += 1
+                if cycles % prune_every == 0:
+                    self.db_manager.prune_peers(now - PEER_EXPIRY_DAYS * 86400)
+            except Exception as e:
+                logging.error("Peer directory maintenance failed: %s", e)
@@ -0,0 +1,181 @@
+# profiling.py
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from config import LOG_DIRECTORY, PROFILE_SAMPLE_INTERVAL_MS
+
+
+class _NullPhase:
+    """Shared no-op context used while profiling is off (no allocation, no clock reads)."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_PHASE = _NullPhase()
+_THREAD_NAME_RE = re.compile(r"^Thread-\d+ \((.*)\)$")
+# Python 3.12+ profiles through sys.monitoring: one cProfile per process, and it sees every thread
+_PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record_phase(self.name, time.perf_counter_ns() - self.started)
+        return False
+
+
+class Profiler:
+    """
+    Opt-in, runtime-switchable profiling for a live node. While active it collects:
+      - cProfile data for the thread that started it (the Tk main thread from the GUI/signal) and for
+        every connection handler wrapped with wrap() (on Python 3.12+ the one profile covers all threads);
+      - a sampling profile of all threads (sys._current_frames) in flamegraph "folded" format;
+      - per-phase wall times (recv, parse, db, respond, ...) recorded with perf_counter_ns.
+    stop() writes <prefix>.pstats, <prefix>.folded and <prefix>.phases.json to the log directory.
+    """
+
+    def __init__(self, output_dir=LOG_DIRECTORY, sample_interval_ms=PROFILE_SAMPLE_INTERVAL_MS):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval_ms / 1000.0
+        self.active = False
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._main_profile = None
+        self._thread_profiles = []
+        self._samples = Counter()
+        self._phases = defaultdict(list)
+        self._sampler_thread = None
+
+    # --- Switching ---
+    def start(self):
+        """Starts profiling; cProfile covers the calling thread. Returns False if already running."""
+        with self._lock:
+            if self.active:
+                return False
+            self._thread_profiles, self._samples, self._phases = [], Counter(), defaultdict(list)
+            self._main_profile = cProfile.Profile()
+            self.started_at = time.time()
+            self.active = True
+        self._main_profile.enable()
+        self._sampler_thread = threading.Thread(target=self._sample_loop, daemon=True, name="profiler-sampler")
+        self._sampler_thread.start()
+        logging.info("Profiling started")
+        return True
+
+    def stop(self):
+        """Stops profiling (call from the thread that started it) and dumps results. Returns the written paths."""
+        with self._lock:
+            if not self.active:
+                return []
+            self.active = False
+        self._main_profile.disable()
+        if self._sampler_thread:
+            self._sampler_thread.join(timeout=1.0)
+        paths = self._dump()
+        logging.info("Profiling stopped; output: %s", ", ".join(paths))
+        return paths
+
+    # --- Hooks used by the instrumented code ---
+    def phase(self, name):
+        """Context manager timing one phase; a shared no-op when profiling is off."""
+        return _Phase(self, name) if self.active else _NULL_PHASE
+
+    def record_phase(self, name, duration_ns):
+        self._phases[name].append(duration_ns) # list.append is atomic under the GIL
+
+    def wrap(self, target):
+        """
+        Returns `target` run under its own cProfile when profiling is active, else `target` unchanged.
+        If the profile cannot be enabled (another profiler is running), `target` still runs, unprofiled,
+        so a handler's own cleanup (closing its socket, releasing its admission slot) always happens.
+        """
+        if not self.active or not _PER_THREAD_PROFILES:
+            return target
+
+        def _profiled(*args, **kwargs):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return target(*args, **kwargs)
+            try:
+                return target(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._thread_profiles.append(profile)
+        return _profiled
+
+    # --- Internals ---
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while self.active:
+            # "Thread-317 (_handle_client)" -> "_handle_client" so short-lived threads merge in the flamegraph
+            names = {t.ident: _THREAD_NAME_RE.sub(r"\1", t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name}@{os.path.basename(code.co_filename)}:{code.co_firstlineno}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self._samples[";".join(reversed(stack))] += 1
+            time.sleep(self.sample_interval)
+
+    def _dump(self):
+        import pstats # Deferred: only needed when a profile is written, and slow to import at startup
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, "profile-" + time.strftime("%Y%m%d-%H%M%S",
+                                                                           time.localtime(self.started_at)))
+        paths = []
+
+        stats = pstats.Stats(self._main_profile)
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+        stats.dump_stats(prefix + ".pstats")
+        paths.append(prefix + ".pstats")
+
+        with open(prefix + ".folded", "w") as f: # Input for flamegraph.pl / speedscope
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+        paths.append(prefix + ".folded")
+
+        with open(prefix + ".phases.json", "w") as f:
+            json.dump({"duration_seconds": time.time() - self.started_at, "phases": self.phase_summary()},
+                      f, indent=2)
+        paths.append(prefix + ".phases.json")
+        return paths
+
+    def phase_summary(self):
+        """Per-phase count and total/mean/max in milliseconds."""
+        summary = {}
+        for name, durations in list(self._phases.items()):
+            if durations:
+                total = sum(durations)
+                summary[name] = {"count": len(durations), "total_ms": total / 1e6,
+                                 "mean_ms": total / len(durations) / 1e6, "max_ms": max(durations) / 1e6}
+        return summary
+
+
+PROFILER = Profiler() # Process-wide instance used by the networking hooks, GUI and control signal
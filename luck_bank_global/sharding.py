@@ -0,0 +1,266 @@
+# sharding.py
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from config import DATABASE_FILENAME, DATABASE_SHARDS, EXPORT_CHUNK_ROWS, IMPORT_BATCH_ROWS
+from database import DatabaseManager
+
+
+def open_database(db_file=DATABASE_FILENAME, shards=DATABASE_SHARDS):
+    """
+    Returns the configured storage backend: a DatabaseManager, or a ShardedDatabaseManager for shards > 1.
+    Raises RuntimeError if the files on disk were written with a different shard count (see check_layout).
+    """
+    check_layout(db_file, shards)
+    if shards > 1:
+        return ShardedDatabaseManager(db_file, shards)
+    return DatabaseManager(db_file)
+
+
+def shard_file_name(db_file, index):
+    """luck_bank_data.db -> luck_bank_data.shard<index>.db"""
+    root, ext = os.path.splitext(db_file)
+    return f"{root}.shard{index}{ext or '.db'}"
+
+
+def check_layout(db_file, shards):
+    """
+    Refuses to open a ledger with a shard count other than the one it was written with: a single-file
+    ledger opened as shards (or the reverse) would silently get a brand-new primary wallet and keypair,
+    orphaning the old balance and key, and a changed shard count would look for wallets in the wrong file.
+    A new node (no files yet) is fine. Raises RuntimeError.
+    """
+    existing_shards = 0
+    while os.path.exists(shard_file_name(db_file, existing_shards)):
+        existing_shards += 1
+    single_file = os.path.exists(db_file)
+    if shards > 1 and single_file:
+        found = "an unsharded ledger"
+    elif shards > 1 and existing_shards not in (0, shards):
+        found = f"a ledger with {existing_shards} shards"
+    elif shards <= 1 and existing_shards and not single_file:
+        found = f"a ledger with {existing_shards} shards"
+    else:
+        return
+    raise RuntimeError(f"{db_file}: found {found}, but DATABASE_SHARDS is {shards}. Set DATABASE_SHARDS to "
+                       f"match; resharding an existing ledger is not supported.")
+
+
+class _ShardWriter:
+    """
+    Runs one shard's writes on a dedicated thread, in submission order.
+    Writers to the same file queue here instead of contending for SQLite's write lock (whose busy handler
+    backs off with sleeps), while writers to different shards commit in parallel.
+    """
+
+    def __init__(self, db, name):
+        self.db = db
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def call(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class ShardedDatabaseManager:
+    """
+    DatabaseManager interface over several SQLite files. Wallet `id` lives in shard `id % shards` together
+    with its transactions, so every single-wallet write stays one local transaction. Each shard has its own
+    writer thread; reads (history, wallet lists, stats) run scatter-gather on a thread pool and are merged.
+    The peer directory lives in shard 0.
+
+    Cross-shard guarantees are weaker than a single file: a local transfer between wallets on different
+    shards debits first and credits second (refunding the debit if the credit fails), and issuance commits
+    per shard.
+    """
+
+    def __init__(self, db_file=DATABASE_FILENAME, shards=DATABASE_SHARDS):
+        if shards < 1:
+            raise ValueError("At least one shard is required")
+        self.db_file = db_file
+        self.shards = [DatabaseManager(shard_file_name(db_file, i)) for i in range(shards)]
+        self._writers = [_ShardWriter(db, f"db-shard-{i}") for i, db in enumerate(self.shards)]
+        self._readers = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="db-read")
+        self._id_lock = threading.Lock()
+        self._addresses = {} # wallet id -> address, for the remote_address column of cross-shard transfers
+        for wallet in self.get_wallets():
+            self._addresses[wallet['id']] = wallet['address']
+        self._next_id = max(self._addresses, default=1) + 1 # id 1 is reserved for the primary wallet
+        logging.info("Sharded storage: %d shard files for %s", shards, db_file)
+
+    def close(self):
+        """Stops the writer threads and the read pool."""
+        for writer in self._writers:
+            writer.stop()
+        self._readers.shutdown(wait=False)
+
+    def _writer(self, wallet_id):
+        return self._writers[wallet_id % len(self._writers)]
+
+    def _gather(self, fn_name, *args):
+        """Runs DatabaseManager.<fn_name>(*args) on every shard in parallel; returns the per-shard results."""
+        return list(self._readers.map(lambda db: getattr(db, fn_name)(*args), self.shards))
+
+    # --- Wallets ---
+    def get_wallet_data(self, wallet_id=1):
+        wallet = self._writer(wallet_id).call(self.shards[wallet_id % len(self.shards)].get_wallet_data, wallet_id)
+        if wallet and wallet.get('id') is not None:
+            self._addresses[wallet['id']] = wallet['address']
+        return wallet
+
+    def get_wallets(self):
+        return sorted((w for wallets in self._gather("get_wallets") for w in wallets), key=lambda w: w['id'])
+
+    def create_wallets(self, count, label=None):
+        with self._id_lock:
+            ids = list(range(self._next_id, self._next_id + count))
+            self._next_id += count
+        by_shard = {}
+        for wallet_id in ids:
+            by_shard.setdefault(wallet_id % len(self.shards), []).append(wallet_id)
+        futures = [self._writers[index].submit(self.shards[index].create_wallets, len(shard_ids), label, shard_ids)
+                   for index, shard_ids in by_shard.items()]
+        created = sorted((w for future in futures for w in future.result()), key=lambda w: w['id'])
+        for wallet in created:
+            self._addresses[wallet['id']] = wallet['address']
+        return created
+
+    # --- Balance changes ---
+    def update_balance_add_transaction(self, tx_type, amount, new_balance, remote_address=None, details=None,
+                                       wallet_id=1):
+        return self._writer(wallet_id).call(self.shards[wallet_id % len(self.shards)].update_balance_add_transaction,
+                                            tx_type, amount, new_balance, remote_address, details, wallet_id)
+
+    def apply_balance_delta(self, wallet_id, tx_type, amount, delta, remote_address=None, details=None):
+        return self._writer(wallet_id).call(self.shards[wallet_id % len(self.shards)].apply_balance_delta,
+                                            wallet_id, tx_type, amount, delta, remote_address, details)
+
+    def transfer_between_wallets(self, from_wallet_id, to_wallet_id, amount, details=None):
+        if from_wallet_id % len(self.shards) == to_wallet_id % len(self.shards):
+            return self._writer(from_wallet_id).call(
+                self.shards[from_wallet_id % len(self.shards)].transfer_between_wallets,
+                from_wallet_id, to_wallet_id, amount, details)
+        # Different files: debit (with the funds check) first, then credit; undo the debit if the credit fails
+        from_balance = self.apply_balance_delta(from_wallet_id, 'sent', amount, -amount,
+                                                self._addresses.get(to_wallet_id), details)
+        if from_balance is None:
+            return None
+        to_balance = self.apply_balance_delta(to_wallet_id, 'received', amount, amount,
+                                              self._addresses.get(from_wallet_id), details)
+        if to_balance is None:
+            logging.error("Cross-shard transfer %s -> %s failed after the debit; refunding", from_wallet_id,
+                          to_wallet_id)
+            self.apply_balance_delta(from_wallet_id, 'received', amount, amount, None,
+                                     f"Refund of failed local transfer to wallet {to_wallet_id}")
+            return None
+        return from_balance, to_balance
+
+    def apply_issuance(self, amount, details=None):
+        """
+        Issues on every shard, one transaction each. Returns {wallet_id: new_balance} for the shards that
+        committed even when others failed (their wallets are simply missing), so the caller can update the
+        balances that did change; None only if no shard committed.
+        """
+        futures = [writer.submit(db.apply_issuance, amount, details) for writer, db in zip(self._writers, self.shards)]
+        balances = {}
+        failed = 0
+        for index, future in enumerate(futures):
+            shard_balances = future.result()
+            if shard_balances is None:
+                failed += 1
+                logging.error("Issuance failed on shard %d; its wallets were not credited", index)
+                continue
+            balances.update(shard_balances)
+        return balances if failed < len(futures) else None
+
+    # --- Reads ---
+    def get_transaction_history(self, limit=100, wallet_id=1):
+        if wallet_id is not None:
+            return self.shards[wallet_id % len(self.shards)].get_transaction_history(limit, wallet_id)
+        # Every shard returns its newest rows; merge the sorted lists and keep the overall newest
+        per_shard = self._gather("get_transaction_history", limit, None)
+        merged = heapq.merge(*per_shard, key=lambda row: row['timestamp'], reverse=True)
+        return [row for row, _ in zip(merged, range(limit))]
+
+    def get_ledger_stats(self, wallet_id=None):
+        if wallet_id is not None:
+            return self.shards[wallet_id % len(self.shards)].get_ledger_stats(wallet_id)
+        totals = {"wallets": 0, "total_balance": 0.0, "transactions": 0, "by_type": {}}
+        for stats in self._gather("get_ledger_stats"):
+            if stats is None:
+                return None
+            for key in ("wallets", "total_balance", "transactions"):
+                totals[key] += stats[key]
+            for tx_type, entry in stats["by_type"].items():
+                merged = totals["by_type"].setdefault(tx_type, {"count": 0, "amount": 0.0})
+                merged["count"] += entry["count"]
+                merged["amount"] += entry["amount"]
+        return totals
+
+    # --- Export / Import ---
+    def iter_transactions(self, since=None, until=None, tx_types=None, wallet_id=None, chunk_size=EXPORT_CHUNK_ROWS):
+        if wallet_id is not None:
+            yield from self.shards[wallet_id % len(self.shards)].iter_transactions(since, until, tx_types, wallet_id,
+                                                                                  chunk_size)
+            return
+        # Each shard streams oldest first; merge the streams row by row and cut the result into chunks again
+        per_shard = [itertools.chain.from_iterable(db.iter_transactions(since, until, tx_types, None, chunk_size))
+                     for db in self.shards]
+        merged = heapq.merge(*per_shard, key=lambda row: row[2]) # row[2] is the timestamp
+        while True:
+            rows = list(itertools.islice(merged, chunk_size))
+            if not rows:
+                break
+            yield rows
+
+    def bulk_insert_transactions(self, rows, batch_size=IMPORT_BATCH_ROWS):
+        """Routes rows to their wallet's shard and inserts each shard's batch through that shard's writer."""
+        pending = [[] for _ in self.shards]
+        inserted = 0
+        for row in rows:
+            index = row[1] % len(self.shards) # row[1] is the wallet id
+            pending[index].append(row)
+            if len(pending[index]) >= batch_size:
+                inserted += self._writers[index].call(self.shards[index].bulk_insert_transactions, pending[index],
+                                                      batch_size)
+                pending[index] = []
+        futures = [self._writers[index].submit(self.shards[index].bulk_insert_transactions, batch, batch_size)
+                   for index, batch in enumerate(pending) if batch]
+        return inserted + sum(future.result() for future in futures)
+
+    # --- Peer directory (shard 0) ---
+    def upsert_peers(self, entries):
+        return self._writers[0].call(self.shards[0].upsert_peers, list(entries))
+
+    def get_peer(self, address):
+        return self.shards[0].get_peer(address)
+
+    def prune_peers(self, older_than):
+        return self._writers[0].call(self.shards[0].prune_peers, older_than)
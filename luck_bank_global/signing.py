@@ -0,0 +1,272 @@
+# signing.py
+import base64
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat, PrivateFormat, NoEncryption
+    CRYPTO_AVAILABLE = True
+except ImportError: # Optional dependency: without it wallets fall back to unsigned transfers
+    CRYPTO_AVAILABLE = False
+
+from utils import encode_address
+from config import (ADDRESS_PREFIX, ADDRESS_LENGTH, SIGNATURE_MAX_AGE_SECONDS, SIGNATURE_VERIFY_WORKERS,
+                    PUBLIC_KEY_CACHE_SIZE, REPLAY_CACHE_SIZE)
+
+
+def generate_keypair():
+    """Generates a new Ed25519 keypair. Returns (private_key_hex, public_key_hex)."""
+    if not CRYPTO_AVAILABLE:
+        raise RuntimeError("The 'cryptography' package is required for signed wallets.")
+    private_key = Ed25519PrivateKey.generate()
+    private_raw = private_key.private_bytes(Encoding.Raw, PrivateFormat.Raw, NoEncryption())
+    public_raw = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return private_raw.hex(), public_raw.hex()
+
+
+def address_from_public_key(public_key_hex, prefix=ADDRESS_PREFIX, length=ADDRESS_LENGTH):
+    """Derives the wallet address owned by a public key (base32 of its SHA-256 digest, plus checksum)."""
+    digest = hashlib.sha256(bytes.fromhex(public_key_hex)).digest()
+    return encode_address(base64.b32encode(digest).decode('ascii')[:length], prefix)
+
+
+def transfer_signing_payload(sender_address, recipient_address, amount_str, sender_port, nonce, timestamp):
+    """
+    Canonical bytes covered by a transfer signature. The recipient is included so a captured transfer
+    cannot be replayed to another node (each node only keeps its own replay cache), and the sender's
+    listening port because the recipient records it in its peer directory.
+    """
+    return (f"transfer|{sender_address}|{recipient_address}|{amount_str}|{sender_port or ''}|{nonce}|{timestamp}"
+            .encode('utf-8'))
+
+
+def sign_transfer(private_key_hex, sender_address, amount_str, recipient_address, sender_port=None):
+    """
+    Signs a transfer to `recipient_address` and returns the fields to merge into the 'transfer' message:
+    public_key, nonce, timestamp and signature (all JSON-safe). Pass the message's `sender_port` if it has one.
+    """
+    if not CRYPTO_AVAILABLE:
+        raise RuntimeError("The 'cryptography' package is required to sign transfers.")
+    private_key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(private_key_hex))
+    public_raw = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    nonce = secrets.token_hex(8)
+    timestamp = int(time.time())
+    signature = private_key.sign(transfer_signing_payload(sender_address, recipient_address, amount_str,
+                                                          sender_port, nonce, timestamp))
+    return {
+        "public_key": public_raw.hex(),
+        "nonce": nonce,
+        "timestamp": timestamp,
+        "signature": signature.hex(),
+    }
+
+
+def ack_signing_payload(recipient_address, transfer_signature):
+    """
+    Canonical bytes covered by a transfer acknowledgement. The transfer's own signature already binds
+    sender, recipient, amount and nonce, so the ack only has to tie the recipient wallet to it.
+    """
+    return f"ack|{recipient_address}|{transfer_signature}".encode('utf-8')
+
+
+def sign_ack(private_key_hex, recipient_address, transfer_signature):
+    """Signs the acknowledgement of a signed transfer; returns the fields to merge into the response."""
+    if not CRYPTO_AVAILABLE:
+        raise RuntimeError("The 'cryptography' package is required to sign acknowledgements.")
+    private_key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(private_key_hex))
+    public_raw = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    signature = private_key.sign(ack_signing_payload(recipient_address, transfer_signature))
+    return {"ack_public_key": public_raw.hex(), "ack_signature": signature.hex()}
+
+
+def hello_signing_payload(address, port, challenge, nonce, timestamp):
+    """
+    Canonical bytes covered by a gossip 'hello' signature (binds the address to the advertised port).
+    A reply hello also covers the requester's `challenge`, which proves it was signed for that connection;
+    unsolicited hellos (challenge None) keep the original format.
+    """
+    if challenge is None:
+        return f"hello|{address}|{port}|{nonce}|{timestamp}".encode('utf-8')
+    return f"hello|{address}|{port}|{challenge}|{nonce}|{timestamp}".encode('utf-8')
+
+
+def sign_hello(private_key_hex, address, port, challenge=None):
+    """Signs a gossip 'hello' (answering `challenge`, if given); returns the same fields as sign_transfer()."""
+    if not CRYPTO_AVAILABLE:
+        raise RuntimeError("The 'cryptography' package is required to sign hellos.")
+    private_key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(private_key_hex))
+    public_raw = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    nonce = secrets.token_hex(8)
+    timestamp = int(time.time())
+    signature = private_key.sign(hello_signing_payload(address, port, challenge, nonce, timestamp))
+    return {
+        "public_key": public_raw.hex(),
+        "nonce": nonce,
+        "timestamp": timestamp,
+        "signature": signature.hex(),
+    }
+
+
+class PublicKeyCache:
+    """Thread-safe LRU cache of parsed public keys, keyed by wallet address."""
+
+    def __init__(self, max_size=PUBLIC_KEY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict() # address -> (public_key_hex, Ed25519PublicKey)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, address, public_key_hex):
+        """
+        Returns the parsed key for `address`, parsing and caching it on a miss.
+        Raises ValueError if `public_key_hex` is malformed or does not own `address`.
+        """
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is not None and entry[0] == public_key_hex:
+                self._entries.move_to_end(address)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Parse outside the lock; a duplicate parse on a race is harmless
+        if address_from_public_key(public_key_hex) != address:
+            raise ValueError("Public key does not match sender address")
+        public_key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key_hex))
+
+        with self._lock:
+            self._entries[address] = (public_key_hex, public_key)
+            self._entries.move_to_end(address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return public_key
+
+
+class SignatureVerifier:
+    """Verifies signed 'transfer' messages, singly or in batches on a worker pool."""
+
+    def __init__(self, max_workers=SIGNATURE_VERIFY_WORKERS, key_cache=None):
+        self.key_cache = key_cache or PublicKeyCache()
+        self.max_workers = max_workers
+        self._executor = None # Created lazily on first batch
+        self._executor_lock = threading.Lock()
+        self._seen_signatures = OrderedDict() # signature hex -> timestamp (replay protection)
+        self._seen_lock = threading.Lock()
+
+    def verify(self, message):
+        """
+        Verifies one transfer message dict.
+        Returns (True, None) if valid, otherwise (False, reason).
+        """
+        return self._verify(message, "sender_address", "Replayed transfer",
+                            lambda timestamp: transfer_signing_payload(message["sender_address"],
+                                                                       message["recipient_address"],
+                                                                       message["amount"], message.get("sender_port"),
+                                                                       message["nonce"], timestamp))
+
+    def verify_hello(self, message, challenge=None):
+        """
+        Verifies a gossip 'hello' message dict (address, port, public_key, nonce, timestamp, signature).
+        Pass the `challenge` we sent to verify a reply; a fresh challenge rules out replays by itself.
+        """
+        return self._verify(message, "address", "Replayed hello",
+                            lambda timestamp: hello_signing_payload(message["address"], message["port"], challenge,
+                                                                    message["nonce"], timestamp),
+                            remember=challenge is None)
+
+    def verify_ack(self, response, transfer_signature):
+        """True if a transfer acknowledgement is signed by the key of the wallet it names (recipient_address)."""
+        if not CRYPTO_AVAILABLE:
+            return False
+        try:
+            address = response["recipient_address"]
+            public_key = self.key_cache.get(address, response["ack_public_key"])
+            public_key.verify(bytes.fromhex(response["ack_signature"]), ack_signing_payload(address, transfer_signature))
+        except (KeyError, TypeError, ValueError, InvalidSignature):
+            return False
+        return True
+
+    def _verify(self, message, address_field, replay_reason, build_payload, remember=True):
+        if not CRYPTO_AVAILABLE:
+            return False, "Signature verification unavailable on this node"
+        try:
+            address = message[address_field]
+            public_key_hex = message["public_key"]
+            timestamp = int(message["timestamp"])
+            signature = bytes.fromhex(message["signature"])
+            payload = build_payload(timestamp)
+        except (KeyError, TypeError, ValueError):
+            return False, "Missing or malformed signature fields"
+
+        if abs(time.time() - timestamp) > SIGNATURE_MAX_AGE_SECONDS:
+            return False, "Signature expired"
+
+        try:
+            public_key = self.key_cache.get(address, public_key_hex)
+            public_key.verify(signature, payload)
+        except InvalidSignature:
+            return False, "Invalid signature"
+        except (TypeError, ValueError) as e:
+            return False, f"Invalid public key: {e}"
+
+        if not remember:
+            return True, None
+        remembered = self.remember_signature(message["signature"], timestamp)
+        if remembered is None:
+            return False, "Replay cache full, retry later"
+        if not remembered:
+            return False, replay_reason
+        return True, None
+
+    def verify_batch(self, messages):
+        """Verifies a list of transfer messages in parallel. Returns a list of (ok, reason) in order."""
+        if len(messages) <= 1:
+            return [self.verify(m) for m in messages]
+        return list(self._get_executor().map(self.verify, messages))
+
+    def shutdown(self):
+        """Stops the worker pool (if started)."""
+        with self._executor_lock:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="sig-verify")
+            return self._executor
+
+    def remember_signature(self, signature_hex, timestamp):
+        """
+        Records a signature. Returns True if it is new, False if it was already seen (replay), and None if
+        the cache is full of signatures that are still within SIGNATURE_MAX_AGE_SECONDS: evicting one of
+        those would let it be replayed, so the new signature is refused instead (the sender can retry).
+        """
+        cutoff = time.time() - SIGNATURE_MAX_AGE_SECONDS
+        with self._seen_lock:
+            if signature_hex in self._seen_signatures:
+                return False
+            # Only expired entries may be dropped: they would fail the age check anyway
+            while self._seen_signatures:
+                oldest_sig, oldest_ts = next(iter(self._seen_signatures.items()))
+                if oldest_ts >= cutoff:
+                    break
+                del self._seen_signatures[oldest_sig]
+            if len(self._seen_signatures) >= REPLAY_CACHE_SIZE:
+                return None
+            self._seen_signatures[signature_hex] = timestamp
+        return True
+
+    def forget_signature(self, signature_hex):
+        """Removes a signature recorded by remember_signature() (used when a shared cache refused it)."""
+        with self._seen_lock:
+            self._seen_signatures.pop(signature_hex, None)
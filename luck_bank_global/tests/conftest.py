@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The application uses flat imports (run from luck_bank_global/); make them work from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,123 @@
+# tests/test_admission.py
+import pytest
+
+import admission
+from admission import (AdmissionController, REJECT_AT_CAPACITY, REJECT_BANNED, REJECT_INVALID_MESSAGE,
+                       REJECT_RATE_LIMITED)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the test advances it."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _controller(clock, max_handlers=100, rate=1.0, burst=3):
+    return AdmissionController(max_handlers=max_handlers, rate=rate, burst=burst, clock=clock)
+
+
+def _admit_and_release(controller, ip):
+    reason = controller.admit(ip)
+    if reason is None:
+        controller.release()
+    return reason
+
+
+def _ban(controller, ip):
+    for _ in range(admission.PEER_INVALID_STRIKES):
+        controller.record_invalid(ip)
+
+
+# --- Token bucket ---
+def test_burst_then_rate_limited(clock):
+    controller = _controller(clock)
+    assert [_admit_and_release(controller, "10.0.0.1") for _ in range(4)] == [None, None, None, REJECT_RATE_LIMITED]
+    assert _admit_and_release(controller, "10.0.0.2") is None # Buckets are per IP
+    assert controller.rejections[REJECT_RATE_LIMITED] == 1
+
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    controller = _controller(clock, rate=2.0, burst=3)
+    for _ in range(3):
+        _admit_and_release(controller, "10.0.0.1")
+    clock.advance(0.5) # One token
+    assert _admit_and_release(controller, "10.0.0.1") is None
+    assert _admit_and_release(controller, "10.0.0.1") == REJECT_RATE_LIMITED
+    clock.advance(60) # Refill stops at the burst size
+    assert [_admit_and_release(controller, "10.0.0.1") for _ in range(4)] == [None, None, None, REJECT_RATE_LIMITED]
+
+
+# --- Handler cap ---
+def test_handler_cap(clock):
+    controller = _controller(clock, max_handlers=2, burst=10)
+    assert controller.admit("10.0.0.1") is None
+    assert controller.admit("10.0.0.2") is None
+    assert controller.admit("10.0.0.3") == REJECT_AT_CAPACITY
+    controller.release()
+    assert controller.admit("10.0.0.3") is None
+    assert controller.snapshot()["active_handlers"] == 2
+
+
+def test_capacity_rejection_keeps_the_token(clock):
+    controller = _controller(clock, max_handlers=1, burst=1)
+    assert controller.admit("10.0.0.1") is None
+    assert controller.admit("10.0.0.2") == REJECT_AT_CAPACITY
+    controller.release()
+    assert controller.admit("10.0.0.2") is None
+
+
+# --- Bans ---
+def test_ban_after_strikes_and_expiry(clock):
+    controller = _controller(clock)
+    _ban(controller, "10.0.0.1")
+    assert controller.admit("10.0.0.1") == REJECT_BANNED
+    assert controller.snapshot()["banned_peers"] == 1
+    clock.advance(admission.PEER_BAN_SECONDS - 1)
+    assert controller.admit("10.0.0.1") == REJECT_BANNED
+    clock.advance(2)
+    assert _admit_and_release(controller, "10.0.0.1") is None
+    assert controller.snapshot()["banned_peers"] == 0
+    assert controller.rejections[REJECT_INVALID_MESSAGE] == admission.PEER_INVALID_STRIKES
+
+
+def test_strikes_outside_the_window_do_not_ban(clock):
+    controller = _controller(clock)
+    for _ in range(admission.PEER_INVALID_STRIKES - 1):
+        controller.record_invalid("10.0.0.1")
+    clock.advance(admission.PEER_STRIKE_WINDOW_SECONDS + 1)
+    controller.record_invalid("10.0.0.1")
+    assert _admit_and_release(controller, "10.0.0.1") is None
+
+
+# --- Peer table bound ---
+def test_idle_peers_are_pruned_when_the_table_is_full(clock, monkeypatch):
+    monkeypatch.setattr(admission, "PEER_TABLE_MAX", 3)
+    controller = _controller(clock)
+    for i in range(3):
+        _admit_and_release(controller, f"10.0.0.{i}")
+    clock.advance(10) # Buckets refilled: every entry is idle
+    _admit_and_release(controller, "10.0.1.1")
+    assert set(controller._peers) == {"10.0.1.1"}
+
+
+def test_invalid_message_spray_evicts_oldest_unbanned(clock, monkeypatch):
+    monkeypatch.setattr(admission, "PEER_TABLE_MAX", 3)
+    controller = _controller(clock)
+    _ban(controller, "10.0.0.1")
+    for i in range(20): # Every entry carries a recent strike, so pruning alone frees nothing
+        controller.record_invalid(f"10.0.1.{i}")
+        assert len(controller._peers) <= 3
+    assert list(controller._peers) == ["10.0.0.1", "10.0.1.18", "10.0.1.19"]
+    assert controller.admit("10.0.0.1") == REJECT_BANNED # Bans survive the eviction
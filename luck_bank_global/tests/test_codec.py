@@ -0,0 +1,150 @@
+# tests/test_codec.py
+import json
+import struct
+
+import pytest
+
+import codec
+from codec import (FRAME_HEADER_SIZE, JSON, BinaryCodec, CodecNegotiator, detect_codec, frame_size, is_framed,
+                   message_complete)
+
+TRANSFER = {
+    "action": "transfer",
+    "amount": "12.5",
+    "sender_address": "LGBX_" + "A" * 36,
+    "sender_port": 61001,
+    "public_key": "ab" * 32,
+    "nonce": "0123456789abcdef",
+    "timestamp": 1760000000,
+    "signature": "cd" * 64,
+}
+MIXED = {
+    "none": None, "true": True, "false": False, "small": 5, "negative": -7, "large_negative": -(2 ** 40),
+    "port": 65535, "big": 2 ** 40, "float": 0.125, "short_hex": "abcd", "upper_hex": "ABCDEF0123456789",
+    "text": "x" * 300, "unicode": "Luck ✓", "list": [1, "two", [3.0, None]], "nested": {"peers": [{"ip": "10.0.0.1"}]},
+    "long_list": list(range(20)), "empty": {},
+}
+
+
+@pytest.fixture(params=[False, True] if codec.MSGPACK_AVAILABLE else [False], ids=lambda m: "msgpack" if m else "pure")
+def binary(request, monkeypatch):
+    monkeypatch.setattr(codec, "MSGPACK_AVAILABLE", request.param)
+    return BinaryCodec()
+
+
+def _frame(body, codec_id=BinaryCodec.codec_id, version=codec.FRAME_VERSION, magic=codec.FRAME_MAGIC):
+    return struct.pack("!2sBBI", magic, version, codec_id, len(body)) + body
+
+
+# --- Round trips ---
+@pytest.mark.parametrize("message", [TRANSFER, MIXED], ids=["transfer", "mixed"])
+def test_binary_round_trip(binary, message):
+    data = binary.encode(message)
+    assert is_framed(data) and message_complete(data)
+    assert frame_size(data) == len(data)
+    assert detect_codec(data).name == "binary"
+    assert binary.decode(data) == message
+
+
+def test_hex_strings_travel_as_bytes(binary):
+    assert len(binary.encode(TRANSFER)) < len(JSON.encode(TRANSFER))
+
+
+@pytest.mark.parametrize("message", [TRANSFER, MIXED], ids=["transfer", "mixed"])
+def test_json_round_trip(message):
+    data = JSON.encode(message)
+    assert not is_framed(data) and message_complete(data)
+    assert detect_codec(data) is JSON
+    assert JSON.decode(data) == message
+
+
+def test_pure_python_matches_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    body = bytearray()
+    codec._pack(MIXED, body)
+    assert bytes(body) == msgpack.packb(codec._hex_to_ext(MIXED))
+
+
+def test_encode_rejects_unsupported_types(binary):
+    with pytest.raises((ValueError, TypeError)):
+        binary.encode({"value": object()})
+
+
+# --- Malformed input ---
+@pytest.mark.parametrize("data", [b"LB", b"LB\x01", b"LB\x01\x01\x00\x00"], ids=["magic", "version", "partial"])
+def test_short_frame_header_raises_value_error(data):
+    with pytest.raises(ValueError):
+        detect_codec(data)
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(data)
+    assert not message_complete(data)
+
+
+@pytest.mark.parametrize("data", [
+    _frame(b"\x80", version=9),
+    _frame(b"\x80", codec_id=99),
+    struct.pack("!2sBBI", b"LB", codec.FRAME_VERSION, BinaryCodec.codec_id, codec.MAX_MESSAGE_SIZE + 1),
+], ids=["version", "codec_id", "oversized"])
+def test_bad_frame_header(data):
+    with pytest.raises(ValueError):
+        detect_codec(data)
+
+
+@pytest.mark.parametrize("body", [
+    b"\x81\xa6action",        # map value missing
+    b"\xa5abc",               # string shorter than its length
+    b"\xda\x00",              # length field cut short
+    b"\xcd\x01",              # uint16 cut short
+    b"\xd8\x01" + b"\x00" * 4,  # fixext16 cut short
+    b"\xc1",                  # never-used type byte
+    b"\xd4\x07\x00",          # unknown ext type
+    b"\x81\x01\x02",          # non-string map key
+    b"\x91" * 40 + b"\xc0",   # nested too deeply
+    b"\xdd\xff\xff\xff\xff",  # array claims more items than there are bytes
+    b"\xc0\xc0",              # trailing bytes
+], ids=["map", "str", "length", "uint16", "fixext", "type", "ext", "key", "depth", "array", "trailing"])
+def test_malformed_body_raises_value_error(binary, body):
+    with pytest.raises(ValueError):
+        binary.decode(_frame(body))
+
+
+def test_truncated_and_oversized_frames(binary):
+    data = binary.encode(TRANSFER)
+    with pytest.raises(ValueError):
+        binary.decode(data[:-1])
+    with pytest.raises(ValueError):
+        binary.decode(data + b"\x00")
+    assert not message_complete(data[:FRAME_HEADER_SIZE + 1])
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        JSON.decode(b'{"action": ')
+    with pytest.raises(ValueError):
+        JSON.decode(b"\xff\xfe")
+
+
+# --- Negotiation ---
+def test_negotiator_upgrades_on_advertisement_and_falls_back():
+    negotiator = CodecNegotiator(preferred="binary", max_peers=2)
+    assert negotiator.codec_for("10.0.0.1", 1) is JSON
+    negotiator.record_response("10.0.0.1", 1, {"status": "success", "codecs": ["json", "binary"]})
+    assert negotiator.codec_for("10.0.0.1", 1).name == "binary"
+    negotiator.record_failure("10.0.0.1", 1)
+    assert negotiator.codec_for("10.0.0.1", 1) is JSON
+
+
+def test_negotiator_ignores_peers_without_binary():
+    negotiator = CodecNegotiator(preferred="binary")
+    negotiator.record_response("10.0.0.1", 1, json.loads('{"status": "success"}'))
+    negotiator.record_response("10.0.0.2", 1, {"status": "success", "codecs": ["json"]})
+    assert negotiator.codec_for("10.0.0.1", 1) is JSON
+    assert negotiator.codec_for("10.0.0.2", 1) is JSON
+
+
+def test_default_preference_needs_msgpack(monkeypatch):
+    monkeypatch.setattr(codec, "P2P_CODEC", "binary")
+    monkeypatch.setattr(codec, "MSGPACK_AVAILABLE", False)
+    assert CodecNegotiator().preferred is JSON
+    monkeypatch.setattr(codec, "MSGPACK_AVAILABLE", True)
+    assert CodecNegotiator().preferred.name == "binary"
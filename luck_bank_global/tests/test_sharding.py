@@ -0,0 +1,107 @@
+# tests/test_sharding.py
+import os
+
+import pytest
+
+from database import DatabaseManager
+from sharding import ShardedDatabaseManager, check_layout, open_database, shard_file_name
+
+SHARDS = 3
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "ledger.db")
+
+
+@pytest.fixture
+def sharded(db_file):
+    db = ShardedDatabaseManager(db_file, SHARDS)
+    db.get_wallet_data() # Creates the primary wallet (id 1)
+    db.create_wallets(5) # ids 2..6
+    yield db
+    db.close()
+
+
+def _row(wallet_id, second, amount=1.0):
+    """A transaction row in TRANSACTION_COLUMNS order (the id is reassigned on insert)."""
+    return (None, wallet_id, f"2026-01-01 00:00:{second:02d}", 'received', amount, None, amount, None)
+
+
+# --- Routing ---
+def test_wallets_live_in_shard_id_mod_shards(sharded):
+    assert [w['id'] for w in sharded.get_wallets()] == [1, 2, 3, 4, 5, 6]
+    for index, shard in enumerate(sharded.shards):
+        ids = [w['id'] for w in shard.get_wallets()]
+        assert ids and all(wallet_id % SHARDS == index for wallet_id in ids)
+
+
+def test_balance_changes_go_to_the_wallets_shard(sharded):
+    assert sharded.apply_balance_delta(5, 'received', 2.0, 2.0) == 2.0
+    assert sharded.get_wallet_data(5)['balance'] == 2.0
+    assert len(sharded.shards[5 % SHARDS].get_transaction_history(10, 5)) == 1
+    for index in range(SHARDS):
+        if index != 5 % SHARDS:
+            assert sharded.shards[index].get_transaction_history(10, None) == []
+
+
+def test_cross_shard_transfer(sharded):
+    sharded.apply_balance_delta(2, 'received', 10.0, 10.0)
+    assert sharded.transfer_between_wallets(2, 3, 4.0) == (6.0, 4.0)
+    assert sharded.transfer_between_wallets(2, 3, 100.0) is None # Insufficient funds: nothing credited
+    assert (sharded.get_wallet_data(2)['balance'], sharded.get_wallet_data(3)['balance']) == (6.0, 4.0)
+    history = sharded.get_transaction_history(10, 3)
+    assert [(row['type'], row['remote_address']) for row in history] == [
+        ('received', sharded.get_wallet_data(2)['address'])]
+
+
+def test_issuance_credits_every_shard(sharded):
+    balances = sharded.apply_issuance(1.0)
+    assert sorted(balances) == [1, 2, 3, 4, 5, 6]
+
+
+# --- Scatter-gather reads ---
+def test_history_across_shards_is_merged_newest_first(sharded):
+    rows = [_row(wallet_id, second) for second, wallet_id in enumerate([1, 2, 3, 4, 5, 6, 2, 3, 1])]
+    assert sharded.bulk_insert_transactions(rows, batch_size=2) == len(rows)
+    history = sharded.get_transaction_history(limit=4, wallet_id=None)
+    assert [row['timestamp'][-2:] for row in history] == ["08", "07", "06", "05"]
+
+
+def test_export_stream_is_merged_oldest_first(sharded):
+    rows = [_row(wallet_id, second) for second, wallet_id in enumerate([6, 5, 4, 3, 2, 1])]
+    sharded.bulk_insert_transactions(rows)
+    chunks = list(sharded.iter_transactions(chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+    assert [row[1] for chunk in chunks for row in chunk] == [6, 5, 4, 3, 2, 1]
+
+
+def test_ledger_stats_are_summed(sharded):
+    sharded.bulk_insert_transactions([_row(wallet_id, wallet_id, amount=2.0) for wallet_id in range(1, 7)])
+    stats = sharded.get_ledger_stats()
+    assert stats["wallets"] == 6
+    assert stats["transactions"] == 6
+    assert stats["by_type"]["received"] == {"count": 6, "amount": 12.0}
+
+
+# --- Layout checks ---
+def test_new_ledger_opens_with_any_shard_count(db_file):
+    check_layout(db_file, 1)
+    check_layout(db_file, SHARDS)
+    assert isinstance(open_database(db_file, 1), DatabaseManager)
+
+
+def test_sharded_ledger_refuses_another_shard_count(sharded, db_file):
+    assert all(os.path.exists(shard_file_name(db_file, i)) for i in range(SHARDS))
+    check_layout(db_file, SHARDS)
+    for shards in (1, SHARDS - 1, SHARDS + 1):
+        with pytest.raises(RuntimeError, match="DATABASE_SHARDS"):
+            open_database(db_file, shards)
+
+
+def test_single_file_ledger_refuses_shards(db_file):
+    DatabaseManager(db_file).get_wallet_data()
+    check_layout(db_file, 1)
+    with pytest.raises(RuntimeError, match="unsharded"):
+        open_database(db_file, SHARDS)
+    assert not os.path.exists(shard_file_name(db_file, 0))
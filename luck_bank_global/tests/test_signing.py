@@ -0,0 +1,153 @@
+# tests/test_signing.py
+import time
+
+import pytest
+
+import signing
+from signing import (CRYPTO_AVAILABLE, SignatureVerifier, address_from_public_key, generate_keypair, sign_ack,
+                     sign_hello, sign_transfer)
+
+pytestmark = pytest.mark.skipif(not CRYPTO_AVAILABLE, reason="needs the 'cryptography' package")
+
+
+def _wallet():
+    private_key, public_key = generate_keypair()
+    return private_key, address_from_public_key(public_key)
+
+
+@pytest.fixture
+def sender():
+    return _wallet()
+
+
+@pytest.fixture
+def recipient():
+    return _wallet()
+
+
+def _transfer(sender, recipient_address, amount="2.5", sender_port=61001):
+    private_key, address = sender
+    message = {"action": "transfer", "amount": amount, "sender_address": address,
+               "recipient_address": recipient_address, "sender_port": sender_port}
+    message.update(sign_transfer(private_key, address, amount, recipient_address, sender_port))
+    return message
+
+
+# --- Transfers ---
+def test_signed_transfer_verifies(sender, recipient):
+    assert SignatureVerifier().verify(_transfer(sender, recipient[1])) == (True, None)
+
+
+def test_transfer_redirected_to_another_recipient_is_rejected(sender, recipient):
+    message = _transfer(sender, recipient[1])
+    message["recipient_address"] = _wallet()[1]
+    assert SignatureVerifier().verify(message) == (False, "Invalid signature")
+
+
+@pytest.mark.parametrize("field, value", [("amount", "250"), ("sender_port", 1)], ids=["amount", "sender_port"])
+def test_tampered_transfer_is_rejected(sender, recipient, field, value):
+    message = _transfer(sender, recipient[1])
+    message[field] = value
+    assert SignatureVerifier().verify(message) == (False, "Invalid signature")
+
+
+def test_key_must_own_sender_address(sender, recipient):
+    message = _transfer(sender, recipient[1])
+    message["sender_address"] = _wallet()[1]
+    ok, reason = SignatureVerifier().verify(message)
+    assert not ok and reason.startswith("Invalid public key")
+
+
+def test_replayed_transfer_is_rejected(sender, recipient):
+    verifier = SignatureVerifier()
+    message = _transfer(sender, recipient[1])
+    assert verifier.verify(message) == (True, None)
+    assert verifier.verify(dict(message)) == (False, "Replayed transfer")
+
+
+def test_expired_transfer_is_rejected(sender, recipient, monkeypatch):
+    message = _transfer(sender, recipient[1])
+    now = time.time() + signing.SIGNATURE_MAX_AGE_SECONDS + 1
+    monkeypatch.setattr(signing.time, "time", lambda: now)
+    assert SignatureVerifier().verify(message) == (False, "Signature expired")
+
+
+def test_verify_batch_keeps_order(sender, recipient):
+    good = _transfer(sender, recipient[1])
+    bad = dict(_transfer(sender, recipient[1]), amount="99")
+    results = SignatureVerifier(max_workers=2).verify_batch([good, bad, good])
+    assert results == [(True, None), (False, "Invalid signature"), (False, "Replayed transfer")]
+
+
+# --- Replay cache ---
+def test_replay_cache_refuses_when_full_of_unexpired(monkeypatch):
+    monkeypatch.setattr(signing, "REPLAY_CACHE_SIZE", 2)
+    verifier = SignatureVerifier()
+    now = time.time()
+    assert verifier.remember_signature("aa", now) is True
+    assert verifier.remember_signature("bb", now) is True
+    assert verifier.remember_signature("cc", now) is None
+    # Neither unexpired entry was evicted to make room
+    assert verifier.remember_signature("aa", now) is False
+    assert verifier.remember_signature("bb", now) is False
+
+
+def test_replay_cache_drops_expired_entries_for_new_ones(monkeypatch):
+    monkeypatch.setattr(signing, "REPLAY_CACHE_SIZE", 2)
+    verifier = SignatureVerifier()
+    now = time.time()
+    expired = now - signing.SIGNATURE_MAX_AGE_SECONDS - 1
+    assert verifier.remember_signature("aa", expired) is True
+    assert verifier.remember_signature("bb", now) is True
+    assert verifier.remember_signature("cc", now) is True
+    assert verifier.remember_signature("aa", now) is None # Cache full again (bb, cc); aa was dropped, not kept
+
+
+def test_forget_signature_allows_a_retry():
+    verifier = SignatureVerifier()
+    assert verifier.remember_signature("aa", time.time()) is True
+    verifier.forget_signature("aa")
+    assert verifier.remember_signature("aa", time.time()) is True
+
+
+# --- Acknowledgements ---
+def _ack(wallet, transfer_signature, named_address=None):
+    private_key, address = wallet
+    response = {"status": "success", "recipient_address": named_address or address}
+    response.update(sign_ack(private_key, address, transfer_signature))
+    return response
+
+
+def test_ack_from_the_named_wallet_verifies(sender, recipient):
+    transfer = _transfer(sender, recipient[1])
+    assert SignatureVerifier().verify_ack(_ack(recipient, transfer["signature"]), transfer["signature"])
+
+
+def test_ack_signed_with_another_key_is_rejected(sender, recipient):
+    transfer = _transfer(sender, recipient[1])
+    # Signed by a different wallet but naming the recipient: the key does not own the named address
+    forged = _ack(_wallet(), transfer["signature"], named_address=recipient[1])
+    assert not SignatureVerifier().verify_ack(forged, transfer["signature"])
+
+
+def test_ack_for_another_transfer_is_rejected(sender, recipient):
+    first, second = _transfer(sender, recipient[1]), _transfer(sender, recipient[1])
+    assert not SignatureVerifier().verify_ack(_ack(recipient, first["signature"]), second["signature"])
+
+
+def test_unsigned_ack_is_rejected(sender, recipient):
+    transfer = _transfer(sender, recipient[1])
+    response = {"status": "success", "recipient_address": recipient[1]}
+    assert not SignatureVerifier().verify_ack(response, transfer["signature"])
+
+
+# --- Hellos ---
+def test_hello_reply_is_bound_to_the_challenge(sender):
+    private_key, address = sender
+    hello = {"address": address, "port": 61001}
+    hello.update(sign_hello(private_key, address, 61001, challenge="c1"))
+    verifier = SignatureVerifier()
+    assert verifier.verify_hello(hello, challenge="c1") == (True, None)
+    assert verifier.verify_hello(hello, challenge="c1") == (True, None) # A fresh challenge needs no replay cache
+    assert verifier.verify_hello(hello, challenge="c2") == (False, "Invalid signature")
+    assert verifier.verify_hello(hello) == (False, "Invalid signature")
@@ -0,0 +1,122 @@
+# tests/test_utils.py
+import atexit
+import logging
+import zlib
+
+import pytest
+
+import utils
+from config import ADDRESS_CHECKSUM_LENGTH, ADDRESS_LENGTH, ADDRESS_PREFIX
+from utils import (TRANSFER_LOGGER_NAME, _BASE32_ALPHABET, address_checksum, encode_address, generate_address,
+                   generate_addresses, is_valid_address)
+
+BODY = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"[:ADDRESS_LENGTH]
+ADDRESS = encode_address(BODY)
+
+
+def _reference_checksum(prefix_and_body):
+    """The checksum spelled out: low bits of the CRC32, as base32 digits, most significant first."""
+    value = zlib.crc32(prefix_and_body.encode('ascii')) & ((1 << (5 * ADDRESS_CHECKSUM_LENGTH)) - 1)
+    digits = [_BASE32_ALPHABET[value >> (5 * i) & 31] for i in reversed(range(ADDRESS_CHECKSUM_LENGTH))]
+    return "".join(digits)
+
+
+# --- address_checksum ---
+def test_checksum_matches_reference():
+    for text in (ADDRESS_PREFIX + BODY, ADDRESS_PREFIX + "A" * ADDRESS_LENGTH, "", "LGBX_"):
+        assert address_checksum(text) == _reference_checksum(text)
+
+
+def test_checksum_is_fixed_length_base32():
+    for address in generate_addresses(200):
+        checksum = address_checksum(address[:-ADDRESS_CHECKSUM_LENGTH])
+        assert len(checksum) == ADDRESS_CHECKSUM_LENGTH
+        assert set(checksum) <= set(_BASE32_ALPHABET)
+
+
+def test_encode_address_appends_checksum():
+    assert ADDRESS == ADDRESS_PREFIX + BODY + address_checksum(ADDRESS_PREFIX + BODY)
+    assert len(ADDRESS) == len(ADDRESS_PREFIX) + ADDRESS_LENGTH + ADDRESS_CHECKSUM_LENGTH
+
+
+# --- is_valid_address: valid ---
+def test_generated_addresses_are_valid():
+    assert is_valid_address(ADDRESS, allow_legacy=False)
+    assert is_valid_address(generate_address(), allow_legacy=False)
+    assert all(is_valid_address(address, allow_legacy=False) for address in generate_addresses(100))
+
+
+# --- is_valid_address: typos ---
+def test_every_single_character_substitution_is_rejected():
+    for i in range(len(ADDRESS_PREFIX), len(ADDRESS)):
+        for char in _BASE32_ALPHABET:
+            if char != ADDRESS[i]:
+                assert not is_valid_address(ADDRESS[:i] + char + ADDRESS[i + 1:], allow_legacy=False)
+
+
+def test_adjacent_transpositions_are_rejected():
+    for i in range(len(ADDRESS_PREFIX), len(ADDRESS) - 1):
+        if ADDRESS[i] != ADDRESS[i + 1]:
+            swapped = ADDRESS[:i] + ADDRESS[i + 1] + ADDRESS[i] + ADDRESS[i + 2:]
+            assert not is_valid_address(swapped, allow_legacy=False)
+
+
+@pytest.mark.parametrize("address", [
+    ADDRESS[:-1],                                  # checksum character missing
+    ADDRESS + "A",                                 # one character too many
+    ADDRESS.lower(),                               # base32 is upper case
+    "LGBY_" + ADDRESS[len(ADDRESS_PREFIX):],       # wrong prefix
+    ADDRESS[:len(ADDRESS_PREFIX)] + "0" + ADDRESS[len(ADDRESS_PREFIX) + 1:],  # not in the base32 alphabet
+    "",
+    None,
+    12345,
+], ids=["short", "long", "lowercase", "prefix", "digit", "empty", "none", "int"])
+def test_malformed_addresses_are_rejected(address):
+    assert not is_valid_address(address)
+
+
+# --- is_valid_address: legacy ---
+LEGACY = ADDRESS_PREFIX + "A1B2C3D4E5F6G7H8I9J0" + "K" * (ADDRESS_LENGTH - 20)
+
+
+def test_legacy_addresses_follow_allow_legacy():
+    assert is_valid_address(LEGACY, allow_legacy=True)
+    assert not is_valid_address(LEGACY, allow_legacy=False)
+
+
+@pytest.mark.parametrize("address", [LEGACY[:-1], LEGACY + "A", LEGACY.lower(), LEGACY[:-1] + "_"],
+                         ids=["short", "long", "lowercase", "symbol"])
+def test_malformed_legacy_addresses_are_rejected(address):
+    assert not is_valid_address(address, allow_legacy=True)
+
+
+# --- setup_logging ---
+@pytest.fixture
+def logging_setup(tmp_path, monkeypatch):
+    """Runs setup_logging() in a temporary directory with LOG_LEVEL DEBUG; restores the loggers afterwards."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "LOG_LEVEL", logging.DEBUG)
+    root, transfer = logging.getLogger(), logging.getLogger(TRANSFER_LOGGER_NAME)
+    saved = (root.level, list(root.handlers), transfer.level, list(transfer.filters))
+    listeners = []
+    yield lambda: listeners.append(utils.setup_logging())
+    for listener in listeners:
+        listener.stop()
+        atexit.unregister(listener.stop)
+    root.setLevel(saved[0])
+    root.handlers[:] = saved[1]
+    transfer.setLevel(saved[2])
+    transfer.filters[:] = saved[3]
+
+
+def test_transfer_debug_off_at_zero_rate_even_with_debug_level(logging_setup, monkeypatch):
+    monkeypatch.setattr(utils, "TRANSFER_DEBUG_SAMPLE_RATE", 0.0)
+    logging_setup()
+    assert logging.getLogger().isEnabledFor(logging.DEBUG)
+    assert not logging.getLogger(TRANSFER_LOGGER_NAME).isEnabledFor(logging.DEBUG)
+
+
+def test_transfer_debug_on_at_full_rate(logging_setup, monkeypatch):
+    monkeypatch.setattr(utils, "TRANSFER_DEBUG_SAMPLE_RATE", 1.0)
+    logging_setup()
+    assert logging.getLogger(TRANSFER_LOGGER_NAME).isEnabledFor(logging.DEBUG)
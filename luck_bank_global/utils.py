@@ -1,16 +1,65 @@
 # utils.py
-import string
+import atexit
+import contextvars
+import copy
+import json
+import queue
 import random
+import re
 import socket
 import logging
+import logging.handlers
 import os
 import sys
+import zlib
 from config import LOG_LEVEL, LOG_DIRECTORY, LOG_FILENAME
+from config import (LOG_JSON_FILE, LOG_ROTATION, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE,
+                    TRANSFER_DEBUG_SAMPLE_RATE)
+from config import ADDRESS_PREFIX, ADDRESS_LENGTH, ADDRESS_CHECKSUM_LENGTH, ACCEPT_LEGACY_ADDRESSES
 
-def generate_address(prefix="LGBX_", length=32):
-    """Generates a random alphanumeric address."""
-    chars = string.ascii_uppercase + string.digits
-    return prefix + ''.join(random.choice(chars) for _ in range(length))
+_BASE32_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+_BASE32_PAIRS = [hi + lo for hi in _BASE32_ALPHABET for lo in _BASE32_ALPHABET] # 10-bit value -> 2 chars
+# Maps each random byte to a base32 char; 256 is a multiple of 32 so the mapping stays uniform
+_RANDOM_BYTE_TO_BASE32 = bytes(ord(_BASE32_ALPHABET[i & 31]) for i in range(256))
+_CHECKSUM_MASK = (1 << (5 * ADDRESS_CHECKSUM_LENGTH)) - 1
+_ADDRESS_RE = re.compile(rf"{re.escape(ADDRESS_PREFIX)}[A-Z2-7]{{{ADDRESS_LENGTH + ADDRESS_CHECKSUM_LENGTH}}}")
+_LEGACY_ADDRESS_RE = re.compile(rf"{re.escape(ADDRESS_PREFIX)}[A-Z0-9]{{{ADDRESS_LENGTH}}}")
+
+def address_checksum(prefix_and_body):
+    """Returns the base32 checksum suffix (CRC32-based) for an address without its checksum."""
+    value = zlib.crc32(prefix_and_body.encode('ascii')) & _CHECKSUM_MASK
+    # Unrolled: three 10-bit pairs cover up to 6 chars, the most a CRC32 can fill
+    checksum = _BASE32_PAIRS[value >> 20 & 1023] + _BASE32_PAIRS[value >> 10 & 1023] + _BASE32_PAIRS[value & 1023]
+    return checksum[-ADDRESS_CHECKSUM_LENGTH:]
+
+def encode_address(body, prefix=ADDRESS_PREFIX):
+    """Builds a full address from a base32 body by appending its checksum."""
+    return prefix + body + address_checksum(prefix + body)
+
+def generate_address(prefix=ADDRESS_PREFIX, length=ADDRESS_LENGTH):
+    """Generates a random base32 address from the OS CSPRNG, with a checksum suffix."""
+    body = os.urandom(length).translate(_RANDOM_BYTE_TO_BASE32).decode('ascii')
+    return encode_address(body, prefix)
+
+def generate_addresses(count, prefix=ADDRESS_PREFIX, length=ADDRESS_LENGTH):
+    """
+    Mints `count` addresses at once (for provisioning tooling).
+    Draws all randomness in a single os.urandom call and maps it to base32 in one bytes.translate pass.
+    """
+    encoded = os.urandom(length * count).translate(_RANDOM_BYTE_TO_BASE32).decode('ascii')
+    return [encode_address(encoded[i:i + length], prefix) for i in range(0, length * count, length)]
+
+def is_valid_address(address, allow_legacy=ACCEPT_LEGACY_ADDRESSES):
+    """
+    Checks format and checksum of a wallet address. Cheap enough to run on every incoming transfer.
+    Pre-checksum addresses are accepted when `allow_legacy` is True.
+    """
+    if not isinstance(address, str):
+        return False
+    if _ADDRESS_RE.fullmatch(address):
+        split = len(address) - ADDRESS_CHECKSUM_LENGTH
+        return address_checksum(address[:split]) == address[split:]
+    return allow_legacy and _LEGACY_ADDRESS_RE.fullmatch(address) is not None
 
 def get_local_ip():
     """Tries to get the local IP address for sharing."""
@@ -47,8 +96,92 @@ def get_local_ip():
     return ip
 
 
+TRANSFER_LOGGER_NAME = "transfer" # Per-transfer DEBUG records (payload dumps), sampled by setup_logging
+_SAMPLE_DRAW = contextvars.ContextVar("transfer_sample_draw", default=None) # Set by begin_sampled_unit()
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that does the minimum in the calling thread: merge args into the message and render
+    tracebacks (they can't cross threads). Full formatting and all I/O happen on the listener thread.
+    Records are dropped instead of blocking when the queue is full.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass # Never stall a network thread on logging
+
+def begin_sampled_unit():
+    """
+    Starts a unit of sampled logging (one connection or one outgoing send) in the current context: the
+    SamplingFilter then keeps or drops all of its DEBUG records together, so a sampled transfer is
+    logged from receive to ack rather than as scattered lines. Call at the top of the thread that runs it.
+    """
+    _SAMPLE_DRAW.set(random.random())
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes DEBUG records with probability `rate`, decided once per unit (see begin_sampled_unit) and
+    per record outside one; higher levels always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        draw = _SAMPLE_DRAW.get()
+        return (random.random() if draw is None else draw) < self.rate
+
+def _build_file_handler(log_path):
+    if LOG_ROTATION == "size":
+        return logging.handlers.RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(log_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT)
+    return logging.FileHandler(log_path, mode='a') # Append mode
+
 def setup_logging():
-    """Configures logging to file and console."""
+    """
+    Configures non-blocking logging: callers only enqueue records, and a QueueListener thread
+    writes them to the console and a rotating (JSON lines) log file. Returns the listener.
+    """
     log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(module)s:%(lineno)d] - %(message)s')
     root_logger = logging.getLogger()
     root_logger.setLevel(LOG_LEVEL)
@@ -56,16 +189,37 @@ def setup_logging():
     # Console Handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(log_formatter)
-    root_logger.addHandler(console_handler)
+    handlers = [console_handler]
 
     # File Handler
+    log_path = os.path.join(LOG_DIRECTORY, LOG_FILENAME)
+    file_error = None
     try:
         if not os.path.exists(LOG_DIRECTORY):
             os.makedirs(LOG_DIRECTORY)
-        log_path = os.path.join(LOG_DIRECTORY, LOG_FILENAME)
-        file_handler = logging.FileHandler(log_path, mode='a') # Append mode
-        file_handler.setFormatter(log_formatter)
-        root_logger.addHandler(file_handler)
-        logging.info(f"Logging initialized. Log file: {log_path}")
+        file_handler = _build_file_handler(log_path)
+        file_handler.setFormatter(JsonFormatter() if LOG_JSON_FILE else log_formatter)
+        handlers.append(file_handler)
     except Exception as e:
-        logging.error(f"Failed to set up file logging to {LOG_DIRECTORY}/{LOG_FILENAME}: {e}")
\ No newline at end of file
+        file_error = e
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root_logger.addHandler(_LazyQueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop) # Flush queued records on exit
+
+    # Per-transfer debug records are off unless sampling is enabled
+    transfer_logger = logging.getLogger(TRANSFER_LOGGER_NAME)
+    if TRANSFER_DEBUG_SAMPLE_RATE > 0:
+        transfer_logger.setLevel(logging.DEBUG)
+        if TRANSFER_DEBUG_SAMPLE_RATE < 1:
+            transfer_logger.addFilter(SamplingFilter(TRANSFER_DEBUG_SAMPLE_RATE))
+    else:
+        transfer_logger.setLevel(logging.INFO) # Even when LOG_LEVEL is DEBUG
+
+    if file_error is None:
+        logging.info("Logging initialized. Log file: %s", log_path)
+    else:
+        logging.error("Failed to set up file logging to %s: %s", log_path, file_error)
+    return listener
@@ -0,0 +1,291 @@
+# workers.py
+import itertools
+import logging
+import multiprocessing
+import queue
+import socket
+import threading
+from concurrent.futures import Future
+from config import (LISTENER_WORKERS, LISTENER_WORKER_START_TIMEOUT, SOCKET_TIMEOUT,
+                    MAX_CONCURRENT_HANDLERS, PEER_RATE_LIMIT_PER_SEC, PEER_RATE_BURST)
+from admission import AdmissionController
+from networking import P2PHandler
+from signing import SignatureVerifier
+
+
+class MultiProcessListener:
+    """
+    Receives P2P messages in several worker processes that all bind the node's port with SO_REUSEPORT,
+    so parsing, address checks and signature verification use more than one core.
+
+    Workers never touch the ledger. Each validated transfer is sent over a multiprocessing queue to this
+    (the owning) process, the single writer, which applies it through the usual logic callback and sends
+    the outcome back so the worker can acknowledge the peer. Gossip messages, peer-directory updates and
+    signature replay checks are forwarded the same way, so that state stays process-wide.
+
+    Per-IP admission limits are divided between the workers (the kernel spreads one peer's connections
+    across them). Metrics recorded inside workers are not visible on this process's /metrics endpoint.
+    """
+
+    def __init__(self, logic, p2p_handler, workers=LISTENER_WORKERS, admission_limits=None):
+        self.logic = logic
+        self.p2p_handler = p2p_handler # Local handler: its verifier holds the shared replay cache
+        self.workers = workers
+        self.admission_limits = admission_limits or {
+            "max_handlers": max(1, MAX_CONCURRENT_HANDLERS // workers),
+            "rate": PEER_RATE_LIMIT_PER_SEC / workers,
+            "burst": max(1, PEER_RATE_BURST // workers),
+        }
+        self.running = False
+        self.applied = 0 # Transfers the writer applied successfully
+        self._context = multiprocessing.get_context("spawn") # Never fork a process that runs Tk and threads
+        self._requests = None
+        self._replies = []
+        self._processes = []
+        self._ready = queue.Queue()
+        self._writer_thread = None
+
+    def start(self):
+        """Starts the writer thread and the worker processes. Returns True once every worker is listening."""
+        if not hasattr(socket, "SO_REUSEPORT"):
+            logging.error("SO_REUSEPORT is not available on this platform; use LISTENER_WORKERS = 1.")
+            return False
+        self._requests = self._context.Queue()
+        self._replies = [self._context.Queue() for _ in range(self.workers)]
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True, name="ledger-writer")
+        self._writer_thread.start()
+        addresses = frozenset(self._hosted_addresses())
+        for worker_id in range(self.workers):
+            process = self._context.Process(
+                target=_worker_main, name=f"p2p-worker-{worker_id}", daemon=True,
+                args=(worker_id, self.p2p_handler.local_ip, self.p2p_handler.port, self.logic.address, addresses,
+                      self.admission_limits, self._requests, self._replies[worker_id],
+                      logging.getLogger().getEffectiveLevel()))
+            process.start()
+            self._processes.append(process)
+
+        started = 0
+        try:
+            for _ in range(self.workers):
+                started += bool(self._ready.get(timeout=LISTENER_WORKER_START_TIMEOUT))
+        except queue.Empty:
+            pass
+        self.running = started == self.workers
+        if not self.running:
+            logging.error("Only %d of %d listener workers started on port %s", started, self.workers,
+                          self.p2p_handler.port)
+            self.stop()
+            return False
+        logging.info("P2P listener running in %d worker processes on %s:%s", self.workers,
+                     self.p2p_handler.local_ip, self.p2p_handler.port)
+        return True
+
+    def update_hosted_addresses(self):
+        """Pushes the current set of hosted wallets to every worker (call after creating wallets)."""
+        addresses = frozenset(self._hosted_addresses())
+        for replies in self._replies:
+            replies.put((None, ("hosted", addresses)))
+
+    def stop(self):
+        self.running = False
+        for replies in self._replies:
+            replies.put(None) # Tells the worker to close its listener and exit
+        for process in self._processes:
+            process.join(timeout=3.0)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        if self._requests is not None:
+            self._requests.put(None)
+        if self._writer_thread:
+            self._writer_thread.join(timeout=3.0)
+            self._writer_thread = None
+
+    def _hosted_addresses(self):
+        wallets = getattr(self.logic, 'wallets', None)
+        return wallets.keys() if wallets is not None else [self.logic.address]
+
+    # --- Writer side (this process) ---
+    def _writer_loop(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            worker_id, request_id, kind, payload = item
+            try:
+                result = self._dispatch(kind, payload)
+            except Exception as e:
+                logging.exception("Listener writer failed on %s from worker %s", kind, worker_id)
+                result = ("error", f"Server processing error: {e}")
+            if request_id is not None:
+                self._replies[worker_id].put((request_id, result))
+        logging.info("Ledger writer thread finished.")
+
+    def _dispatch(self, kind, payload):
+        if kind == "transfer":
+            amount, sender_address, addr, recipient_address = payload
+            success = self.logic.handle_received_transfer(amount, sender_address, addr, recipient_address)
+            self.applied += success
+            return success
+        if kind == "replay":
+            return self.p2p_handler.verifier.remember_signature(*payload)
+        if kind == "gossip":
+            action, message, addr = payload
+            if self.p2p_handler.gossip is None:
+                return ("error", "Unknown action")
+            try:
+                return ("ok", self.p2p_handler.gossip.handle_message(action, message, addr))
+            except ValueError as e:
+                return ("invalid", str(e))
+        if kind == "peer_seen":
+            if hasattr(self.logic, 'handle_peer_seen'):
+                self.logic.handle_peer_seen(*payload)
+            return None
+        if kind == "sign_ack": # Wallet keys stay in this process
+            return self.logic.sign_ack(*payload) if hasattr(self.logic, 'sign_ack') else {}
+        if kind == "status":
+            self._ready.put(payload)
+            return None
+        raise ValueError(f"Unknown worker request '{kind}'")
+
+
+# --- Worker side (child processes) ---
+class _WriterClient:
+    """
+    A worker's channel to the writer: call() blocks for the reply, notify() does not wait. Updates the
+    writer pushes unasked (request id None) are passed to `on_update(kind, value)`.
+    """
+
+    def __init__(self, worker_id, requests, replies):
+        self.worker_id = worker_id
+        self._requests = requests
+        self._replies = replies
+        self._pending = {} # request id -> Future
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self.stopped = threading.Event()
+        self.on_update = None
+        threading.Thread(target=self._reply_loop, daemon=True, name="writer-replies").start()
+
+    def call(self, kind, payload, timeout=SOCKET_TIMEOUT):
+        """Sends a request and waits for the reply; timeout=None waits until the writer answers or stops."""
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = future
+        self._requests.put((self.worker_id, request_id, kind, payload))
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def notify(self, kind, payload):
+        self._requests.put((self.worker_id, None, kind, payload))
+
+    def _reply_loop(self):
+        while True:
+            item = self._replies.get()
+            if item is None:
+                with self._lock:
+                    abandoned = list(self._pending.values())
+                for future in abandoned:
+                    future.set_exception(ConnectionAbortedError("Ledger writer stopped"))
+                self.stopped.set()
+                return
+            request_id, result = item
+            if request_id is None:
+                if self.on_update:
+                    self.on_update(*result)
+                continue
+            with self._lock:
+                future = self._pending.get(request_id)
+            if future is not None:
+                future.set_result(result)
+
+
+class _WorkerLogic:
+    """The BankLogic callback surface inside a worker; ledger changes are applied by the writer."""
+
+    def __init__(self, writer, address, hosted_addresses):
+        self.writer = writer
+        self.address = address
+        self.hosted_addresses = hosted_addresses # Replaced whenever the writer pushes a new set
+
+    def hosts_wallet(self, address):
+        return address in self.hosted_addresses
+
+    def apply_update(self, kind, value):
+        if kind == "hosted":
+            self.hosted_addresses = value
+
+    def handle_received_transfer(self, amount, sender_address, sender_ip_port, recipient_address=None):
+        # No timeout: the writer applies a queued credit whether or not we still wait for it, and reporting
+        # a failure for a credit that went through would make the sender retry it
+        result = self.writer.call("transfer", (amount, sender_address, tuple(sender_ip_port), recipient_address),
+                                  timeout=None)
+        return result is True
+
+    def sign_ack(self, address, transfer_signature):
+        fields = self.writer.call("sign_ack", (address, transfer_signature))
+        return fields if isinstance(fields, dict) else {} # The writer failed; send the ack unsigned
+
+    def handle_peer_seen(self, address, ip, port, source):
+        self.writer.notify("peer_seen", (address, ip, port, source))
+
+    def handle_network_error(self, message):
+        logging.error(message)
+
+    def schedule_task(self, delay_ms, callback, *args):
+        callback(*args)
+
+
+class _GossipProxy:
+    """Forwards 'hello'/'peers' to the writer's GossipService so the known-peer set stays process-wide."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def handle_message(self, action, message, addr):
+        status, value = self.writer.call("gossip", (action, message, tuple(addr)))
+        if status == "ok":
+            return value
+        if status == "invalid":
+            raise ValueError(value) # Counted against the sender by this worker's admission control
+        return {"status": "error", "message": value}
+
+
+class _SharedReplayVerifier(SignatureVerifier):
+    """Replay protection must span all workers: signatures new to this process are confirmed with the writer."""
+
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+
+    def remember_signature(self, signature_hex, timestamp):
+        local = super().remember_signature(signature_hex, timestamp)
+        if not local:
+            return local
+        shared = self.writer.call("replay", (signature_hex, timestamp))
+        if not shared: # Refused or seen by another worker; a retry must not look like a replay here
+            self.forget_signature(signature_hex)
+        return shared
+
+
+def _worker_main(worker_id, local_ip, port, address, hosted_addresses, admission_limits, requests, replies,
+                 log_level):
+    """Entry point of a worker process: serve the shared port until the writer says stop."""
+    logging.basicConfig(level=log_level, format=f"%(asctime)s - worker{worker_id} - %(levelname)s - %(message)s")
+    writer = _WriterClient(worker_id, requests, replies)
+    logic = _WorkerLogic(writer, address, hosted_addresses)
+    writer.on_update = logic.apply_update
+    handler = P2PHandler(logic, local_ip, port)
+    handler.reuse_port = True
+    handler.admission = AdmissionController(**admission_limits)
+    handler.verifier = _SharedReplayVerifier(writer)
+    handler.gossip = _GossipProxy(writer)
+    started = bool(handler.start_listener())
+    writer.notify("status", started)
+    if started:
+        writer.stopped.wait()
+        handler.stop_listener()